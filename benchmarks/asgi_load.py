@@ -0,0 +1,84 @@
+"""Compare requests/sec and p99 latency of the WSGI and ASGI entry points.
+
+Both modes run a single worker process on the same SQLite dataset: gunicorn
+with a sync worker for WSGI and uvicorn for ASGI. Every client trickles its
+request in over ``--send-delay`` seconds, like a slow mobile connection.
+
+Usage: python -m benchmarks.asgi_load [--clients 50] [--duration 10]
+                                      [--operations 5000] [--send-delay 0.05]
+"""
+import argparse
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+from benchmarks.common import (create_fixture, create_operations, load,
+                               raw_request, report, serve)
+
+SERVERS = {
+    'wsgi': (
+        'gunicorn', 'family_budget.wsgi:application', '--workers', '1',
+        '--bind', '{host}:{port}', '--log-level', 'warning',
+    ),
+    'asgi': (
+        'uvicorn', 'family_budget.asgi:application', '--workers', '1',
+        '--host', '{host}', '--port', '{port}', '--log-level', 'warning',
+    ),
+}
+
+
+def prepare(operations):
+    import django
+    from django.core.management import call_command
+
+    django.setup()
+    call_command('migrate', verbosity=0)
+
+    from django.urls import reverse
+    from django.utils import timezone
+    from rest_framework.authtoken.models import Token
+
+    user, budgets_list, category, budget = create_fixture()
+    create_operations(
+        budget, [category], user, operations,
+        timezone.make_aware(datetime(2020, 1, 1)), timedelta(minutes=10)
+    )
+    list_kwargs = {'list_id': budgets_list.id}
+    budget_kwargs = {'list_id': budgets_list.id, 'budget_id': budget.id}
+    paths = (
+        reverse('budget:budgets_lists-detail', kwargs={'pk': budgets_list.id}),
+        reverse('budget:budgets-list', kwargs=list_kwargs),
+        reverse('budget:budgets-detail',
+                kwargs={**list_kwargs, 'pk': budget.id}) + '?latest=20',
+        reverse('budget:budget_operation-list', kwargs=budget_kwargs),
+    )
+    return paths, Token.objects.create(user=user).key
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--operations', type=int, default=5000)
+    parser.add_argument('--send-delay', type=float, default=0.05)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE='family_budget.settings',
+            SQLITE_PATH=os.path.join(directory, 'bench.sqlite3'),
+        )
+        os.environ.update(env)
+        paths, token = prepare(args.operations)
+        requests = [raw_request('GET', path, token) for path in paths]
+
+        for mode, command in SERVERS.items():
+            with serve(command, env) as port:
+                results = load(port, requests, args.clients, args.duration,
+                               args.send_delay)
+            report(mode, *results)
+
+
+if __name__ == '__main__':
+    main()
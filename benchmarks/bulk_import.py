@@ -0,0 +1,49 @@
+"""Compare per-row cost of the bulk import action with single POSTs.
+
+Usage: python -m benchmarks.bulk_import [--rows 10000] [--single-rows 1000]
+"""
+import argparse
+
+from benchmarks.common import Timer, api_client, create_fixture, setup
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--single-rows', type=int, default=1000)
+    args = parser.parse_args()
+
+    setup()
+    from django.urls import reverse
+
+    user, budgets_list, category, budget = create_fixture()
+    client = api_client(user)
+    kwargs = {'list_id': budgets_list.id, 'budget_id': budget.id}
+    row = {
+        'operation_type': 'Expense',
+        'category': category.title,
+        'amount': '1.00'
+    }
+
+    single = Timer()
+    url = reverse('budget:budget_operation-list', kwargs=kwargs)
+    for _ in range(args.single_rows):
+        with single:
+            client.post(url, row, format='json')
+
+    bulk = Timer()
+    url = reverse('budget:budget_operation-bulk', kwargs=kwargs)
+    with bulk:
+        response = client.post(url, [row] * args.rows, format='json')
+    assert response.status_code == 201, response.content
+
+    single_row = single.total / args.single_rows
+    bulk_row = bulk.total / args.rows
+    print(f'single POST: {args.single_rows} rows, '
+          f'{single_row * 1e6:.0f} us/row')
+    print(f'bulk import: {args.rows} rows, {bulk_row * 1e6:.0f} us/row')
+    print(f'speedup: {single_row / bulk_row:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
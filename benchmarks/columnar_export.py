@@ -0,0 +1,97 @@
+"""Measure list export throughput in rows/sec against paging through the API.
+
+Creates ``--operations`` operations over the budgets of one list and streams
+the columnar export in every available format, reporting rows/sec, queries
+and peak Python memory. For comparison it pages through one budget's
+operations with keyset pagination, the way notebooks scraped them before.
+
+Usage: python -m benchmarks.columnar_export [--operations 200000]
+       [--budgets 4] [--pages 50]
+"""
+import argparse
+import tracemalloc
+from datetime import timedelta
+
+from benchmarks.common import Timer, api_client, create_operations, setup
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--operations', type=int, default=200000)
+    parser.add_argument('--budgets', type=int, default=4)
+    parser.add_argument('--pages', type=int, default=50)
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.urls import reverse
+    from django.utils import timezone
+
+    from budget.columnar import available_formats
+    from budget.models import Budget, BudgetsList, Category
+
+    user = get_user_model().objects.create_user(username='BenchUser')
+    budgets_list = BudgetsList.objects.create(title='Bench', owner=user)
+    categories = [
+        Category.objects.create(title=f'Category {number}')
+        for number in range(20)
+    ]
+    per_budget = args.operations // args.budgets
+    start = timezone.now() - timedelta(days=3650)
+    for number in range(args.budgets):
+        budget = Budget.objects.create(
+            title=f'Budget {number}',
+            currency=Budget.Currency.USD,
+            owner=user,
+            budget_list=budgets_list
+        )
+        create_operations(
+            budget, categories, user, per_budget, start, timedelta(minutes=5)
+        )
+    rows = per_budget * args.budgets
+    print(f'{rows} operations over {args.budgets} budgets')
+
+    client = api_client(user)
+    url = reverse('budget:budgets_lists-export', kwargs={
+        'pk': budgets_list.id
+    })
+    for file_format in available_formats():
+        timer = Timer()
+        queries = []
+        # Requests reset the query log, which the streamed body outlives.
+        with connection.execute_wrapper(
+                lambda execute, sql, *args: queries.append(sql)
+                or execute(sql, *args)):
+            with timer:
+                response = client.get(url, {'type': file_format})
+                size = sum(len(part) for part in response.streaming_content)
+        # A second run under tracemalloc, which slows everything down.
+        tracemalloc.start()
+        response = client.get(url, {'type': file_format})
+        for part in response.streaming_content:
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f'{file_format:<8} {rows / timer.total:>10.0f} rows/sec '
+              f'{size / 1024 / 1024:>8.1f} MiB {len(queries):>3} queries '
+              f'{peak / 1024 / 1024:>7.1f} MiB peak')
+
+    timer = Timer()
+    scraped = pages = 0
+    page = reverse('budget:budget_operation-list', kwargs={
+        'list_id': budgets_list.id,
+        'budget_id': budget.id
+    }) + '?pagination=keyset'
+    while page and pages < args.pages:
+        with timer:
+            data = client.get(page).json()
+        scraped += len(data['results'])
+        pages += 1
+        page = data['next']
+    print(f'{"pages":<8} {scraped / timer.total:>10.0f} rows/sec '
+          f'({scraped} rows over {pages} pages)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import django
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOST = '127.0.0.1'
+
+
+def setup():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'family_budget.settings')
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, keepdb=False)
+
+
+def create_fixture(username='BenchUser'):
+    from decimal import Decimal
+
+    from django.contrib.auth import get_user_model
+
+    from budget.models import Budget, BudgetsList, Category
+
+    user = get_user_model().objects.create_user(username=username)
+    budgets_list = BudgetsList.objects.create(title='Bench', owner=user)
+    category = Category.objects.create(title='Bench category')
+    budget = Budget.objects.create(
+        title='Bench budget',
+        currency=Budget.Currency.USD,
+        initial_balance=Decimal('1000.00'),
+        owner=user,
+        budget_list=budgets_list
+    )
+    return user, budgets_list, category, budget
+
+
+def api_client(user):
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+class Timer:
+
+    def __init__(self):
+        self.samples = []
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.samples.append(time.perf_counter() - self.started)
+
+    @property
+    def total(self):
+        return sum(self.samples)
+
+    def percentile(self, value):
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(value / 100 * len(ordered))))
+        return ordered[index]
+
+    @property
+    def median(self):
+        return statistics.median(self.samples)
+
+
+def create_operations(budget, categories, user, count, start, step,
+                      batch_size=500):
+    from decimal import Decimal
+
+    from budget.models import BudgetOperation
+
+    def operations():
+        for number in range(count):
+            yield BudgetOperation(
+                budget=budget,
+                category=categories[number % len(categories)],
+                user=user,
+                operation_type=BudgetOperation.OperationType.EXPENSE,
+                amount=Decimal(number % 500 + 1),
+                date=start + step * number
+            )
+
+    batch = []
+    for operation in operations():
+        batch.append(operation)
+        if len(batch) == batch_size:
+            BudgetOperation.objects.bulk_create_dated(batch, batch_size)
+            batch = []
+    BudgetOperation.objects.bulk_create_dated(batch, batch_size)
+
+
+def raw_request(method, path, token, data=None):
+    body = b'' if data is None else json.dumps(data).encode()
+    head = (f'{method} {path} HTTP/1.1\r\n'
+            f'Host: {HOST}\r\n'
+            f'Authorization: Token {token}\r\n'
+            f'Accept: application/json\r\n'
+            f'Content-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: close\r\n\r\n')
+    return head.encode() + body
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((HOST, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'Server on port {port} did not start')
+
+
+@contextmanager
+def serve(command, env):
+    """Run ``python -m <command>`` with {host} and {port} filled in."""
+    port = free_port()
+    with tempfile.TemporaryFile() as output:
+        server = subprocess.Popen(
+            [sys.executable, '-m'] + [
+                part.format(host=HOST, port=port) for part in command
+            ],
+            cwd=BASE_DIR,
+            env=env,
+            stdout=output,
+            stderr=subprocess.STDOUT
+        )
+        try:
+            try:
+                wait_for_port(port)
+            except RuntimeError:
+                output.seek(0)
+                sys.stderr.write(output.read().decode())
+                raise
+            yield port
+        finally:
+            server.terminate()
+            server.wait()
+
+
+async def client(port, requests, send_delay, deadline, timer, failures):
+    number = 0
+    while time.monotonic() < deadline:
+        request = requests[number % len(requests)]
+        number += 1
+        middle = len(request) // 2
+        # The timer is shared by every client, so time requests by hand.
+        started = time.perf_counter()
+        try:
+            reader, writer = await asyncio.open_connection(HOST, port)
+            writer.write(request[:middle])
+            await writer.drain()
+            if send_delay:
+                await asyncio.sleep(send_delay)
+            writer.write(request[middle:])
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+        except OSError:
+            failures.append('connection error')
+            continue
+        finally:
+            timer.samples.append(time.perf_counter() - started)
+        status = response[9:12]
+        if not status.startswith(b'2'):
+            failures.append(status.decode() or 'empty response')
+
+
+async def run_clients(port, requests, clients, duration, send_delay=0):
+    timer = Timer()
+    failures = []
+    started = time.monotonic()
+    deadline = started + duration
+    await asyncio.gather(*(
+        client(port, requests, send_delay, deadline, timer, failures)
+        for _ in range(clients)
+    ))
+    return timer, failures, time.monotonic() - started
+
+
+def load(port, requests, clients, duration, send_delay=0):
+    return asyncio.run(
+        run_clients(port, requests, clients, duration, send_delay)
+    )
+
+
+def report(title, timer, failures, elapsed):
+    completed = len(timer.samples) - len(failures)
+    print(f'{title}: {completed / elapsed:.1f} requests/sec, '
+          f'median {timer.median * 1000:.1f} ms, '
+          f'p99 {timer.percentile(99) * 1000:.1f} ms, '
+          f'{len(failures)} failed')
@@ -0,0 +1,75 @@
+"""Compare the list totals action with converting budget by budget.
+
+Usage: python -m benchmarks.currency_totals [--budgets 500] [--repeat 20]
+"""
+import argparse
+from datetime import date
+from decimal import Decimal
+
+from benchmarks.common import Timer, api_client, create_fixture, setup
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--budgets', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import reverse
+
+    from budget.models import Budget, CurrencyRate
+
+    user, budgets_list, _, _ = create_fixture()
+    currencies = [currency for currency, _ in Budget.Currency.choises]
+    Budget.objects.bulk_create(
+        [
+            Budget(
+                title=f'Budget {number}',
+                currency=currencies[number % len(currencies)],
+                initial_balance=Decimal(number),
+                balance=Decimal(number),
+                owner=user,
+                budget_list=budgets_list
+            )
+            for number in range(args.budgets)
+        ],
+        batch_size=500
+    )
+    CurrencyRate.objects.bulk_create([
+        CurrencyRate(currency='Euro', date=date(2021, 1, 1), rate='1.2'),
+        CurrencyRate(currency='zl', date=date(2021, 1, 1), rate='0.25'),
+    ])
+    client = api_client(user)
+    today = date.today()
+
+    def per_budget():
+        total = Decimal('0.00')
+        for budget in Budget.objects.filter(budget_list=budgets_list):
+            rate = Decimal('1')
+            if budget.currency != 'USD':
+                rate = CurrencyRate.objects.filter(
+                    currency=budget.currency, date__lte=today
+                ).order_by('-date').values_list('rate', flat=True).first()
+            total += budget.balance * rate
+        return total.quantize(Decimal('0.01'))
+
+    url = reverse('budget:budgets_lists-totals', kwargs={'pk': budgets_list.id})
+
+    def totals_action():
+        return Decimal(client.get(url).json()['total'])
+
+    for title, run in (('per budget', per_budget),
+                       ('totals action', totals_action)):
+        timer = Timer()
+        for _ in range(args.repeat):
+            with CaptureQueriesContext(connection) as queries, timer:
+                total = run()
+        print(f'{title}: total {total}, median {timer.median * 1000:.2f} ms, '
+              f'{len(queries)} queries')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Measure date, amount and category filters on a large operation table.
+
+Compares pulling the whole history and filtering client-side (the only
+option before these filters existed) with the indexed server-side filters.
+
+Usage: python -m benchmarks.operation_filters [--rows 1000000] [--repeat 10]
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from benchmarks.common import (Timer, api_client, create_fixture,
+                               create_operations, setup)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    setup()
+    from django.urls import reverse
+    from django.utils import timezone
+
+    from budget.models import BudgetOperation, Category
+
+    user, budgets_list, category, budget = create_fixture()
+    categories = [category] + [
+        Category.objects.create(title=title)
+        for title in ('Food', 'Fuel', 'Rent', 'Travel')
+    ]
+    start = timezone.make_aware(datetime(2015, 1, 1))
+    step = timedelta(minutes=5)
+    create_operations(budget, categories, user, args.rows, start, step)
+
+    client = api_client(user)
+    url = reverse(
+        'budget:budget_operation-list',
+        kwargs={'list_id': budgets_list.id, 'budget_id': budget.id}
+    )
+    date_after = start + step * (args.rows // 2)
+    date_before = date_after + timedelta(days=30)
+
+    def client_side():
+        return sum(
+            1 for day, amount, title in BudgetOperation.objects.filter(
+                budget=budget
+            ).values_list('date', 'amount', 'category__title').iterator()
+            if date_after <= day <= date_before and amount >= 100
+            and title.startswith('F')
+        )
+
+    params = {
+        'date_after': date_after.strftime('%Y-%m-%dT%H:%M:%S'),
+        'date_before': date_before.strftime('%Y-%m-%dT%H:%M:%S'),
+        'amount_min': 100,
+        'category_prefix': 'F',
+        'pagination': 'keyset',
+        'page_size': 100,
+    }
+
+    def server_side():
+        return len(client.get(url, params).json()['results'])
+
+    for title, run in (('client-side filtering', client_side),
+                       ('server-side filters', server_side)):
+        timer = Timer()
+        for _ in range(args.repeat):
+            with timer:
+                rows = run()
+        print(f'{title}: {rows} rows, median {timer.median * 1000:.2f} ms, '
+              f'p95 {timer.percentile(95) * 1000:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
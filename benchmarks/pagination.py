@@ -0,0 +1,72 @@
+"""Compare page-number and keyset pagination latency on shallow and deep pages.
+
+Usage: python -m benchmarks.pagination [--pages 10000] [--repeat 20]
+"""
+import argparse
+
+from benchmarks.common import Timer, api_client, create_fixture, setup
+
+
+def create_operations(budget, category, user, count):
+    from budget.models import BudgetOperation
+
+    operations = (
+        BudgetOperation(
+            budget=budget,
+            category=category,
+            user=user,
+            operation_type=BudgetOperation.OperationType.EXPENSE,
+            amount=1
+        )
+        for _ in range(count)
+    )
+    BudgetOperation.objects.bulk_create(operations, batch_size=500)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+    from django.conf import settings
+    from django.urls import reverse
+
+    from budget.pagination import OperationKeysetPagination
+
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    user, budgets_list, category, budget = create_fixture()
+    create_operations(budget, category, user, args.pages * page_size)
+    client = api_client(user)
+    url = reverse(
+        'budget:budget_operation-list',
+        kwargs={'list_id': budgets_list.id, 'budget_id': budget.id}
+    )
+
+    deep = budget.budget_operations.order_by('date', 'id')[
+        (args.pages - 1) * page_size - 1
+    ]
+    paginator = OperationKeysetPagination()
+    paginator.base_url = 'http://testserver' + url
+    deep_cursor = paginator.encode_cursor(paginator.position_of(deep))
+
+    cases = (
+        ('page number, page 1', url, {}),
+        (f'page number, page {args.pages}', url, {'page': args.pages}),
+        ('keyset, page 1', url, {'pagination': 'keyset'}),
+        (f'keyset, page {args.pages}', deep_cursor,
+         {'pagination': 'keyset'}),
+    )
+    for title, path, params in cases:
+        timer = Timer()
+        for _ in range(args.repeat):
+            with timer:
+                response = client.get(path, params)
+            assert response.status_code == 200, response.content
+        print(f'{title}: median {timer.median * 1000:.2f} ms, '
+              f'p95 {timer.percentile(95) * 1000:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
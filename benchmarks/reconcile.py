@@ -0,0 +1,56 @@
+"""Time the balance reconciliation scan on generated data.
+
+Usage: python -m benchmarks.reconcile [--operations 200000] [--drift 100]
+"""
+import argparse
+import io
+import tracemalloc
+
+from benchmarks.common import Timer, setup
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--operations', type=int, default=200000)
+    parser.add_argument('--drift', type=int, default=100)
+    args = parser.parse_args()
+
+    setup()
+    from django.core.management import call_command
+    from django.db import connection
+    from django.db.models import F
+    from django.test.utils import CaptureQueriesContext
+
+    from budget.balances import reconcile
+    from budget.models import Budget
+
+    call_command(
+        'generate_budget_data',
+        users=args.users,
+        operations=args.operations,
+        stdout=io.StringIO()
+    )
+    drifted = Budget.objects.order_by('id').values_list(
+        'id', flat=True
+    )[:args.drift]
+    Budget.objects.filter(id__in=list(drifted)).update(
+        balance=F('balance') + 1
+    )
+    print(f'{Budget.objects.count()} budgets, {args.operations} operations')
+
+    for fix in (False, True):
+        timer = Timer()
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as captured:
+            with timer:
+                found = sum(1 for _ in reconcile(fix=fix))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f'{"fix" if fix else "check":<6} {found:>6} drifted '
+              f'{timer.total * 1000:>9.1f} ms {len(captured):>4} queries '
+              f'{peak / 1024:>9.1f} KiB peak')
+
+
+if __name__ == '__main__':
+    main()
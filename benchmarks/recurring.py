@@ -0,0 +1,73 @@
+"""Time materializing due recurring operations across many budgets.
+
+Creates ``--rules`` monthly rules spread over the budgets of a generated
+dataset, all due once, and runs the scheduler. A second run checks that
+nothing is created twice.
+
+Usage: python -m benchmarks.recurring [--rules 100000] [--users 1000]
+"""
+import argparse
+import io
+from datetime import date
+
+from benchmarks.common import Timer, setup
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rules', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    setup()
+    from decimal import Decimal
+
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    from budget.models import (Budget, BudgetOperation, Category,
+                               RecurringOperation)
+    from budget.recurring import materialize
+
+    call_command(
+        'generate_budget_data',
+        users=args.users,
+        operations=0,
+        stdout=io.StringIO()
+    )
+    budgets = list(Budget.objects.values_list('id', 'owner_id'))
+    categories = list(Category.objects.values_list('id', flat=True))
+    start = date(2021, 1, 1)
+    RecurringOperation.objects.bulk_create(
+        (
+            RecurringOperation(
+                budget_id=budgets[number % len(budgets)][0],
+                user_id=budgets[number % len(budgets)][1],
+                category_id=categories[number % len(categories)],
+                operation_type=BudgetOperation.OperationType.EXPENSE,
+                amount=Decimal(number % 500 + 1),
+                frequency=RecurringOperation.Frequency.MONTHLY,
+                start_date=start,
+                next_date=start
+            )
+            for number in range(args.rules)
+        ),
+        batch_size=1000
+    )
+    print(f'{args.rules} rules over {len(budgets)} budgets')
+
+    for run in ('first', 'second'):
+        timer = Timer()
+        with CaptureQueriesContext(connection) as captured:
+            with timer:
+                rules, created = materialize(
+                    date(2021, 1, 15), args.batch_size
+                )
+        print(f'{run:<7} run: {created:>7} operations from {rules:>7} rules '
+              f'in {timer.total:.2f} s, {len(captured)} queries')
+
+
+if __name__ == '__main__':
+    main()
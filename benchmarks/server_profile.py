@@ -0,0 +1,109 @@
+"""Compare throughput of the development and production server profiles.
+
+"before" is the old container setup: ``manage.py runserver``, a new database
+connection per request and SQLite's default rollback journal. "after" is
+gunicorn with ``gunicorn.conf.py``, persistent connections and WAL. Clients
+mix operation reads with operation writes.
+
+Pass ``--database-url`` to run both profiles against a scratch PostgreSQL
+database instead of a temporary SQLite file.
+
+Usage: python -m benchmarks.server_profile [--clients 20] [--duration 10]
+                                           [--operations 5000]
+                                           [--database-url URL]
+"""
+import argparse
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+from benchmarks.common import (create_fixture, create_operations, load,
+                               raw_request, report, serve)
+
+PROFILES = {
+    'before': (
+        {
+            'DB_CONN_MAX_AGE': '0',
+            'SQLITE_JOURNAL_MODE': 'delete',
+            'SQLITE_SYNCHRONOUS': 'full',
+        },
+        ('django', 'runserver', '--noreload', '{host}:{port}'),
+    ),
+    'after': (
+        {},
+        ('gunicorn', '-c', 'gunicorn.conf.py', '--bind', '{host}:{port}',
+         'family_budget.wsgi:application'),
+    ),
+}
+
+
+def prepare(operations):
+    import django
+    from django.core.management import call_command
+
+    django.setup()
+    call_command('migrate', verbosity=0)
+
+    from django.urls import reverse
+    from django.utils import timezone
+    from rest_framework.authtoken.models import Token
+
+    from budget.models import BudgetOperation
+
+    user, budgets_list, category, budget = create_fixture()
+    create_operations(
+        budget, [category], user, operations,
+        timezone.make_aware(datetime(2020, 1, 1)), timedelta(minutes=10)
+    )
+    token = Token.objects.create(user=user).key
+    operations_path = reverse('budget:budget_operation-list', kwargs={
+        'list_id': budgets_list.id,
+        'budget_id': budget.id
+    })
+    budget_path = reverse('budget:budgets-detail', kwargs={
+        'list_id': budgets_list.id,
+        'pk': budget.id
+    })
+    write = raw_request('POST', operations_path, token, {
+        'operation_type': BudgetOperation.OperationType.EXPENSE,
+        'category': category.title,
+        'amount': '1.00',
+    })
+    return [
+        raw_request('GET', operations_path, token),
+        raw_request('GET', budget_path + '?latest=20', token),
+        raw_request('GET', operations_path + '?pagination=keyset', token),
+        write,
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--operations', type=int, default=5000)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE='family_budget.settings',
+            DEBUG='false',
+            SECRET_KEY='benchmark',
+            ALLOWED_HOSTS='127.0.0.1',
+            SQLITE_PATH=os.path.join(directory, 'bench.sqlite3'),
+        )
+        if args.database_url:
+            env['DATABASE_URL'] = args.database_url
+        os.environ.update(env, **PROFILES['before'][0])
+        requests = prepare(args.operations)
+
+        for profile, (overrides, command) in PROFILES.items():
+            with serve(command, dict(env, **overrides)) as port:
+                results = load(port, requests, args.clients, args.duration)
+            report(profile, *results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+"""Benchmark every endpoint in budget/urls.py on generated data.
+
+Generates a dataset with the ``generate_budget_data`` command and times each
+endpoint against the largest budget. Reports latency percentiles, queries per
+request and peak memory allocated per request. Results can be saved as a
+baseline and later runs compared against it; the run fails when an endpoint
+got slower or hungrier than ``--tolerance`` allows, or runs more queries.
+
+Usage: python -m benchmarks.suite [--operations 100000] [--repeat 20]
+                                  [--only NAME ...] [--save PATH]
+                                  [--compare PATH] [--tolerance 0.25]
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+from benchmarks.common import Timer, api_client, setup
+
+# Latency differences below this many seconds are treated as noise.
+MIN_LATENCY_REGRESSION = 0.002
+
+
+def create_dataset(args):
+    from django.core.management import call_command
+    from django.db.models import Count
+
+    from budget.models import Budget, CurrencyRate
+
+    call_command(
+        'generate_budget_data',
+        users=args.users,
+        operations=args.operations,
+        seed=args.seed,
+        stdout=io.StringIO()
+    )
+    for currency, rate in ((Budget.Currency.EURO, '1.100000'),
+                           (Budget.Currency.PLN, '0.250000')):
+        CurrencyRate.objects.create(
+            currency=currency,
+            date=date.today() - timedelta(days=1),
+            rate=Decimal(rate)
+        )
+    return Budget.objects.annotate(
+        operations=Count('budget_operations')
+    ).select_related('budget_list__owner').order_by('-operations').first()
+
+
+def endpoint_cases(budget):
+    from django.urls import reverse
+
+    from budget.jobs import claim, enqueue, run_job
+    from budget.models import (BudgetOperation, Category, Job,
+                               RecurringOperation)
+
+    budgets_list = budget.budget_list
+    owner = budgets_list.owner
+    operation = budget.budget_operations.order_by('-id').first()
+    category = Category.objects.order_by('id').first()
+    share = budgets_list.shared_permissions.first()
+    list_kwargs = {'list_id': budgets_list.id}
+    budget_kwargs = {'list_id': budgets_list.id, 'budget_id': budget.id}
+    new_operation = {
+        'operation_type': BudgetOperation.OperationType.EXPENSE,
+        'category': operation.category.title,
+        'amount': '12.50',
+        'note': 'benchmark',
+    }
+    new_recurring = {
+        'operation_type': BudgetOperation.OperationType.EXPENSE,
+        'category': operation.category.title,
+        'amount': '750.00',
+        'frequency': RecurringOperation.Frequency.MONTHLY,
+        'start_date': date.today().isoformat(),
+    }
+    recurring = RecurringOperation.objects.create(
+        budget=budget,
+        operation_type=BudgetOperation.OperationType.EXPENSE,
+        category=operation.category,
+        amount=Decimal('750.00'),
+        frequency=RecurringOperation.Frequency.MONTHLY,
+        start_date=date.today(),
+        user=owner
+    )
+    # A finished export, so the job endpoints have something to show.
+    job = enqueue(Job.Kind.EXPORT, owner, budgets_list.id, type='csv')
+    claim('benchmark', 1)
+    run_job(job.id)
+    import_file = ''.join(
+        f'Expense,{operation.category.title},{number % 50 + 1}.00\n'
+        for number in range(100)
+    )
+
+    cases = [
+        ('lists-list', 'get', reverse('budget:budgets_lists-list'), None),
+        ('lists-detail', 'get', reverse(
+            'budget:budgets_lists-detail', kwargs={'pk': budgets_list.id}
+        ), None),
+        ('lists-totals', 'get', reverse(
+            'budget:budgets_lists-totals', kwargs={'pk': budgets_list.id}
+        ), None),
+        ('lists-search', 'get', reverse(
+            'budget:budgets_lists-search', kwargs={'pk': budgets_list.id}
+        ), {'q': 'pizza'}),
+        ('lists-insights', 'get', reverse(
+            'budget:budgets_lists-insights', kwargs={'pk': budgets_list.id}
+        ), None),
+        ('lists-export', 'get', reverse(
+            'budget:budgets_lists-export', kwargs={'pk': budgets_list.id}
+        ), None),
+        ('lists-export-job', 'post', reverse(
+            'budget:budgets_lists-export', kwargs={'pk': budgets_list.id}
+        ), {'type': 'csv'}),
+        ('budgets-list', 'get', reverse(
+            'budget:budgets-list', kwargs=list_kwargs
+        ), None),
+        ('budgets-detail', 'get', reverse(
+            'budget:budgets-detail', kwargs={**list_kwargs, 'pk': budget.id}
+        ), None),
+        ('budgets-detail-latest', 'get', reverse(
+            'budget:budgets-detail', kwargs={**list_kwargs, 'pk': budget.id}
+        ), {'latest': 20}),
+        ('budgets-summary', 'get', reverse(
+            'budget:budgets-summary', kwargs={**list_kwargs, 'pk': budget.id}
+        ), None),
+        ('budgets-history', 'get', reverse(
+            'budget:budgets-history', kwargs={**list_kwargs, 'pk': budget.id}
+        ), None),
+        ('budgets-history-daily', 'get', reverse(
+            'budget:budgets-history', kwargs={**list_kwargs, 'pk': budget.id}
+        ), {'interval': 'day', 'date_after': date.today() - timedelta(days=90)}),
+        ('budgets-export', 'get', reverse(
+            'budget:budgets-export', kwargs={**list_kwargs, 'pk': budget.id}
+        ), None),
+        ('budgets-rebuild', 'post', reverse(
+            'budget:budgets-rebuild', kwargs={**list_kwargs, 'pk': budget.id}
+        ), None),
+        ('categories-list', 'get', reverse('budget:categories-list'), None),
+        ('categories-detail', 'get', reverse(
+            'budget:categories-detail', kwargs={'pk': category.id}
+        ), None),
+        ('operations-list', 'get', reverse(
+            'budget:budget_operation-list', kwargs=budget_kwargs
+        ), None),
+        ('operations-list-keyset', 'get', reverse(
+            'budget:budget_operation-list', kwargs=budget_kwargs
+        ), {'pagination': 'keyset'}),
+        ('operations-list-filtered', 'get', reverse(
+            'budget:budget_operation-list', kwargs=budget_kwargs
+        ), {'category': operation.category.title, 'amount_min': 10}),
+        ('operations-detail', 'get', reverse(
+            'budget:budget_operation-detail',
+            kwargs={**budget_kwargs, 'pk': operation.id}
+        ), None),
+        ('operations-create', 'post', reverse(
+            'budget:budget_operation-list', kwargs=budget_kwargs
+        ), new_operation),
+        ('operations-bulk', 'post', reverse(
+            'budget:budget_operation-bulk', kwargs=budget_kwargs
+        ), [new_operation] * 100),
+        ('operations-import', 'upload', reverse(
+            'budget:budget_operation-import', kwargs=budget_kwargs
+        ), 'operation_type,category,amount\n' + import_file),
+        ('recurring-list', 'get', reverse(
+            'budget:recurring_operation-list', kwargs=budget_kwargs
+        ), None),
+        ('recurring-detail', 'get', reverse(
+            'budget:recurring_operation-detail',
+            kwargs={**budget_kwargs, 'pk': recurring.id}
+        ), None),
+        ('recurring-create', 'post', reverse(
+            'budget:recurring_operation-list', kwargs=budget_kwargs
+        ), new_recurring),
+        ('jobs-list', 'get', reverse('budget:jobs-list'), None),
+        ('jobs-detail', 'get', reverse(
+            'budget:jobs-detail', kwargs={'pk': job.id}
+        ), None),
+        ('jobs-download', 'get', reverse(
+            'budget:jobs-download', kwargs={'pk': job.id}
+        ), None),
+        ('share-list', 'get', reverse(
+            'budget:share_list-list', kwargs=list_kwargs
+        ), None),
+        ('access-cache-stats', 'get', reverse(
+            'budget:access_cache_stats'
+        ), None),
+    ]
+    if share is not None:
+        cases.append(('share-detail', 'get', reverse(
+            'budget:share_list-detail', kwargs={**list_kwargs, 'pk': share.id}
+        ), None))
+    return cases
+
+
+def request(client, method, url, data):
+    if method == 'get':
+        response = client.get(url, data)
+    elif method == 'upload':
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        response = client.post(url, {'file': SimpleUploadedFile(
+            'operations.csv', data.encode()
+        )}, format='multipart')
+    else:
+        response = client.post(url, data, format='json')
+    assert response.status_code < 300, (url, response.status_code)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def measure(client, case, repeat):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    name, method, url, data = case
+    request(client, method, url, data)
+
+    timer = Timer()
+    queries = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            with timer:
+                request(client, method, url, data)
+        queries.append(len(captured))
+
+    tracemalloc.start()
+    request(client, method, url, data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'p50': timer.percentile(50),
+        'p95': timer.percentile(95),
+        'p99': timer.percentile(99),
+        'queries': max(queries),
+        'memory_kib': round(peak / 1024, 1),
+    }
+
+
+def regressions(results, baseline, tolerance):
+    found = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if (result['p50'] > expected['p50'] * (1 + tolerance)
+                and result['p50'] - expected['p50'] > MIN_LATENCY_REGRESSION):
+            found.append(f'{name}: p50 {expected["p50"] * 1000:.2f} -> '
+                         f'{result["p50"] * 1000:.2f} ms')
+        if result['queries'] > expected['queries']:
+            found.append(f'{name}: queries {expected["queries"]} -> '
+                         f'{result["queries"]}')
+        if result['memory_kib'] > expected['memory_kib'] * (1 + tolerance):
+            found.append(f'{name}: memory {expected["memory_kib"]} -> '
+                         f'{result["memory_kib"]} KiB')
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--operations', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--only', nargs='+', metavar='NAME')
+    parser.add_argument('--save', metavar='PATH')
+    parser.add_argument('--compare', metavar='PATH')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    # Job uploads and exports go to a directory of their own.
+    job_files = tempfile.mkdtemp(prefix='budget-benchmark-')
+    os.environ['BUDGET_JOB_FILES_DIR'] = job_files
+    try:
+        run(args)
+    finally:
+        shutil.rmtree(job_files, ignore_errors=True)
+
+
+def run(args):
+    setup()
+    budget = create_dataset(args)
+    owner = budget.budget_list.owner
+    owner.is_staff = True
+    owner.save(update_fields=['is_staff'])
+    client = api_client(owner)
+    print(f'Largest budget: {budget.operations} operations')
+
+    results = {}
+    print(f'{"endpoint":<26} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+          f'{"queries":>8} {"KiB":>9}')
+    for case in endpoint_cases(budget):
+        if args.only and case[0] not in args.only:
+            continue
+        result = results[case[0]] = measure(client, case, args.repeat)
+        print(f'{case[0]:<26} {result["p50"] * 1000:>8.2f} '
+              f'{result["p95"] * 1000:>8.2f} {result["p99"] * 1000:>8.2f} '
+              f'{result["queries"]:>8} {result["memory_kib"]:>9.1f}')
+
+    if args.save:
+        with open(args.save, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            found = regressions(
+                results, json.load(baseline_file), args.tolerance
+            )
+        for line in found:
+            print(f'REGRESSION {line}')
+        if found:
+            sys.exit(1)
+        print('No regressions against the baseline')
+
+
+if __name__ == '__main__':
+    main()
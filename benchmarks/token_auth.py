@@ -0,0 +1,64 @@
+"""Compare DRF token authentication with the cached variant.
+
+Times ``authenticate`` on a request carrying a token, plus a full request to
+the budgets list with each authentication class.
+
+Usage: python -m benchmarks.token_auth [--repeat 2000]
+"""
+import argparse
+from unittest import mock
+
+from benchmarks.common import Timer, create_fixture, setup
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    setup()
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import reverse
+    from rest_framework.authentication import TokenAuthentication
+    from rest_framework.authtoken.models import Token
+    from rest_framework.test import APIRequestFactory
+    from rest_framework.views import APIView
+
+    from budget.authentication import CachedTokenAuthentication
+
+    user, _, _, _ = create_fixture()
+    key = Token.objects.create(user=user).key
+    header = f'Token {key}'
+    request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=header)
+    url = reverse('budget:budgets_lists-list')
+    client = Client()
+
+    for authentication in (TokenAuthentication, CachedTokenAuthentication):
+        backend = authentication()
+        backend.authenticate(request)
+        timer = Timer()
+        with CaptureQueriesContext(connection) as captured:
+            for _ in range(args.repeat):
+                with timer:
+                    backend.authenticate(request)
+        print(f'{authentication.__name__:<26} authenticate '
+              f'{timer.median * 1e6:>8.1f} us  '
+              f'{len(captured) / args.repeat:.1f} queries')
+
+        with mock.patch.object(
+                APIView, 'authentication_classes', [authentication]):
+            client.get(url, HTTP_AUTHORIZATION=header)
+            timer = Timer()
+            with CaptureQueriesContext(connection) as captured:
+                for _ in range(args.repeat // 10):
+                    with timer:
+                        client.get(url, HTTP_AUTHORIZATION=header)
+        print(f'{authentication.__name__:<26} request      '
+              f'{timer.median * 1000:>8.2f} ms  '
+              f'{len(captured) / (args.repeat // 10):.1f} queries')
+
+
+if __name__ == '__main__':
+    main()
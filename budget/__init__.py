@@ -0,0 +1 @@
+default_app_config = 'budget.apps.BudgetConfig'
@@ -0,0 +1,101 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.utils.functional import cached_property
+
+from .models import Budget, BudgetsList, SharePermission
+
+LIST_IDS_CACHE_KEY = 'budget:access:list_ids:{}'
+
+
+class CacheStats:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def as_dict(self):
+        with self.lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / total, 4) if total else None,
+        }
+
+
+access_cache_stats = CacheStats()
+
+
+def list_ids_cache_key(user_id):
+    return LIST_IDS_CACHE_KEY.format(user_id)
+
+
+def invalidate_list_ids(*user_ids):
+    keys = [list_ids_cache_key(user_id) for user_id in set(user_ids)]
+    cache.delete_many(keys)
+    # Also drop the entries once the transaction commits, so a concurrent
+    # request cannot re-cache the ids as they were before the change.
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class BudgetAccess:
+
+    def __init__(self, user):
+        self.user = user
+        self.budgets = {}
+
+    @cached_property
+    def list_ids(self):
+        if not settings.BUDGET_ACCESS_CACHE_TIMEOUT:
+            return self.load_list_ids()
+        key = list_ids_cache_key(self.user.id)
+        list_ids = cache.get(key)
+        access_cache_stats.record(hit=list_ids is not None)
+        if list_ids is None:
+            list_ids = self.load_list_ids()
+            cache.set(key, list_ids, settings.BUDGET_ACCESS_CACHE_TIMEOUT)
+        return list_ids
+
+    def load_list_ids(self):
+        owned = BudgetsList.objects.filter(
+            owner=self.user.id
+        ).values_list('id', flat=True).order_by()
+        shared = SharePermission.objects.filter(
+            user=self.user.id
+        ).values_list('budgets_list_id', flat=True).order_by()
+        return frozenset(owned.union(shared))
+
+    def can_access_list(self, list_id):
+        try:
+            return int(list_id) in self.list_ids
+        except (TypeError, ValueError):
+            return False
+
+    def get_budget(self, list_id, budget_id):
+        key = (int(list_id), int(budget_id))
+        if key not in self.budgets:
+            self.budgets[key] = get_object_or_404(
+                Budget, id=key[1], budget_list_id=key[0]
+            )
+        return self.budgets[key]
+
+
+def get_access(request):
+    access = getattr(request, '_budget_access', None)
+    if access is None:
+        access = BudgetAccess(request.user)
+        request._budget_access = access
+    return access
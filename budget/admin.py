@@ -1,9 +1,36 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+
+from .balances import reconcile
 from .models import (BudgetsList, Budget, BudgetOperation,
-                     Category, SharePermission)
+                     Category, CurrencyRate, Job, RecurringOperation,
+                     SharePermission)
+
+
+@admin.register(Budget)
+class BudgetAdmin(admin.ModelAdmin):
+    actions = ('reconcile_balances',)
+
+    @admin.action(description='Recompute balances from operations')
+    def reconcile_balances(self, request, queryset):
+        budget_ids = list(queryset.values_list('id', flat=True))
+        fixed = list(reconcile(budget_ids, fix=True))
+        self.message_user(
+            request,
+            f'Fixed {len(fixed)} of {len(budget_ids)} budget balances',
+            messages.WARNING if fixed else messages.SUCCESS
+        )
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'owner', 'progress', 'total',
+                    'attempts', 'created', 'finished')
+    list_filter = ('status', 'kind')
+
 
 admin.site.register(BudgetsList)
 admin.site.register(SharePermission)
-admin.site.register(Budget)
 admin.site.register(BudgetOperation)
 admin.site.register(Category)
+admin.site.register(CurrencyRate)
+admin.site.register(RecurringOperation)
@@ -1,5 +1,23 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db import connections
+from django.db.models.signals import post_migrate
+
+
+def restore_search_triggers(sender, using, **kwargs):
+    from .search import restore
+
+    restore(connections[using])
 
 
 class BudgetConfig(AppConfig):
     name = 'budget'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .metrics import instrument_serializers
+
+        if settings.BUDGET_METRICS_ENABLED:
+            instrument_serializers()
+
+        post_migrate.connect(restore_search_triggers, sender=self)
@@ -0,0 +1,112 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers import asgi
+from django.db import close_old_connections, connections
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def read_in_pool(view, request, *args, **kwargs):
+    # Pool threads are not covered by the request_started/finished signals,
+    # so they manage their own database connection.
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, 'render', None)):
+            response.render()
+        # Streaming content is read later, on a thread of its own (see
+        # ASGIHandler below).
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_read_view(view):
+    if not settings.BUDGET_ASYNC_READS:
+        # Under WSGI an async view would need an event loop per request,
+        # so the view stays sync.
+        return view
+    read = sync_to_async(read_in_pool, thread_sensitive=False)
+    call = sync_to_async(view, thread_sensitive=True)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        # Under ASGI, Django 3.2 runs every sync view on one shared thread.
+        # Reads go to the executor pool instead, so one worker can serve
+        # many of them at once. Writes keep the default.
+        if (isinstance(request, asgi.ASGIRequest)
+                and request.method in READ_METHODS):
+            return await read(view, request, *args, **kwargs)
+        return await call(request, *args, **kwargs)
+
+    return wrapper
+
+
+class AsyncReadMixin:
+
+    @classmethod
+    def as_view(cls, *args, **kwargs):
+        return async_read_view(super().as_view(*args, **kwargs))
+
+
+def read_part(parts):
+    return next(parts, None)
+
+
+def close_streamed(response):
+    # Closes the iterator on the thread that read it; request_finished only
+    # closes expired connections, this thread goes away with its own.
+    try:
+        response.close()
+    finally:
+        connections.close_all()
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    # Django 3.2 iterates streaming responses inside the event loop, where
+    # the ORM refuses to run and every read blocks the other requests.
+    # Parts are read on a thread of the response's own instead, which also
+    # keeps iterator() cursors on one connection.
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        headers = [
+            (
+                header.encode('ascii') if isinstance(header, str) else header,
+                value.encode('latin1') if isinstance(value, str) else value,
+            )
+            for header, value in response.items()
+        ]
+        for cookie in response.cookies.values():
+            headers.append((
+                b'Set-Cookie',
+                cookie.output(header='').encode('ascii').strip()
+            ))
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': headers,
+        })
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            parts = iter(response)
+            while True:
+                part = await loop.run_in_executor(executor, read_part, parts)
+                if part is None:
+                    break
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    })
+            await send({'type': 'http.response.body'})
+        finally:
+            await loop.run_in_executor(executor, close_streamed, response)
+            executor.shutdown(wait=False)
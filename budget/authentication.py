@@ -0,0 +1,39 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+
+from .access import CacheStats
+
+TOKEN_CACHE_KEY = 'budget:auth:token:{}'
+
+token_cache_stats = CacheStats()
+
+
+def token_cache_key(key):
+    # Keep raw tokens out of the cache, whose keys may be visible to others.
+    return TOKEN_CACHE_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def invalidate_tokens(*keys):
+    cache_keys = [token_cache_key(key) for key in set(keys)]
+    cache.delete_many(cache_keys)
+    transaction.on_commit(lambda: cache.delete_many(cache_keys))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        if not settings.BUDGET_TOKEN_CACHE_TIMEOUT:
+            return super().authenticate_credentials(key)
+        cache_key = token_cache_key(key)
+        credentials = cache.get(cache_key)
+        token_cache_stats.record(hit=credentials is not None)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            cache.set(
+                cache_key, credentials, settings.BUDGET_TOKEN_CACHE_TIMEOUT
+            )
+        return credentials
@@ -0,0 +1,74 @@
+from collections import namedtuple
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Budget, BudgetOperation, BudgetsList
+
+CENT = Decimal('0.01')
+
+Drift = namedtuple('Drift', 'budget_id budget_list_id stored expected')
+
+
+def operation_total(operation_type):
+    return Coalesce(
+        Sum(
+            'budget_operations__amount',
+            filter=Q(budget_operations__operation_type=operation_type)
+        ),
+        Value(Decimal('0.00')),
+        output_field=DecimalField(max_digits=19, decimal_places=2)
+    )
+
+
+def balance_rows(budget_ids=None):
+    budgets = Budget.objects.all()
+    if budget_ids is not None:
+        budgets = budgets.filter(id__in=budget_ids)
+    return budgets.order_by('id').annotate(
+        income=operation_total(BudgetOperation.OperationType.INCOME),
+        expense=operation_total(BudgetOperation.OperationType.EXPENSE)
+    ).values_list(
+        'id', 'budget_list_id', 'initial_balance', 'balance',
+        'income', 'expense'
+    )
+
+
+def find_drift(budget_ids=None, chunk_size=2000):
+    rows = balance_rows(budget_ids).iterator(chunk_size=chunk_size)
+    for budget_id, list_id, initial, stored, income, expense in rows:
+        # SQLite sums decimals as floats, so compare them to the cent.
+        expected = (initial + income - expense).quantize(CENT)
+        if stored.quantize(CENT) != expected:
+            yield Drift(budget_id, list_id, stored, expected)
+
+
+def fix_drift(budget_ids):
+    with transaction.atomic():
+        # Lock the budgets and recompute under the lock, so operations saved
+        # since the drift was found are not undone.
+        locked = list(Budget.objects.select_for_update().filter(
+            id__in=budget_ids
+        ).order_by('id').values_list('id', flat=True))
+        fixed = list(find_drift(locked))
+        Budget.objects.bulk_update(
+            [Budget(pk=drift.budget_id, balance=drift.expected)
+             for drift in fixed],
+            ['balance']
+        )
+        if fixed:
+            BudgetsList.touch(*{drift.budget_list_id for drift in fixed})
+    return fixed
+
+
+def reconcile(budget_ids=None, fix=False, batch_size=500):
+    if not fix:
+        yield from find_drift(budget_ids)
+        return
+    # Finish the scan before writing: SQLite does not isolate an open cursor
+    # from updates made on the same connection.
+    drifted = [drift.budget_id for drift in find_drift(budget_ids)]
+    for start in range(0, len(drifted), batch_size):
+        yield from fix_drift(drifted[start:start + batch_size])
@@ -0,0 +1,150 @@
+import csv
+import io
+
+from django.db.models import Q
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from .models import Budget, BudgetOperation
+
+COLUMNS = (
+    ('id', 'id'),
+    ('budget', 'budget_id'),
+    ('budget_title', 'budget__title'),
+    ('currency', 'budget__currency'),
+    ('date', 'date'),
+    ('operation_type', 'operation_type'),
+    ('category', 'category__title'),
+    ('amount', 'amount'),
+    ('note', 'note'),
+    ('user', 'user__username'),
+)
+FORMATS = ('csv', 'arrow', 'parquet')
+ARROW_FORMATS = ('arrow', 'parquet')
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet',
+}
+EXTENSIONS = {'csv': 'csv', 'arrow': 'arrows', 'parquet': 'parquet'}
+
+
+def available_formats():
+    if pyarrow is None:
+        return FORMATS[:1]
+    return FORMATS
+
+
+def column_chunks(list_id, chunk_size):
+    budget_ids = list(Budget.objects.filter(
+        budget_list_id=list_id
+    ).order_by('id').values_list('id', flat=True))
+    fields = [field for _, field in COLUMNS]
+    date_index = fields.index('date')
+    # Every chunk is a separate keyset query on the (budget, date, id)
+    # index, so no read stays open between chunks and callers may write
+    # (e.g. job progress) while exporting, which SQLite would refuse.
+    for budget_id in budget_ids:
+        operations = BudgetOperation.objects.filter(
+            budget_id=budget_id
+        ).order_by('date', 'id').values_list(*fields)
+        chunk = list(operations[:chunk_size])
+        while chunk:
+            yield [list(column) for column in zip(*chunk)]
+            if len(chunk) < chunk_size:
+                break
+            last_date, last_id = chunk[-1][date_index], chunk[-1][0]
+            chunk = list(operations.filter(
+                Q(date__gt=last_date) | Q(date=last_date, id__gt=last_id)
+            )[:chunk_size])
+
+
+def stream_csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(name for name, _ in COLUMNS)
+    date_index = [name for name, _ in COLUMNS].index('date')
+    for columns in chunks:
+        columns[date_index] = [
+            value.isoformat() for value in columns[date_index]
+        ]
+        writer.writerows(zip(*columns))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def arrow_schema():
+    return pyarrow.schema([
+        ('id', pyarrow.int64()),
+        ('budget', pyarrow.int64()),
+        ('budget_title', pyarrow.string()),
+        ('currency', pyarrow.string()),
+        ('date', pyarrow.timestamp('us', tz='UTC')),
+        ('operation_type', pyarrow.string()),
+        ('category', pyarrow.string()),
+        ('amount', pyarrow.decimal128(19, 2)),
+        ('note', pyarrow.string()),
+        ('user', pyarrow.string()),
+    ])
+
+
+class StreamSink:
+    # Writers see one growing file; the response takes what was written
+    # after every batch, so only one batch is held in memory at a time.
+
+    closed = False
+
+    def __init__(self):
+        self.buffers = []
+        self.position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self.buffers.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.buffers)
+        self.buffers = []
+        return data
+
+
+def stream_arrow(chunks, file_format):
+    schema = arrow_schema()
+    sink = StreamSink()
+    if file_format == 'parquet':
+        writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    else:
+        writer = pyarrow.ipc.new_stream(sink, schema)
+    for columns in chunks:
+        writer.write_batch(pyarrow.record_batch(columns, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def stream_columns(chunks, file_format):
+    if file_format in ARROW_FORMATS:
+        return stream_arrow(chunks, file_format)
+    return stream_csv(chunks)
+
+
+def stream_operations(list_id, file_format, chunk_size):
+    return stream_columns(column_chunks(list_id, chunk_size), file_format)
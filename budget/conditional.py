@@ -0,0 +1,86 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import BudgetsList
+
+RESPONSE_CACHE_KEY = 'budget:response:{}'
+
+
+def list_versions(*list_ids):
+    return sorted(BudgetsList.objects.filter(
+        id__in=list_ids
+    ).values_list('id', 'version').order_by())
+
+
+class ConditionalGetMixin:
+    etag_actions = ('list', 'retrieve')
+
+    def get_etag_versions(self):
+        return list_versions(self.kwargs['list_id'])
+
+    def get_etag(self, request):
+        if (request.method not in ('GET', 'HEAD')
+                or self.action not in self.etag_actions):
+            return None
+        versions = self.get_etag_versions()
+        if not versions:
+            return None
+        # Paginated bodies link to absolute URLs, so the host and scheme
+        # are part of the representation.
+        source = '|'.join((
+            request.build_absolute_uri(),
+            request.accepted_media_type,
+            repr(versions),
+        ))
+        return '"{}"'.format(hashlib.md5(source.encode()).hexdigest())
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        if etag is None:
+            return handler(request, *args, **kwargs)
+
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED,
+                headers={'ETag': etag}
+            )
+
+        timeout = settings.BUDGET_RESPONSE_CACHE_TIMEOUT
+        key = RESPONSE_CACHE_KEY.format(etag.strip('"'))
+        if timeout:
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                response['ETag'] = etag
+                return response
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        response['ETag'] = etag
+        if timeout:
+            response.add_post_render_callback(
+                lambda rendered: cache.set(
+                    key,
+                    (rendered.content, rendered['Content-Type']),
+                    timeout
+                )
+            )
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
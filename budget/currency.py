@@ -0,0 +1,36 @@
+from decimal import Decimal
+
+from django.conf import settings
+
+from .models import CurrencyRate
+
+CENT = Decimal('0.01')
+
+
+class RateNotFound(Exception):
+    pass
+
+
+def get_rate(currency, date):
+    if currency == settings.BUDGET_BASE_CURRENCY:
+        return Decimal('1')
+    rate = CurrencyRate.objects.filter(
+        currency=currency, date__lte=date
+    ).order_by('-date').values_list('rate', flat=True).first()
+    if rate is None:
+        raise RateNotFound(f'No {currency} rate on or before {date}')
+    return rate
+
+
+def convert(amount, currency, target, date, rates=None):
+    # ``rates`` memoizes lookups for one caller only, rates are always read
+    # from the database so every process sees changes at once.
+    amount = Decimal(amount)
+    if currency == target:
+        return amount.quantize(CENT)
+    if rates is None:
+        rates = {}
+    for code in (currency, target):
+        if code not in rates:
+            rates[code] = get_rate(code, date)
+    return (amount * rates[currency] / rates[target]).quantize(CENT)
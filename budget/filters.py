@@ -1,14 +1,76 @@
+from datetime import datetime, timedelta
+
 import django_filters as filters
 
-from .models import BudgetOperation
+from .history import day_start
+from .models import BudgetOperation, BudgetSummary, Category
+
+DATETIME_INPUT_FORMATS = (
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d',
+    '%d/%m/%Y %H:%M:%S',
+    '%d/%m/%Y',
+)
+DATE_INPUT_FORMATS = ('%Y-%m-%d', '%d/%m/%Y')
+
+
+def is_date_only(value):
+    for date_format in DATE_INPUT_FORMATS:
+        try:
+            datetime.strptime(value.strip(), date_format)
+        except ValueError:
+            continue
+        return True
+    return False
 
 
 class OperationFilter(filters.FilterSet):
-    category = filters.CharFilter(
-        field_name='category__title',
-        lookup_expr='contains'
+    category = filters.CharFilter(field_name='category__title')
+    category_id = filters.NumberFilter(field_name='category_id')
+    category_prefix = filters.CharFilter(method='filter_category_title')
+    category_contains = filters.CharFilter(method='filter_category_title')
+    date_after = filters.DateTimeFilter(
+        field_name='date',
+        lookup_expr='gte',
+        input_formats=DATETIME_INPUT_FORMATS
+    )
+    date_before = filters.DateTimeFilter(
+        method='filter_date_before',
+        input_formats=DATETIME_INPUT_FORMATS
     )
+    amount_min = filters.NumberFilter(field_name='amount', lookup_expr='gte')
+    amount_max = filters.NumberFilter(field_name='amount', lookup_expr='lte')
+    user = filters.CharFilter(field_name='user__username')
 
     class Meta:
         model = BudgetOperation
         fields = ('category', 'operation_type')
+
+    def filter_category_title(self, queryset, name, value):
+        lookup = {
+            'category_prefix': 'title__startswith',
+            'category_contains': 'title__contains',
+        }[name]
+        # Match against the small category table first, so the operations
+        # are still read through the (budget, date) index.
+        categories = Category.objects.filter(**{lookup: value}).values('id')
+        return queryset.filter(category_id__in=categories)
+
+    def filter_date_before(self, queryset, name, value):
+        if is_date_only(self.data.get(name, '')):
+            # A bare date covers the whole day, as in the balance history.
+            return queryset.filter(
+                date__lt=day_start(value.date() + timedelta(days=1))
+            )
+        return queryset.filter(date__lte=value)
+
+
+class SummaryFilter(filters.FilterSet):
+    month_after = filters.DateFilter(field_name='month', lookup_expr='gte')
+    month_before = filters.DateFilter(field_name='month', lookup_expr='lte')
+    category = filters.CharFilter(field_name='category__title')
+
+    class Meta:
+        model = BudgetSummary
+        fields = ('category', 'operation_type')
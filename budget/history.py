@@ -0,0 +1,89 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Max, Min, Q, Sum
+from django.utils import timezone
+
+INTERVALS = ('day', 'week', 'month', 'year')
+
+
+class TooManyPoints(Exception):
+    pass
+
+
+def bucket_count(kind, start, end):
+    if kind == 'day':
+        return (end - start).days + 1
+    if kind == 'week':
+        return (end - start).days // 7 + 2
+    if kind == 'month':
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    return end.year - start.year + 1
+
+
+def choose_interval(kind, start, end):
+    limit = settings.BUDGET_HISTORY_MAX_POINTS
+    if kind != 'auto':
+        if bucket_count(kind, start, end) > limit:
+            raise TooManyPoints(
+                f'More than {limit} {kind} points between {start} and '
+                f'{end}, pick a longer interval or a shorter period.'
+            )
+        return kind
+    for kind in INTERVALS:
+        if bucket_count(kind, start, end) <= limit:
+            return kind
+    return INTERVALS[-1]
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def balance_history(budget, interval='auto', date_after=None,
+                    date_before=None):
+    # Bounds on the raw datetime, unlike __date lookups, can use the
+    # (budget, date) index.
+    operations = budget.budget_operations.all()
+    if date_before is not None:
+        operations = operations.filter(
+            date__lt=day_start(date_before + timedelta(days=1))
+        )
+    aggregates = {'first': Min('date'), 'last': Max('date')}
+    if date_after is not None:
+        # Operations before the period only move its opening balance.
+        aggregates['opening'] = Sum(
+            operations.signed_amount(),
+            filter=Q(date__lt=day_start(date_after))
+        )
+    span = operations.aggregate(**aggregates)
+    opening = budget.initial_balance + (span.get('opening') or 0)
+    if date_after is not None:
+        operations = operations.filter(date__gte=day_start(date_after))
+
+    start = date_after or (
+        timezone.localtime(span['first']).date()
+        if span['first'] else timezone.localdate()
+    )
+    end = date_before or (
+        timezone.localtime(span['last']).date()
+        if span['last'] else start
+    )
+    kind = choose_interval(interval, start, max(start, end))
+
+    points = []
+    previous = opening
+    for row in operations.running_totals(kind):
+        balance = (opening + row['total']).quantize(Decimal('0.01'))
+        points.append({
+            'date': row['bucket'],
+            'change': str(balance - previous),
+            'balance': str(balance),
+        })
+        previous = balance
+    return {
+        'interval': kind,
+        'opening_balance': str(opening.quantize(Decimal('0.01'))),
+        'points': points,
+    }
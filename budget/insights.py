@@ -0,0 +1,161 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Sum
+
+from .models import BudgetOperation, BudgetsListInsights, BudgetSummary
+
+HISTORY_MONTHS = 6
+MIN_HISTORY_MONTHS = 3
+ANOMALY_RATIO = Decimal('2')
+MIN_CHANGE_PERCENT = 10
+TOP_CATEGORIES = 3
+
+CENT = Decimal('0.01')
+EXPENSE = BudgetOperation.OperationType.EXPENSE
+INCOME = BudgetOperation.OperationType.INCOME
+
+
+def shift_month(month, months):
+    year, index = divmod(month.year * 12 + month.month - 1 + months, 12)
+    return month.replace(year=year, month=index + 1, day=1)
+
+
+def change_percent(total, previous):
+    if not previous:
+        return None
+    return int(((total - previous) / previous * 100).quantize(Decimal('1')))
+
+
+def category_label(title):
+    return title if title is not None else 'uncategorized operations'
+
+
+def summary_rows(list_id, months):
+    return BudgetSummary.objects.filter(
+        budget__budget_list_id=list_id, month__in=months
+    ).values(
+        'budget__currency', 'category__title', 'operation_type', 'month'
+    ).annotate(total=Sum('total')).order_by()
+
+
+def currency_insights(currency, month, totals, categories, messages):
+    previous_month = shift_month(month, -1)
+    history = [shift_month(month, -offset)
+               for offset in range(1, HISTORY_MONTHS + 1)]
+    active_months = [
+        past for past in history
+        if totals[(EXPENSE, past)] or totals[(INCOME, past)]
+    ]
+    insights = {'currency': currency}
+    for operation_type, name in ((EXPENSE, 'expense'), (INCOME, 'income')):
+        total = totals[(operation_type, month)]
+        previous = totals[(operation_type, previous_month)]
+        insights[name] = str(total)
+        insights[f'previous_{name}'] = str(previous)
+        insights[f'{name}_change'] = change_percent(total, previous)
+
+    rows = []
+    anomalies = []
+    for title, by_month in categories.items():
+        total = by_month[month]
+        previous = by_month[previous_month]
+        if total or previous:
+            change = change_percent(total, previous)
+            rows.append({
+                'category': title,
+                'total': str(total),
+                'previous': str(previous),
+                'change': change,
+            })
+            if change is not None and abs(change) >= MIN_CHANGE_PERCENT:
+                messages.append(
+                    f'You spent {abs(change)}% '
+                    f'{"more" if change > 0 else "less"} on '
+                    f'{category_label(title)} than last month'
+                )
+        if len(active_months) < MIN_HISTORY_MONTHS or not total:
+            continue
+        average = (
+            sum(by_month[past] for past in active_months) / len(active_months)
+        ).quantize(CENT)
+        if average and total >= average * ANOMALY_RATIO:
+            ratio = (total / average).quantize(Decimal('0.1'))
+            anomalies.append({
+                'category': title,
+                'total': str(total),
+                'average': str(average),
+                'ratio': str(ratio),
+            })
+            messages.append(
+                f'Spending on {category_label(title)} is {ratio} times your '
+                f'{len(active_months)}-month average'
+            )
+
+    rows.sort(key=lambda row: -Decimal(row['total']))
+    expense = totals[(EXPENSE, month)]
+    insights['categories'] = rows
+    insights['top_categories'] = [
+        {
+            'category': row['category'],
+            'total': row['total'],
+            'share': int((Decimal(row['total']) / expense * 100).quantize(
+                Decimal('1')
+            )),
+        }
+        for row in rows[:TOP_CATEGORIES] if Decimal(row['total'])
+    ]
+    insights['anomalies'] = anomalies
+    return insights
+
+
+def compute_insights(list_id, month):
+    months = [shift_month(month, -offset)
+              for offset in range(HISTORY_MONTHS + 1)]
+    totals = defaultdict(lambda: defaultdict(Decimal))
+    categories = defaultdict(
+        lambda: defaultdict(lambda: defaultdict(Decimal))
+    )
+    for row in summary_rows(list_id, months):
+        # SQLite sums decimals as floats, so round them to the cent.
+        total = Decimal(row['total']).quantize(CENT)
+        currency = row['budget__currency']
+        totals[currency][(row['operation_type'], row['month'])] += total
+        if row['operation_type'] == EXPENSE:
+            categories[currency][row['category__title']][row['month']] += (
+                total
+            )
+
+    messages = []
+    return {
+        'month': month.isoformat(),
+        'currencies': [
+            currency_insights(
+                currency, month, totals[currency], categories[currency],
+                messages
+            )
+            for currency in sorted(totals)
+        ],
+        'messages': messages,
+    }
+
+
+def get_insights(budgets_list, month):
+    # Summaries are kept up to date on every operation write and every write
+    # (or a rename of a category it uses) bumps the list version, so stored
+    # insights are reused until then.
+    stored = BudgetsListInsights.objects.filter(
+        budgets_list=budgets_list, month=month
+    ).first()
+    if stored is not None and stored.list_version == budgets_list.version:
+        return stored.data
+    data = compute_insights(budgets_list.id, month)
+    BudgetsListInsights.objects.update_or_create(
+        budgets_list=budgets_list,
+        month=month,
+        defaults={
+            'list_version': budgets_list.version,
+            'data': data,
+        }
+    )
+    return data
@@ -0,0 +1,299 @@
+import csv
+import io
+import logging
+import os
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .balances import fix_drift
+from .columnar import (EXTENSIONS, available_formats, column_chunks,
+                       stream_columns)
+from .models import Budget, BudgetOperation, BudgetsList, Job
+from .serializers import BudgetOperationSerializer
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+EXPORT_CHUNK_SIZE = 10000
+IMPORT_CHUNK_SIZE = 500
+FINISHED = (Job.Status.SUCCEEDED, Job.Status.FAILED)
+
+
+class JobFailed(Exception):
+    # Errors a retry would not fix, the job fails at once.
+    pass
+
+
+def handler(kind):
+    def register(function):
+        HANDLERS[kind] = function
+        return function
+    return register
+
+
+def job_path(name):
+    return os.path.join(settings.BUDGET_JOB_FILES_DIR, name)
+
+
+def enqueue(kind, owner, budgets_list_id, upload=None, **payload):
+    with transaction.atomic():
+        job = Job.objects.create(
+            kind=kind,
+            owner=owner,
+            budgets_list_id=budgets_list_id,
+            payload=payload,
+            max_attempts=settings.BUDGET_JOB_MAX_ATTEMPTS
+        )
+        if upload is not None:
+            job.payload['file'] = f'job-{job.id}-upload'
+            os.makedirs(settings.BUDGET_JOB_FILES_DIR, exist_ok=True)
+            with open(job_path(job.payload['file']), 'wb') as file:
+                for chunk in upload.chunks():
+                    file.write(chunk)
+            job.save(update_fields=['payload'])
+    return job
+
+
+def retry_job(job):
+    return Job.objects.filter(pk=job.pk, status=Job.Status.FAILED).update(
+        status=Job.Status.QUEUED,
+        attempts=0,
+        error='',
+        run_after=timezone.now(),
+        finished=None
+    )
+
+
+def claim(worker, count):
+    now = timezone.now()
+    with transaction.atomic():
+        job_ids = list(Job.objects.select_for_update(skip_locked=True).filter(
+            status=Job.Status.QUEUED, run_after__lte=now
+        ).order_by('run_after', 'id').values_list('id', flat=True)[:count])
+        # SQLite ignores the row locks, the status check keeps two workers
+        # from taking the same job.
+        Job.objects.filter(id__in=job_ids, status=Job.Status.QUEUED).update(
+            status=Job.Status.RUNNING,
+            worker=worker,
+            attempts=F('attempts') + 1,
+            started=now,
+            heartbeat=now,
+            finished=None
+        )
+    return list(Job.objects.filter(
+        id__in=job_ids, status=Job.Status.RUNNING, worker=worker
+    ).order_by('id').values_list('id', flat=True))
+
+
+def heartbeat(job_ids, worker):
+    Job.objects.filter(
+        id__in=job_ids, status=Job.Status.RUNNING, worker=worker
+    ).update(heartbeat=timezone.now())
+
+
+def claimed(job):
+    # The job as long as it runs under the claim it was read with. Once a
+    # run is given up on (and maybe claimed again) it can change nothing.
+    return Job.objects.filter(
+        pk=job.pk,
+        status=Job.Status.RUNNING,
+        worker=job.worker,
+        started=job.started
+    )
+
+
+def finish(jobs, status, **fields):
+    return jobs.update(status=status, finished=timezone.now(), **fields)
+
+
+def fail_attempt(job, error):
+    jobs = claimed(job)
+    if job.attempts >= job.max_attempts:
+        return finish(jobs, Job.Status.FAILED, error=error)
+    delay = settings.BUDGET_JOB_RETRY_DELAY * 2 ** max(job.attempts - 1, 0)
+    return jobs.update(
+        status=Job.Status.QUEUED,
+        error=error,
+        worker='',
+        run_after=timezone.now() + timedelta(seconds=delay)
+    )
+
+
+def requeue_stale(stale_after):
+    stale = Job.objects.filter(
+        status=Job.Status.RUNNING,
+        heartbeat__lt=timezone.now() - timedelta(seconds=stale_after)
+    )
+    for job in stale:
+        fail_attempt(job, 'The worker running the job stopped.')
+
+
+def purge(days):
+    finished = Job.objects.filter(
+        status__in=FINISHED,
+        finished__lt=timezone.now() - timedelta(days=days)
+    )
+    for payload, result in finished.values_list('payload', 'result'):
+        for name in (payload.get('file'), (result or {}).get('file')):
+            if name and os.path.exists(job_path(name)):
+                os.remove(job_path(name))
+    return finished.delete()[0]
+
+
+class JobLost(Exception):
+    # The job was given up on while running, e.g. after missing heartbeats.
+    pass
+
+
+class Progress:
+
+    def __init__(self, job):
+        self.job = job
+
+    def update(self, done, total=None):
+        # Every update is also a heartbeat, so long jobs are not taken for
+        # lost while they make progress.
+        fields = {'progress': done, 'heartbeat': timezone.now()}
+        if total is not None:
+            fields['total'] = total
+        if not claimed(self.job).update(**fields):
+            raise JobLost(f'Job {self.job.pk} is no longer claimed.')
+        self.job.progress = done
+
+
+def run_job(job_id):
+    # Worker processes are not covered by the request signals, so they
+    # manage their own database connection like the ASGI read pool.
+    close_old_connections()
+    try:
+        job = Job.objects.filter(
+            pk=job_id, status=Job.Status.RUNNING
+        ).first()
+        if job is None:
+            return job_id
+        try:
+            result = HANDLERS[job.kind](job, Progress(job))
+        except JobLost:
+            logger.warning('Job %s was given up on while running', job_id)
+        except JobFailed as error:
+            finish(claimed(job), Job.Status.FAILED, error=str(error))
+        except Exception as error:
+            logger.exception('Job %s failed', job_id)
+            fail_attempt(job, f'{type(error).__name__}: {error}')
+        else:
+            finish(
+                claimed(job), Job.Status.SUCCEEDED, result=result, error=''
+            )
+        return job_id
+    finally:
+        close_old_connections()
+
+
+@handler(Job.Kind.EXPORT)
+def export_operations(job, progress):
+    file_format = job.payload.get('type', 'csv')
+    if file_format not in available_formats():
+        raise JobFailed(f'Exporting {file_format} requires pyarrow.')
+    list_id = job.budgets_list_id
+    progress.update(0, BudgetOperation.objects.filter(
+        budget__budget_list_id=list_id
+    ).count())
+
+    def chunks():
+        for columns in column_chunks(list_id, EXPORT_CHUNK_SIZE):
+            yield columns
+            progress.update(progress.job.progress + len(columns[0]))
+
+    name = (f'job-{job.id}-list-{list_id}-operations.'
+            f'{EXTENSIONS[file_format]}')
+    os.makedirs(settings.BUDGET_JOB_FILES_DIR, exist_ok=True)
+    with open(job_path(name), 'wb') as file:
+        for data in stream_columns(chunks(), file_format):
+            file.write(data.encode() if isinstance(data, str) else data)
+    return {'file': name, 'type': file_format, 'rows': job.progress}
+
+
+def csv_rows(file):
+    for row in csv.DictReader(file):
+        yield {key: value for key, value in row.items() if value != ''}
+
+
+def import_chunks(name, skip=0):
+    with open(job_path(name), newline='', encoding='utf-8') as file:
+        rows = islice(csv_rows(file), skip, None)
+        start = skip
+        while True:
+            chunk = list(islice(rows, IMPORT_CHUNK_SIZE))
+            if not chunk:
+                return
+            yield start, chunk
+            start += len(chunk)
+
+
+def validated(start, chunk):
+    serializer = BudgetOperationSerializer(data=chunk, many=True)
+    if not serializer.is_valid():
+        number, errors = next(
+            (number, errors)
+            for number, errors in enumerate(serializer.errors, start + 1)
+            if errors
+        )
+        raise JobFailed(f'Row {number}: ' + '; '.join(
+            f'{field}: {" ".join(map(str, messages))}'
+            for field, messages in errors.items()
+        ))
+    return serializer
+
+
+@handler(Job.Kind.IMPORT_OPERATIONS)
+def import_operations(job, progress):
+    budget = Budget.objects.filter(
+        pk=job.payload['budget'], budget_list_id=job.budgets_list_id
+    ).first()
+    if budget is None:
+        raise JobFailed('The budget no longer exists.')
+    total = 0
+    try:
+        # Check every row before saving any, so a bad file imports nothing.
+        for start, chunk in import_chunks(job.payload['file']):
+            validated(start, chunk)
+            total += len(chunk)
+        # Progress is stored with every chunk, so a retry resumes after the
+        # rows that were already imported.
+        progress.update(job.progress, total)
+        for start, chunk in import_chunks(
+                job.payload['file'], skip=job.progress):
+            serializer = validated(start, chunk)
+            with transaction.atomic():
+                serializer.save(user=job.owner, budget=budget)
+                progress.update(start + len(chunk))
+    except (UnicodeDecodeError, csv.Error):
+        raise JobFailed('Upload a valid UTF-8 CSV file.')
+    budget.refresh_from_db(fields=['balance'])
+    return {'created': total, 'balance': str(budget.balance)}
+
+
+@handler(Job.Kind.REBUILD_BUDGET)
+def rebuild_budget(job, progress):
+    budget_id = job.payload['budget']
+    if not Budget.objects.filter(
+            pk=budget_id, budget_list_id=job.budgets_list_id).exists():
+        raise JobFailed('The budget no longer exists.')
+    progress.update(0, 2)
+    call_command(
+        'rebuild_budget_summaries', budgets=[budget_id], stdout=io.StringIO()
+    )
+    BudgetsList.touch(job.budgets_list_id)
+    progress.update(1)
+    fixed = fix_drift([budget_id])
+    progress.update(2)
+    return {
+        'balance': str(Budget.objects.get(pk=budget_id).balance),
+        'balance_fixed': bool(fixed),
+    }
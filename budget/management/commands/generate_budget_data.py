@@ -0,0 +1,245 @@
+import random
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from budget.models import (Budget, BudgetOperation, BudgetsList,
+                           BudgetSummary, Category, SharePermission)
+
+User = get_user_model()
+
+EXPENSE_CATEGORIES = {
+    'Food': ('groceries', 'lunch with colleagues', 'pizza', 'bakery'),
+    'Rent': ('monthly rent', 'deposit'),
+    'Utilities': ('electricity bill', 'water bill', 'internet'),
+    'Transport': ('bus ticket', 'fuel', 'taxi home', 'train to the city'),
+    'Health': ('pharmacy', 'dentist', 'gym membership'),
+    'Entertainment': ('cinema', 'concert tickets', 'streaming subscription'),
+    'Clothes': ('winter jacket', 'shoes', 'school uniform'),
+    'Education': ('books', 'online course', 'school trip'),
+    'Travel': ('hotel', 'flight tickets', 'souvenirs'),
+    'Gifts': ('birthday present', 'flowers'),
+}
+INCOME_CATEGORIES = {
+    'Salary': ('monthly salary', 'bonus'),
+    'Freelance': ('website project', 'consulting'),
+    'Refunds': ('tax refund', 'returned order'),
+}
+BUDGET_TITLES = ('Cash', 'Card', 'Savings', 'Vacation', 'Kids', 'Car')
+
+
+class Command(BaseCommand):
+    help = ('Generate synthetic users, shared budget lists, budgets and '
+            'operations with bulk inserts, for benchmarks and load tests.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--lists-per-user', type=int, default=2)
+        parser.add_argument('--shares-per-list', type=int, default=1)
+        parser.add_argument('--budgets-per-list', type=int, default=3)
+        parser.add_argument(
+            '--operations',
+            type=int,
+            default=100000,
+            help='Total number of operations, spread unevenly over budgets.'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='Operations are dated over this many days up to now.'
+        )
+        parser.add_argument('--prefix', default='synthetic')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def create_users(self, prefix, count):
+        usernames = [f'{prefix}{number:05d}' for number in range(count)]
+        if User.objects.filter(username__in=usernames).exists():
+            raise CommandError(
+                f'Users named "{prefix}..." already exist, pass another '
+                f'--prefix.'
+            )
+        password = make_password(None)
+        User.objects.bulk_create(
+            [User(username=username, password=password)
+             for username in usernames],
+            batch_size=self.batch_size
+        )
+        return list(User.objects.filter(username__in=usernames))
+
+    def create_categories(self):
+        titles = list(EXPENSE_CATEGORIES) + list(INCOME_CATEGORIES)
+        existing = {
+            category.title: category
+            for category in Category.objects.filter(title__in=titles)
+        }
+        missing = [title for title in titles if title not in existing]
+        if missing:
+            Category.objects.bulk_create(
+                [Category(title=title) for title in missing]
+            )
+            existing.update(
+                (category.title, category)
+                for category in Category.objects.filter(title__in=missing)
+            )
+        return existing
+
+    def create_lists(self, users, lists_per_user, shares_per_list):
+        BudgetsList.objects.bulk_create(
+            [
+                BudgetsList(title=f'Family budget {number + 1}', owner=user)
+                for user in users
+                for number in range(lists_per_user)
+            ],
+            batch_size=self.batch_size
+        )
+        budgets_lists = list(BudgetsList.objects.filter(owner__in=users))
+        members = {}
+        shares = []
+        for budgets_list in budgets_lists:
+            others = [user for user in users
+                      if user.id != budgets_list.owner_id]
+            shared_to = self.random.sample(
+                others, min(shares_per_list, len(others))
+            )
+            members[budgets_list.id] = [budgets_list.owner_id] + [
+                user.id for user in shared_to
+            ]
+            shares.extend(
+                SharePermission(
+                    budgets_list=budgets_list,
+                    owner_id=budgets_list.owner_id,
+                    user=user
+                )
+                for user in shared_to
+            )
+        SharePermission.objects.bulk_create(
+            shares, batch_size=self.batch_size
+        )
+        return budgets_lists, members
+
+    def create_budgets(self, budgets_lists, budgets_per_list):
+        budgets = []
+        for budgets_list in budgets_lists:
+            for number in range(budgets_per_list):
+                initial_balance = Decimal(
+                    self.random.randrange(0, 500000)
+                ) / 100
+                budgets.append(Budget(
+                    title=BUDGET_TITLES[number % len(BUDGET_TITLES)],
+                    currency=self.random.choice(Budget.Currency.choises)[0],
+                    initial_balance=initial_balance,
+                    balance=initial_balance,
+                    owner_id=budgets_list.owner_id,
+                    budget_list=budgets_list
+                ))
+        Budget.objects.bulk_create(budgets, batch_size=self.batch_size)
+        return list(Budget.objects.filter(budget_list__in=budgets_lists))
+
+    def operation_counts(self, budgets, total):
+        # Pareto weights give a few very large budgets and a long tail.
+        weights = [self.random.paretovariate(1.5) for _ in budgets]
+        scale = total / sum(weights)
+        counts = [int(weight * scale) for weight in weights]
+        counts[0] += total - sum(counts)
+        return counts
+
+    def random_operation(self, budget, members, categories, start, seconds):
+        if self.random.random() < 0.15:
+            operation_type = BudgetOperation.OperationType.INCOME
+            title, notes = self.random.choice(self.income)
+            amount = self.random.lognormvariate(7, 0.6)
+        else:
+            operation_type = BudgetOperation.OperationType.EXPENSE
+            title, notes = self.random.choice(self.expenses)
+            amount = self.random.lognormvariate(3, 1)
+        return BudgetOperation(
+            budget_id=budget.id,
+            operation_type=operation_type,
+            category=categories[title],
+            amount=max(Decimal('0.01'), Decimal(f'{amount:.2f}')),
+            note=(self.random.choice(notes)
+                  if self.random.random() < 0.7 else None),
+            user_id=self.random.choice(members[budget.budget_list_id]),
+            date=start + timedelta(seconds=self.random.randrange(seconds))
+        )
+
+    def create_operations(self, budgets, members, categories, total, days):
+        now = timezone.now()
+        start, seconds = now - timedelta(days=days), days * 24 * 60 * 60
+        deltas = defaultdict(Decimal)
+        changes = {}
+        batch = []
+
+        def flush():
+            # Keep the generated dates instead of stamping every row with now.
+            BudgetOperation.objects.bulk_create_dated(batch, self.batch_size)
+            for operation in batch:
+                deltas[operation.budget_id] += BudgetOperation.signed_amount(
+                    operation.operation_type, operation.amount
+                )
+                BudgetSummary.collect(changes, operation.state)
+            batch.clear()
+
+        for budget, count in zip(
+                budgets, self.operation_counts(budgets, total)):
+            for _ in range(count):
+                batch.append(self.random_operation(
+                    budget, members, categories, start, seconds
+                ))
+                if len(batch) == self.batch_size:
+                    flush()
+        flush()
+
+        for budget_id, delta in deltas.items():
+            BudgetOperation.apply_balance_delta(budget_id, delta)
+        BudgetSummary.objects.bulk_create(
+            [
+                BudgetSummary(
+                    budget_id=budget_id,
+                    category_id=category_id,
+                    operation_type=operation_type,
+                    month=month,
+                    total=summary_total,
+                    count=count
+                )
+                for (budget_id, category_id, operation_type, month),
+                (summary_total, count) in changes.items()
+            ],
+            batch_size=self.batch_size
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['days'] < 1:
+            raise CommandError('--users and --days must be positive')
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.expenses = sorted(EXPENSE_CATEGORIES.items())
+        self.income = sorted(INCOME_CATEGORIES.items())
+
+        with transaction.atomic():
+            users = self.create_users(options['prefix'], options['users'])
+            categories = self.create_categories()
+            budgets_lists, members = self.create_lists(
+                users, options['lists_per_user'], options['shares_per_list']
+            )
+            budgets = self.create_budgets(
+                budgets_lists, options['budgets_per_list']
+            )
+            operations = options['operations'] if budgets else 0
+            if operations:
+                self.create_operations(
+                    budgets, members, categories, operations, options['days']
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {len(users)} users, {len(budgets_lists)} lists, '
+            f'{len(budgets)} budgets and {operations} operations'
+        ))
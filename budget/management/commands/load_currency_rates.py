@@ -0,0 +1,55 @@
+import csv
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from budget.models import Budget, CurrencyRate
+
+
+class Command(BaseCommand):
+    help = ('Load daily currency rates from a CSV file with "date", '
+            '"currency" and "rate" columns. Existing rates for the same '
+            'currency and date are replaced.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+
+    def read_rates(self, path):
+        currencies = {currency for currency, _ in Budget.Currency.choises}
+        rates = {}
+        with open(path, newline='', encoding='utf-8') as rates_file:
+            for line, row in enumerate(csv.DictReader(rates_file), start=2):
+                try:
+                    key = (row['currency'], date.fromisoformat(row['date']))
+                    rate = Decimal(row['rate'])
+                except (KeyError, TypeError, ValueError, InvalidOperation):
+                    raise CommandError(f'Invalid rate on line {line}')
+                if key[0] not in currencies or rate <= 0:
+                    raise CommandError(f'Invalid rate on line {line}')
+                rates[key] = rate
+        return rates
+
+    def handle(self, *args, **options):
+        try:
+            rates = self.read_rates(options['path'])
+        except OSError as error:
+            raise CommandError(error)
+
+        with transaction.atomic():
+            for currency in {currency for currency, _ in rates}:
+                CurrencyRate.objects.filter(
+                    currency=currency,
+                    date__in=[day for code, day in rates if code == currency]
+                ).delete()
+            CurrencyRate.objects.bulk_create(
+                [
+                    CurrencyRate(currency=currency, date=day, rate=rate)
+                    for (currency, day), rate in rates.items()
+                ],
+                batch_size=500
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f'Loaded {len(rates)} currency rates')
+        )
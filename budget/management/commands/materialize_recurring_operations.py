@@ -0,0 +1,48 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from budget.recurring import materialize
+
+
+class Command(BaseCommand):
+    help = ('Create the budget operations of every recurring operation that '
+            'is due. Safe to run repeatedly, e.g. from cron.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help='Materialize occurrences up to this date (YYYY-MM-DD), '
+                 'today by default.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Budgets handled per transaction.'
+        )
+        parser.add_argument(
+            '--max-occurrences',
+            type=int,
+            default=366,
+            help='Most occurrences created per rule and run; the rest are '
+                 'picked up by the next run.'
+        )
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('--date must be in YYYY-MM-DD format')
+        if options['batch_size'] < 1 or options['max_occurrences'] < 1:
+            raise CommandError(
+                '--batch-size and --max-occurrences must be positive'
+            )
+        rules, created = materialize(
+            today, options['batch_size'], options['max_occurrences']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created} operations from {rules} recurring operations'
+        ))
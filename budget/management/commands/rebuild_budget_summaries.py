@@ -0,0 +1,103 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from budget.models import BudgetOperation, BudgetSummary
+
+
+class Command(BaseCommand):
+    help = ('Rebuild the per-month budget summaries from budget operations '
+            'or check that they are consistent.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--budget',
+            action='append',
+            type=int,
+            dest='budgets',
+            help='Limit to the given budget id (may be repeated).'
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report summaries that differ from the operations.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def computed_rows(self, budgets):
+        operations = BudgetOperation.objects.all()
+        if budgets:
+            operations = operations.filter(budget_id__in=budgets)
+        return operations.summary_rows()
+
+    def stored_rows(self, budgets):
+        summaries = BudgetSummary.objects.all()
+        if budgets:
+            summaries = summaries.filter(budget_id__in=budgets)
+        return summaries.values(
+            'budget_id', 'category_id', 'operation_type', 'month'
+        ).annotate(
+            total=Sum('total'),
+            count=Sum('count')
+        ).order_by()
+
+    @staticmethod
+    def key(row):
+        return (row['budget_id'], row['category_id'],
+                row['operation_type'], row['month'])
+
+    @staticmethod
+    def value(row):
+        # SQLite sums decimals as floats, so compare them to the cent.
+        return (row['total'].quantize(Decimal('0.01')), row['count'])
+
+    def check_summaries(self, budgets):
+        computed = {
+            self.key(row): self.value(row)
+            for row in self.computed_rows(budgets).iterator()
+        }
+        stored = {
+            self.key(row): self.value(row)
+            for row in self.stored_rows(budgets).iterator()
+            if row['count']
+        }
+        mismatched = [
+            key for key in computed.keys() | stored.keys()
+            if computed.get(key) != stored.get(key)
+        ]
+        for key in mismatched[:20]:
+            self.stdout.write(
+                f'{key}: expected {computed.get(key)}, found {stored.get(key)}'
+            )
+        if mismatched:
+            raise CommandError(f'{len(mismatched)} summaries are out of sync')
+        self.stdout.write(self.style.SUCCESS('Budget summaries are in sync'))
+
+    def rebuild_summaries(self, budgets, batch_size):
+        created = 0
+        with transaction.atomic():
+            summaries = BudgetSummary.objects.all()
+            if budgets:
+                summaries = summaries.filter(budget_id__in=budgets)
+            summaries.delete()
+
+            batch = []
+            for row in self.computed_rows(budgets).iterator():
+                batch.append(BudgetSummary(**row))
+                if len(batch) >= batch_size:
+                    BudgetSummary.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+            BudgetSummary.objects.bulk_create(batch)
+            created += len(batch)
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {created} budget summaries')
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            self.check_summaries(options['budgets'])
+        else:
+            self.rebuild_summaries(options['budgets'], options['batch_size'])
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from budget.balances import reconcile
+
+
+class Command(BaseCommand):
+    help = ('Recompute budget balances from the initial balance and the '
+            'operations, report drift and optionally fix it.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--budget',
+            action='append',
+            type=int,
+            dest='budgets',
+            help='Limit to the given budget id (may be repeated).'
+        )
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Store the recomputed balance of drifted budgets.'
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        drifted = 0
+        for drift in reconcile(options['budgets'], options['fix'],
+                               options['batch_size']):
+            drifted += 1
+            if drifted <= 20 or options['verbosity'] > 1:
+                self.stdout.write(
+                    f'Budget {drift.budget_id}: expected {drift.expected}, '
+                    f'found {drift.stored}'
+                )
+        if options['fix']:
+            self.stdout.write(
+                self.style.SUCCESS(f'Fixed {drifted} budget balances')
+            )
+        elif drifted:
+            raise CommandError(f'{drifted} budget balances have drifted')
+        else:
+            self.stdout.write(self.style.SUCCESS('Budget balances are in sync'))
@@ -0,0 +1,138 @@
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from budget.jobs import (claim, fail_attempt, heartbeat, purge,
+                         requeue_stale, run_job)
+from budget.models import Job
+
+PURGE_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    help = ('Run queued background jobs (exports, imports and rebuilds) in '
+            'a pool of worker processes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=os.cpu_count(),
+            help='Jobs run at the same time, one process each (CPU count by '
+                 'default). 0 runs them one by one in this process.'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once no job is due instead of waiting for new ones.'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Seconds between checks for new jobs.'
+        )
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=300,
+            help='Seconds without a heartbeat after which a running job is '
+                 'considered lost and retried.'
+        )
+
+    def handle(self, *args, **options):
+        if options['processes'] < 0 or options['poll_interval'] <= 0:
+            raise CommandError(
+                '--processes must not be negative and --poll-interval must '
+                'be positive'
+            )
+        self.options = options
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.purged = None
+        if options['processes']:
+            finished = self.run_pool(options['processes'])
+        else:
+            finished = self.run_inline()
+        self.stdout.write(self.style.SUCCESS(f'Ran {finished} jobs'))
+
+    def idle(self):
+        if self.options['once']:
+            return False
+        now = time.monotonic()
+        if self.purged is None or now - self.purged > PURGE_INTERVAL:
+            purge(settings.BUDGET_JOB_KEEP_DAYS)
+            self.purged = now
+        time.sleep(self.options['poll_interval'])
+        return True
+
+    def fail(self, job_id, error):
+        job = Job.objects.filter(pk=job_id, worker=self.worker).first()
+        if job is not None:
+            fail_attempt(job, error)
+
+    def run_inline(self):
+        finished = 0
+        while True:
+            requeue_stale(self.options['stale_after'])
+            job_ids = claim(self.worker, 1)
+            if not job_ids:
+                if self.idle():
+                    continue
+                return finished
+            run_job(job_ids[0])
+            finished += 1
+
+    def run_pool(self, processes):
+        finished = 0
+        running = {}
+        # Forked processes start without a database connection, as they are
+        # closed before every submit.
+        pool = ProcessPoolExecutor(
+            processes, mp_context=multiprocessing.get_context('fork')
+        )
+        try:
+            while True:
+                requeue_stale(self.options['stale_after'])
+                job_ids = claim(self.worker, processes - len(running))
+                if job_ids:
+                    connections.close_all()
+                    for job_id in job_ids:
+                        running[pool.submit(run_job, job_id)] = job_id
+                if not running:
+                    if self.idle():
+                        continue
+                    return finished
+                heartbeat(running.values(), self.worker)
+                done, _ = wait(
+                    running,
+                    timeout=self.options['poll_interval'],
+                    return_when=FIRST_COMPLETED
+                )
+                broken = False
+                for future in done:
+                    job_id = running.pop(future)
+                    finished += 1
+                    error = future.exception()
+                    if error is None:
+                        continue
+                    self.fail(job_id, f'{type(error).__name__}: {error}')
+                    broken = broken or isinstance(error, BrokenProcessPool)
+                if broken:
+                    # A process died; the other jobs of the pool are lost too.
+                    for job_id in running.values():
+                        self.fail(job_id, 'The worker process stopped.')
+                    running = {}
+                    pool.shutdown(wait=False)
+                    pool = ProcessPoolExecutor(
+                        processes,
+                        mp_context=multiprocessing.get_context('fork')
+                    )
+        finally:
+            pool.shutdown(wait=True)
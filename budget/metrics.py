@@ -0,0 +1,302 @@
+import asyncio
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404, HttpResponse
+from rest_framework.permissions import IsAdminUser
+from rest_framework.serializers import BaseSerializer
+from rest_framework.views import APIView
+
+from .access import access_cache_stats
+from .authentication import token_cache_stats
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+LABEL_NAMES = ('view', 'method')
+
+current_request = ContextVar('budget_request_metrics', default=None)
+
+
+def format_labels(names, values, **extra):
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', '\\\\').replace('"', '\\"')
+        )
+        for name, value in pairs
+    ) + '}'
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def observe(self, labels, value):
+        with self.lock:
+            series = self.series.setdefault(labels, {
+                'buckets': [0] * (len(self.buckets) + 1),
+                'sum': 0,
+                'count': 0,
+            })
+            series['buckets'][bisect_left(self.buckets, value)] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def samples(self):
+        with self.lock:
+            series = {
+                labels: dict(values, buckets=list(values['buckets']))
+                for labels, values in self.series.items()
+            }
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',),
+                                    values['buckets']):
+                cumulative += count
+                yield (f'{self.name}_bucket'
+                       f'{format_labels(LABEL_NAMES, labels, le=bound)} '
+                       f'{cumulative}')
+            label_text = format_labels(LABEL_NAMES, labels)
+            yield f'{self.name}_sum{label_text} {values["sum"]}'
+            yield f'{self.name}_count{label_text} {values["count"]}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def inc(self, labels=(), amount=1):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            series = sorted(self.series.items())
+        for labels, value in series:
+            yield (f'{self.name}'
+                   f'{format_labels(self.label_names, labels)} {value}')
+
+
+class Registry:
+
+    def __init__(self):
+        self.requests = Counter(
+            'budget_requests_total',
+            'Requests by view, method and status.',
+            LABEL_NAMES + ('status',)
+        )
+        self.over_query_budget = Counter(
+            'budget_requests_over_query_budget_total',
+            'Requests that ran more queries than BUDGET_QUERY_BUDGET.',
+            LABEL_NAMES
+        )
+        self.duration = Histogram(
+            'budget_request_duration_seconds',
+            'Time spent handling the request.',
+            DURATION_BUCKETS
+        )
+        self.queries = Histogram(
+            'budget_request_db_queries',
+            'Database queries run by the request.',
+            QUERY_BUCKETS
+        )
+        self.query_duration = Histogram(
+            'budget_request_db_duration_seconds',
+            'Time spent in database queries.',
+            DURATION_BUCKETS
+        )
+        self.serializer_duration = Histogram(
+            'budget_request_serializer_duration_seconds',
+            'Time spent validating and serializing data.',
+            DURATION_BUCKETS
+        )
+        self.response_size = Histogram(
+            'budget_response_size_bytes',
+            'Size of the response body; streamed responses are skipped.',
+            SIZE_BUCKETS
+        )
+
+    @property
+    def metrics(self):
+        return (self.requests, self.over_query_budget, self.duration,
+                self.queries, self.query_duration, self.serializer_duration,
+                self.response_size)
+
+    def record(self, request, response, metrics):
+        match = getattr(request, 'resolver_match', None)
+        labels = (match.view_name if match else 'unmatched', request.method)
+        self.requests.inc(labels + (response.status_code,))
+        self.duration.observe(labels, metrics.elapsed)
+        self.queries.observe(labels, metrics.queries)
+        self.query_duration.observe(labels, metrics.query_time)
+        self.serializer_duration.observe(labels, metrics.serializer_time)
+        if not response.streaming:
+            self.response_size.observe(labels, len(response.content))
+
+        if metrics.queries > settings.BUDGET_QUERY_BUDGET:
+            self.over_query_budget.inc(labels)
+            logger.warning(
+                '%s %s ran %d queries (budget %d) in %.3fs',
+                request.method, request.get_full_path(), metrics.queries,
+                settings.BUDGET_QUERY_BUDGET, metrics.elapsed
+            )
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        for cache_name, stats in (('access', access_cache_stats),
+                                  ('token', token_cache_stats)):
+            stats = stats.as_dict()
+            for name in ('hits', 'misses'):
+                metric = f'budget_{cache_name}_cache_{name}_total'
+                lines.append(
+                    f'# HELP {metric} {cache_name.capitalize()} cache {name}.'
+                )
+                lines.append(f'# TYPE {metric} counter')
+                lines.append(f'{metric} {stats[name]}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class RequestMetrics:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.query_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current_request.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.query_time += time.perf_counter() - started
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def timed_serializer(method):
+
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        metrics = current_request.get()
+        if metrics is None:
+            return method(*args, **kwargs)
+        # Only the outermost call is timed, nested serializers are part of it.
+        metrics.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            metrics.serializer_depth -= 1
+            if not metrics.serializer_depth:
+                metrics.serializer_time += time.perf_counter() - started
+
+    return wrapper
+
+
+def instrument_serializers():
+    if hasattr(BaseSerializer, '_budget_untimed'):
+        return
+    BaseSerializer._budget_untimed = (BaseSerializer.is_valid,
+                                      BaseSerializer.data)
+    BaseSerializer.is_valid = timed_serializer(BaseSerializer.is_valid)
+    BaseSerializer.data = property(timed_serializer(BaseSerializer.data.fget))
+
+
+def uninstrument_serializers():
+    if not hasattr(BaseSerializer, '_budget_untimed'):
+        return
+    BaseSerializer.is_valid, BaseSerializer.data = (
+        BaseSerializer._budget_untimed
+    )
+    del BaseSerializer._budget_untimed
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.BUDGET_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_request.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        registry.record(request, response, metrics)
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_request.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        registry.record(request, response, metrics)
+        return response
+
+
+class MetricsView(APIView):
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        if not settings.BUDGET_METRICS_ENABLED:
+            raise Http404
+        return HttpResponse(
+            registry.render(),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
@@ -0,0 +1,36 @@
+# Generated by Django 2.2.6 on 2026-10-18 20:18
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BudgetSummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operation_type', models.CharField(choices=[('Income', 'Income'), ('Expense', 'Expense')], max_length=25)),
+                ('month', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=19)),
+                ('count', models.IntegerField(default=0)),
+                ('budget', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summaries', to='budget.Budget')),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='summaries', to='budget.Category')),
+            ],
+            options={
+                'verbose_name': 'Budget summary',
+                'verbose_name_plural': 'Budget summaries',
+                'ordering': ('month', 'id'),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='budgetsummary',
+            constraint=models.UniqueConstraint(fields=('budget', 'category', 'operation_type', 'month'), name='unique_budget_summary'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.6 on 2026-10-18 20:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0002_budgetsummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='budgetoperation',
+            index=models.Index(fields=['budget', 'date', 'id'], name='operation_budget_date_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 2.2.6 on 2026-10-18 20:21
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_shares(apps, schema_editor):
+    SharePermission = apps.get_model('budget', 'SharePermission')
+    duplicates = SharePermission.objects.values(
+        'budgets_list', 'user'
+    ).annotate(
+        first_id=Min('id'), total=Count('id')
+    ).filter(total__gt=1).order_by()
+    for duplicate in duplicates:
+        SharePermission.objects.filter(
+            budgets_list=duplicate['budgets_list'],
+            user=duplicate['user']
+        ).exclude(id=duplicate['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0003_operation_budget_date_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='budget',
+            index=models.Index(fields=['budget_list', 'create_date', 'id'], name='budget_list_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['title'], name='category_title_idx'),
+        ),
+        migrations.RunPython(
+            remove_duplicate_shares, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='sharepermission',
+            constraint=models.UniqueConstraint(fields=('budgets_list', 'user'), name='unique_share_permission'),
+        ),
+    ]
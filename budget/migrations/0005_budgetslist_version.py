@@ -0,0 +1,18 @@
+# Generated by Django 2.2.6 on 2026-10-18 20:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0004_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='budgetslist',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.6 on 2026-10-18 20:26
+
+from decimal import Decimal
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0005_budgetslist_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CurrencyRate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(choices=[('USD', 'USD'), ('Euro', 'Euro'), ('zl', 'PLN')], max_length=25)),
+                ('date', models.DateField()),
+                ('rate', models.DecimalField(decimal_places=6, help_text='Value of one unit of the currency in the base currency', max_digits=19, validators=[django.core.validators.MinValueValidator(Decimal('0.000001'), message='Rate must be positive')])),
+            ],
+            options={
+                'verbose_name': 'Currency rate',
+                'verbose_name_plural': 'Currency rates',
+                'ordering': ('-date', 'currency'),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='currencyrate',
+            constraint=models.UniqueConstraint(fields=('currency', 'date'), name='unique_currency_rate'),
+        ),
+    ]
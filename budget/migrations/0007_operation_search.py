@@ -0,0 +1,155 @@
+from django.db import migrations
+
+# The SQL is copied here as it was when the migration was written, so later
+# changes to budget.search do not change what this migration runs.
+
+SQLITE_INSTALL = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS budget_operation_fts '
+    'USING fts5(note, category)',
+
+    "CREATE TRIGGER IF NOT EXISTS budget_operation_fts_insert "
+    "AFTER INSERT ON budget_budgetoperation BEGIN "
+    "INSERT INTO budget_operation_fts(rowid, note, category) "
+    "VALUES (new.id, coalesce(new.note, ''), "
+    "coalesce((SELECT title FROM budget_category "
+    "WHERE id = new.category_id), '')); "
+    "END",
+
+    "CREATE TRIGGER IF NOT EXISTS budget_operation_fts_update "
+    "AFTER UPDATE OF note, category_id ON budget_budgetoperation BEGIN "
+    "DELETE FROM budget_operation_fts WHERE rowid = old.id; "
+    "INSERT INTO budget_operation_fts(rowid, note, category) "
+    "VALUES (new.id, coalesce(new.note, ''), "
+    "coalesce((SELECT title FROM budget_category "
+    "WHERE id = new.category_id), '')); "
+    "END",
+
+    "CREATE TRIGGER IF NOT EXISTS budget_operation_fts_delete "
+    "AFTER DELETE ON budget_budgetoperation BEGIN "
+    "DELETE FROM budget_operation_fts WHERE rowid = old.id; "
+    "END",
+
+    "CREATE TRIGGER IF NOT EXISTS budget_operation_fts_category "
+    "AFTER UPDATE OF title ON budget_category BEGIN "
+    "UPDATE budget_operation_fts SET category = new.title WHERE rowid IN "
+    "(SELECT id FROM budget_budgetoperation WHERE category_id = new.id); "
+    "END",
+)
+
+SQLITE_BACKFILL = (
+    "INSERT INTO budget_operation_fts(rowid, note, category) "
+    "SELECT operation.id, coalesce(operation.note, ''), "
+    "coalesce(category.title, '') FROM budget_budgetoperation operation "
+    "LEFT JOIN budget_category category "
+    "ON category.id = operation.category_id"
+)
+
+SQLITE_UNINSTALL = (
+    'DROP TRIGGER IF EXISTS budget_operation_fts_insert',
+    'DROP TRIGGER IF EXISTS budget_operation_fts_update',
+    'DROP TRIGGER IF EXISTS budget_operation_fts_delete',
+    'DROP TRIGGER IF EXISTS budget_operation_fts_category',
+    'DROP TABLE IF EXISTS budget_operation_fts',
+)
+
+POSTGRES_INSTALL = (
+    'ALTER TABLE budget_budgetoperation '
+    'ADD COLUMN IF NOT EXISTS search_document tsvector',
+
+    'CREATE INDEX IF NOT EXISTS budget_operation_search_idx '
+    'ON budget_budgetoperation USING GIN (search_document)',
+
+    "CREATE OR REPLACE FUNCTION budget_operation_search_document() "
+    "RETURNS trigger AS $$ BEGIN "
+    "NEW.search_document := "
+    "to_tsvector('simple', coalesce(NEW.note, '') || ' ' || coalesce("
+    "(SELECT title FROM budget_category WHERE id = NEW.category_id), '')); "
+    "RETURN NEW; END $$ LANGUAGE plpgsql",
+
+    'DROP TRIGGER IF EXISTS budget_operation_search_document '
+    'ON budget_budgetoperation',
+
+    'CREATE TRIGGER budget_operation_search_document '
+    'BEFORE INSERT OR UPDATE OF note, category_id '
+    'ON budget_budgetoperation FOR EACH ROW '
+    'EXECUTE PROCEDURE budget_operation_search_document()',
+
+    "CREATE OR REPLACE FUNCTION budget_category_search_document() "
+    "RETURNS trigger AS $$ BEGIN "
+    "UPDATE budget_budgetoperation SET search_document = "
+    "to_tsvector('simple', coalesce(note, '') || ' ' || coalesce("
+    "(SELECT title FROM budget_category WHERE id = category_id), '')) "
+    "WHERE category_id = NEW.id; "
+    "RETURN NULL; END $$ LANGUAGE plpgsql",
+
+    'DROP TRIGGER IF EXISTS budget_category_search_document '
+    'ON budget_category',
+
+    'CREATE TRIGGER budget_category_search_document '
+    'AFTER UPDATE OF title ON budget_category FOR EACH ROW '
+    'EXECUTE PROCEDURE budget_category_search_document()',
+)
+
+POSTGRES_BACKFILL = (
+    "UPDATE budget_budgetoperation SET search_document = "
+    "to_tsvector('simple', coalesce(note, '') || ' ' || coalesce("
+    "(SELECT title FROM budget_category WHERE id = category_id), '')) "
+    "WHERE search_document IS NULL"
+)
+
+POSTGRES_UNINSTALL = (
+    'DROP TRIGGER IF EXISTS budget_category_search_document '
+    'ON budget_category',
+    'DROP FUNCTION IF EXISTS budget_category_search_document()',
+    'DROP TRIGGER IF EXISTS budget_operation_search_document '
+    'ON budget_budgetoperation',
+    'DROP FUNCTION IF EXISTS budget_operation_search_document()',
+    'ALTER TABLE budget_budgetoperation '
+    'DROP COLUMN IF EXISTS search_document',
+)
+
+
+def sqlite_has_fts5(db):
+    with db.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return 'ENABLE_FTS5' in {row[0] for row in cursor.fetchall()}
+
+
+def install_search(apps, schema_editor):
+    db = schema_editor.connection
+    if db.vendor == 'sqlite' and sqlite_has_fts5(db):
+        statements, backfill = SQLITE_INSTALL, SQLITE_BACKFILL
+        created = 'budget_operation_fts' not in db.introspection.table_names()
+    elif db.vendor == 'postgresql':
+        statements, backfill, created = (
+            POSTGRES_INSTALL, POSTGRES_BACKFILL, True
+        )
+    else:
+        return
+    with db.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+        if created:
+            cursor.execute(backfill)
+
+
+def uninstall_search(apps, schema_editor):
+    db = schema_editor.connection
+    statements = {
+        'sqlite': SQLITE_UNINSTALL,
+        'postgresql': POSTGRES_UNINSTALL,
+    }.get(db.vendor, ())
+    with db.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0006_currencyrate'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
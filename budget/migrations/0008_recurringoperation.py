@@ -0,0 +1,44 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:54
+
+from decimal import Decimal
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('budget', '0007_operation_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringOperation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operation_type', models.CharField(choices=[('Income', 'Income'), ('Expense', 'Expense')], max_length=25)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=19, validators=[django.core.validators.MinValueValidator(Decimal('0.01'), message='Minimum amount - 0.01')])),
+                ('note', models.TextField(blank=True, null=True)),
+                ('frequency', models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly'), ('monthly', 'Monthly'), ('yearly', 'Yearly')], max_length=10)),
+                ('interval', models.PositiveIntegerField(default=1, help_text='Repeat every this many days, weeks, months or years', validators=[django.core.validators.MinValueValidator(1)])),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('next_date', models.DateField(editable=False, help_text='Date of the next occurrence that is not materialized yet')),
+                ('budget', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_operations', to='budget.budget')),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recurring_operations', to='budget.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_operations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Recurring operation',
+                'verbose_name_plural': 'Recurring operations',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recurringoperation',
+            index=models.Index(fields=['next_date', 'budget'], name='recurring_next_date_idx'),
+        ),
+    ]
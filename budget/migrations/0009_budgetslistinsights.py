@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0008_recurringoperation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BudgetsListInsights',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('list_version', models.PositiveIntegerField()),
+                ('categories_version', models.CharField(max_length=32)),
+                ('data', models.JSONField()),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('budgets_list', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='insights', to='budget.budgetslist')),
+            ],
+            options={
+                'verbose_name': 'Budgets list insights',
+                'verbose_name_plural': 'Budgets list insights',
+                'ordering': ('-month', 'id'),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='budgetslistinsights',
+            constraint=models.UniqueConstraint(fields=('budgets_list', 'month'), name='unique_budgets_list_insights'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-18 21:19
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0010_job'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='budgetslistinsights',
+            name='categories_version',
+        ),
+    ]
@@ -1,8 +1,15 @@
+from calendar import monthrange
+from collections import defaultdict
+from datetime import date, timedelta
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import (Case, Count, DateField, DecimalField, F, Sum,
+                              When, Window)
+from django.db.models.functions import Trunc, TruncMonth
+from django.utils import timezone
 
 
 User = get_user_model()
@@ -15,12 +22,43 @@ class BudgetsList(models.Model):
         on_delete=models.CASCADE,
         related_name='budgets_lists'
     )
+    version = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         verbose_name = 'List of budgets'
         verbose_name_plural = 'Lists of budgets'
         ordering = ('id',)
 
+    def save(self, *args, **kwargs):
+        updating = not self._state.adding
+        if updating:
+            self.version = F('version') + 1
+        super(BudgetsList, self).save(*args, **kwargs)
+        if updating:
+            self.refresh_from_db(fields=['version'])
+
+    @classmethod
+    def touch(cls, *list_ids):
+        cls.objects.filter(id__in=list_ids).update(version=F('version') + 1)
+
+    @classmethod
+    def touch_budgets(cls, *budget_ids):
+        cls.objects.filter(budgets__id__in=budget_ids).update(
+            version=F('version') + 1
+        )
+
+    @classmethod
+    def touch_categories(cls, *category_ids):
+        # Operations and recurring operations show the category title.
+        cls.objects.filter(
+            models.Q(id__in=Budget.objects.filter(
+                budget_operations__category_id__in=category_ids
+            ).values('budget_list_id'))
+            | models.Q(id__in=Budget.objects.filter(
+                recurring_operations__category_id__in=category_ids
+            ).values('budget_list_id'))
+        ).update(version=F('version') + 1)
+
     def __str__(self):
         return f"{str(self.owner).title()}'s {self.title} list of budgets"
 
@@ -34,6 +72,9 @@ class Category(models.Model):
         verbose_name = 'Category'
         verbose_name_plural = 'Categories'
         ordering = ('id',)
+        indexes = [
+            models.Index(fields=('title',), name='category_title_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -83,16 +124,164 @@ class Budget(models.Model):
         verbose_name = 'Budget'
         verbose_name_plural = 'Budgets'
         ordering = ('create_date',)
+        indexes = [
+            models.Index(
+                fields=('budget_list', 'create_date', 'id'),
+                name='budget_list_created_idx'
+            ),
+        ]
 
     def save(self, *args, **kwargs):
-        if not self.balance:
+        if self.balance is None:
             self.balance = self.initial_balance
+        updating = not self._state.adding and not kwargs.get('force_insert')
+        if updating and kwargs.get('update_fields') is None:
+            # Operations move the balance with F() updates, so the value
+            # this instance loaded may be stale and is never written back.
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'balance'
+            ]
         super(Budget, self).save(*args, **kwargs)
+        if updating:
+            self.refresh_from_db(fields=['balance'])
 
     def __str__(self):
         return self.title
 
 
+class CurrencyRate(models.Model):
+    currency = models.CharField(
+        max_length=25,
+        choices=Budget.Currency.choises
+    )
+    date = models.DateField()
+    rate = models.DecimalField(
+        max_digits=19,
+        decimal_places=6,
+        help_text='Value of one unit of the currency in the base currency',
+        validators=[
+            MinValueValidator(
+                Decimal('0.000001'),
+                message='Rate must be positive'
+            )
+        ]
+    )
+
+    class Meta:
+        verbose_name = 'Currency rate'
+        verbose_name_plural = 'Currency rates'
+        ordering = ('-date', 'currency')
+        constraints = [
+            models.UniqueConstraint(
+                fields=('currency', 'date'),
+                name='unique_currency_rate'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.currency} {self.date}: {self.rate}'
+
+
+class BudgetOperationQuerySet(models.QuerySet):
+
+    def signed_amount(self):
+        return Case(
+            When(
+                operation_type=self.model.OperationType.EXPENSE,
+                then=-F('amount')
+            ),
+            default=F('amount'),
+            output_field=DecimalField(max_digits=19, decimal_places=2)
+        )
+
+    def balance_deltas(self):
+        return self.order_by().values('budget_id').annotate(
+            delta=Sum(self.signed_amount())
+        )
+
+    def running_totals(self, kind):
+        # Ordering the window by bucket alone makes every operation of a
+        # bucket a peer, so each gets the total up to the end of its bucket
+        # and DISTINCT leaves one row per bucket.
+        return self.order_by().annotate(
+            bucket=Trunc('date', kind, output_field=DateField())
+        ).values('bucket').annotate(
+            total=Window(Sum(self.signed_amount()), order_by=F('bucket').asc())
+        ).distinct().order_by('bucket')
+
+    def summary_rows(self):
+        return self.order_by().annotate(
+            month=TruncMonth('date', output_field=DateField())
+        ).values(
+            'budget_id', 'category_id', 'operation_type', 'month'
+        ).annotate(
+            total=Sum('amount'),
+            count=Count('id')
+        )
+
+    def delete(self):
+        with transaction.atomic():
+            # Lock the rows first, so the totals match what gets deleted.
+            for _ in self.select_for_update().order_by('pk').values_list(
+                    'pk', flat=True).iterator():
+                pass
+            deltas = list(self.balance_deltas())
+            summaries = list(self.summary_rows())
+            result = super(BudgetOperationQuerySet, self).delete()
+            for row in deltas:
+                self.model.apply_balance_delta(row['budget_id'], -row['delta'])
+            for row in summaries:
+                BudgetSummary.apply_change(
+                    row['budget_id'], row['category_id'],
+                    row['operation_type'], row['month'],
+                    total=-row['total'].quantize(Decimal('0.01')),
+                    count=-row['count']
+                )
+            if deltas:
+                BudgetsList.touch_budgets(
+                    *(row['budget_id'] for row in deltas)
+                )
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def bulk_create_dated(self, operations, batch_size=500):
+        # bulk_create() stamps every row with now, as ``date`` has auto_now.
+        # Insert first, then give the rows their own dates with one UPDATE
+        # per distinct date, or per batch when the dates hardly repeat.
+        operations = list(operations)
+        dates = [operation.date for operation in operations]
+        with transaction.atomic(using=self.db):
+            self.bulk_create(operations, batch_size=batch_size)
+            if operations and operations[-1].pk is None:
+                # SQLite returns no ids from bulk inserts. The transaction
+                # holds its write lock, so the newest rows are these.
+                ids = list(self.model.objects.order_by('-pk').values_list(
+                    'pk', flat=True
+                )[:len(operations)])
+                for operation, pk in zip(operations, reversed(ids)):
+                    operation.pk = pk
+            by_date = defaultdict(list)
+            for operation, day in zip(operations, dates):
+                operation.date = day
+                by_date[day].append(operation.pk)
+            if len(by_date) > len(operations) // 2:
+                self.model.objects.bulk_update(
+                    operations, ['date'], batch_size=batch_size
+                )
+            else:
+                for day, ids in by_date.items():
+                    for start in range(0, len(ids), batch_size):
+                        self.model.objects.filter(
+                            pk__in=ids[start:start + batch_size]
+                        ).update(date=day)
+        return operations
+
+    bulk_create_dated.alters_data = True
+
+
 class BudgetOperation(models.Model):
     class OperationType:
         INCOME = 'Income'
@@ -136,42 +325,428 @@ class BudgetOperation(models.Model):
     )
     date = models.DateTimeField(auto_now=True)
 
+    objects = BudgetOperationQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Budget operation'
         verbose_name_plural = 'Budget operations'
         ordering = ('date',)
+        indexes = [
+            models.Index(
+                fields=('budget', 'date', 'id'),
+                name='operation_budget_date_idx'
+            ),
+        ]
+
+    @classmethod
+    def signed_amount(cls, operation_type, amount):
+        if operation_type == cls.OperationType.EXPENSE:
+            return -amount
+        return amount
+
+    @staticmethod
+    def apply_balance_delta(budget_id, delta):
+        if delta:
+            Budget.objects.filter(pk=budget_id).update(
+                balance=F('balance') + delta
+            )
 
-    def update_balance(self):
-        operation = BudgetOperation.objects.get(pk=self.pk)
-        if operation.operation_type == 'Expense':
-            self.budget.balance += operation.amount
-        else:
-            self.budget.balance -= operation.amount
-        self.budget.save()
+    def sync_cached_balance(self, delta):
+        if BudgetOperation.budget.is_cached(self):
+            self.budget.balance += delta
+
+    state_fields = (
+        'budget_id', 'category_id', 'operation_type', 'amount', 'date'
+    )
+
+    @property
+    def state(self):
+        return {field: getattr(self, field) for field in self.state_fields}
+
+    def stored_state(self):
+        return BudgetOperation.objects.select_for_update().filter(
+            pk=self.pk
+        ).values(*self.state_fields).first()
 
     def save(self, *args, **kwargs):
-        if BudgetOperation.objects.filter(pk=self.pk).exists():
-            self.update_balance()
-        if self.operation_type == 'Expense':
-            self.budget.balance -= self.amount
-        else:
-            self.budget.balance += self.amount
-        self.budget.save()
-        super(BudgetOperation, self).save(*args, **kwargs)
+        with transaction.atomic():
+            delta = self.signed_amount(self.operation_type, self.amount)
+            stored = self.stored_state() if self.pk else None
+            if stored is not None:
+                stored_delta = self.signed_amount(
+                    stored['operation_type'], stored['amount']
+                )
+                if stored['budget_id'] == self.budget_id:
+                    delta -= stored_delta
+                else:
+                    self.apply_balance_delta(
+                        stored['budget_id'], -stored_delta
+                    )
+            self.apply_balance_delta(self.budget_id, delta)
+            super(BudgetOperation, self).save(*args, **kwargs)
+            changes = {}
+            if stored is not None:
+                BudgetSummary.collect(changes, stored, sign=-1)
+            BudgetSummary.collect(changes, self.state)
+            BudgetSummary.apply_changes(changes)
+            if stored is not None and stored['budget_id'] != self.budget_id:
+                BudgetsList.touch_budgets(stored['budget_id'], self.budget_id)
+            else:
+                BudgetsList.touch_budgets(self.budget_id)
+        self.sync_cached_balance(delta)
 
     def delete(self, *args, **kwargs):
-        if self.operation_type == 'Expense':
-            self.budget.balance += self.amount
-        else:
-            self.budget.balance -= self.amount
-        self.budget.save()
-        super(BudgetOperation, self).delete()
+        with transaction.atomic():
+            stored = self.stored_state()
+            if stored is not None:
+                delta = -self.signed_amount(
+                    stored['operation_type'], stored['amount']
+                )
+                self.apply_balance_delta(stored['budget_id'], delta)
+                changes = {}
+                BudgetSummary.collect(changes, stored, sign=-1)
+                BudgetSummary.apply_changes(changes)
+                BudgetsList.touch_budgets(stored['budget_id'])
+            result = super(BudgetOperation, self).delete(*args, **kwargs)
+        if stored is not None and stored['budget_id'] == self.budget_id:
+            self.sync_cached_balance(delta)
+        return result
 
     def __str__(self):
         return (f'{self.operation_type}. {self.category} '
                 f'- {self.amount} {self.budget.currency}')
 
 
+class BudgetSummary(models.Model):
+    budget = models.ForeignKey(
+        Budget,
+        on_delete=models.CASCADE,
+        related_name='summaries'
+    )
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.SET_NULL,
+        related_name='summaries',
+        null=True
+    )
+    operation_type = models.CharField(
+        max_length=25,
+        choices=BudgetOperation.OperationType.choises
+    )
+    month = models.DateField()
+    total = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=Decimal('0.00')
+    )
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Budget summary'
+        verbose_name_plural = 'Budget summaries'
+        ordering = ('month', 'id')
+        constraints = [
+            models.UniqueConstraint(
+                fields=('budget', 'category', 'operation_type', 'month'),
+                name='unique_budget_summary'
+            )
+        ]
+
+    @staticmethod
+    def month_of(date):
+        return timezone.localtime(date).date().replace(day=1)
+
+    @classmethod
+    def collect(cls, changes, operation, sign=1):
+        key = (
+            operation['budget_id'],
+            operation['category_id'],
+            operation['operation_type'],
+            cls.month_of(operation['date']),
+        )
+        total, count = changes.get(key, (0, 0))
+        changes[key] = (
+            total + sign * operation['amount'], count + sign
+        )
+
+    @classmethod
+    def apply_changes(cls, changes):
+        for key, (total, count) in changes.items():
+            if total or count:
+                cls.apply_change(*key, total=total, count=count)
+
+    @classmethod
+    def apply_change(cls, budget_id, category_id, operation_type, month,
+                     total, count):
+        lookup = {
+            'budget_id': budget_id,
+            'category_id': category_id,
+            'operation_type': operation_type,
+            'month': month,
+        }
+        while True:
+            pk = cls.objects.select_for_update().filter(
+                **lookup
+            ).values_list('pk', flat=True).first()
+            if pk is not None:
+                break
+            try:
+                with transaction.atomic():
+                    cls.objects.create(total=total, count=count, **lookup)
+                return
+            except IntegrityError:
+                continue
+        cls.objects.filter(pk=pk).update(
+            total=F('total') + total,
+            count=F('count') + count
+        )
+        if count < 0:
+            cls.objects.filter(pk=pk, count=0).delete()
+
+    @classmethod
+    def apply_additions(cls, changes):
+        # Bulk variant of apply_changes for changes that only add operations:
+        # one locking read, one bulk update and one bulk insert.
+        if not changes:
+            return
+        existing = {
+            (summary.budget_id, summary.category_id, summary.operation_type,
+             summary.month): summary
+            for summary in cls.objects.select_for_update().filter(
+                budget_id__in={key[0] for key in changes},
+                month__in={key[3] for key in changes}
+            ).order_by('pk')
+        }
+        updated, created = [], []
+        for key, (total, count) in changes.items():
+            summary = existing.get(key)
+            if summary is None:
+                budget_id, category_id, operation_type, month = key
+                created.append(cls(
+                    budget_id=budget_id,
+                    category_id=category_id,
+                    operation_type=operation_type,
+                    month=month,
+                    total=total,
+                    count=count
+                ))
+            else:
+                summary.total += total
+                summary.count += count
+                updated.append(summary)
+        cls.objects.bulk_update(updated, ['total', 'count'], batch_size=500)
+        cls.objects.bulk_create(created, batch_size=500)
+
+    def __str__(self):
+        return (f'{self.budget} {self.month:%Y-%m} {self.operation_type} '
+                f'{self.category}: {self.total}')
+
+
+class BudgetsListInsights(models.Model):
+    budgets_list = models.ForeignKey(
+        BudgetsList,
+        on_delete=models.CASCADE,
+        related_name='insights'
+    )
+    month = models.DateField()
+    list_version = models.PositiveIntegerField()
+    data = models.JSONField()
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Budgets list insights'
+        verbose_name_plural = 'Budgets list insights'
+        ordering = ('-month', 'id')
+        constraints = [
+            models.UniqueConstraint(
+                fields=('budgets_list', 'month'),
+                name='unique_budgets_list_insights'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.budgets_list} insights {self.month:%Y-%m}'
+
+
+class RecurringOperation(models.Model):
+    class Frequency:
+        DAILY = 'daily'
+        WEEKLY = 'weekly'
+        MONTHLY = 'monthly'
+        YEARLY = 'yearly'
+
+        choises = [
+            (DAILY, 'Daily'),
+            (WEEKLY, 'Weekly'),
+            (MONTHLY, 'Monthly'),
+            (YEARLY, 'Yearly')
+        ]
+
+    budget = models.ForeignKey(
+        Budget,
+        on_delete=models.CASCADE,
+        related_name='recurring_operations'
+    )
+    operation_type = models.CharField(
+        max_length=25,
+        choices=BudgetOperation.OperationType.choises
+    )
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.SET_NULL,
+        related_name='recurring_operations',
+        null=True
+    )
+    amount = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        validators=[
+            MinValueValidator(
+                Decimal('0.01'),
+                message='Minimum amount - 0.01'
+            )
+        ]
+    )
+    note = models.TextField(blank=True, null=True)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recurring_operations'
+    )
+    frequency = models.CharField(max_length=10, choices=Frequency.choises)
+    interval = models.PositiveIntegerField(
+        default=1,
+        validators=[MinValueValidator(1)],
+        help_text='Repeat every this many days, weeks, months or years'
+    )
+    start_date = models.DateField()
+    end_date = models.DateField(blank=True, null=True)
+    next_date = models.DateField(
+        editable=False,
+        help_text='Date of the next occurrence that is not materialized yet'
+    )
+
+    class Meta:
+        verbose_name = 'Recurring operation'
+        verbose_name_plural = 'Recurring operations'
+        ordering = ('id',)
+        indexes = [
+            models.Index(
+                fields=('next_date', 'budget'),
+                name='recurring_next_date_idx'
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.next_date is None or self.next_date < self.start_date:
+            self.next_date = self.start_date
+        super(RecurringOperation, self).save(*args, **kwargs)
+
+    def occurrence_after(self, day):
+        if self.frequency == self.Frequency.DAILY:
+            return day + timedelta(days=self.interval)
+        if self.frequency == self.Frequency.WEEKLY:
+            return day + timedelta(weeks=self.interval)
+        step = self.interval * (
+            12 if self.frequency == self.Frequency.YEARLY else 1
+        )
+        # Count months from the start date, so a rule on the 31st comes back
+        # to the 31st after shorter months.
+        months = ((day.year - self.start_date.year) * 12
+                  + day.month - self.start_date.month)
+        months = (months // step + 1) * step
+        year, month = divmod(self.start_date.month - 1 + months, 12)
+        year += self.start_date.year
+        return date(
+            year, month + 1,
+            min(self.start_date.day, monthrange(year, month + 1)[1])
+        )
+
+    def due_dates(self, until, limit):
+        day = self.next_date
+        if self.end_date is not None:
+            until = min(until, self.end_date)
+        dates = []
+        while day <= until and len(dates) < limit:
+            dates.append(day)
+            day = self.occurrence_after(day)
+        return dates, day
+
+    def __str__(self):
+        return (f'{self.operation_type}. {self.category} - {self.amount} '
+                f'{self.frequency}')
+
+
+class Job(models.Model):
+    class Kind:
+        EXPORT = 'export'
+        IMPORT_OPERATIONS = 'import_operations'
+        REBUILD_BUDGET = 'rebuild_budget'
+
+        choises = [
+            (EXPORT, 'Export'),
+            (IMPORT_OPERATIONS, 'Import operations'),
+            (REBUILD_BUDGET, 'Rebuild budget')
+        ]
+
+    class Status:
+        QUEUED = 'queued'
+        RUNNING = 'running'
+        SUCCEEDED = 'succeeded'
+        FAILED = 'failed'
+
+        choises = [
+            (QUEUED, 'Queued'),
+            (RUNNING, 'Running'),
+            (SUCCEEDED, 'Succeeded'),
+            (FAILED, 'Failed')
+        ]
+
+    kind = models.CharField(max_length=25, choices=Kind.choises)
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choises,
+        default=Status.QUEUED
+    )
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='jobs'
+    )
+    budgets_list = models.ForeignKey(
+        BudgetsList,
+        on_delete=models.CASCADE,
+        related_name='jobs'
+    )
+    payload = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(blank=True, null=True)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    worker = models.CharField(max_length=100, blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(blank=True, null=True)
+    heartbeat = models.DateTimeField(blank=True, null=True)
+    finished = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = 'Job'
+        verbose_name_plural = 'Jobs'
+        ordering = ('-id',)
+        indexes = [
+            models.Index(
+                fields=('status', 'run_after'),
+                name='job_status_run_after_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} #{self.id} ({self.status})'
+
+
 class SharePermission(models.Model):
     budgets_list = models.ForeignKey(
         BudgetsList,
@@ -193,6 +768,12 @@ class SharePermission(models.Model):
         verbose_name = 'Shared permission'
         verbose_name_plural = 'Shared permissions'
         ordering = ('id',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=('budgets_list', 'user'),
+                name='unique_share_permission'
+            )
+        ]
 
     def __str__(self):
         return f'{self.budgets_list} shared to {self.user}'
@@ -0,0 +1,120 @@
+import json
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('date', 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.after(position))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def after(self, position):
+        first = self.ordering[0]
+        lookup = 'lte' if first.startswith('-') else 'gte'
+        condition = Q(**{f'{first.lstrip("-")}__{lookup}': position[0]})
+        keyset = Q()
+        for index, field in enumerate(self.ordering):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{f'{field.lstrip("-")}__{lookup}': position[index]})
+            for previous, value in zip(self.ordering[:index], position):
+                step &= Q(**{previous.lstrip('-'): value})
+            keyset |= step
+        return condition & keyset
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            position = json.loads(b64decode(encoded.encode('ascii')))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or (
+                len(position) != len(self.ordering)) or not all(
+                isinstance(value, (str, int)) and not isinstance(value, bool)
+                for value in position):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, position):
+        encoded = b64encode(json.dumps(position).encode('utf-8'))
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded.decode('ascii')
+        )
+
+    def position_of(self, instance):
+        position = []
+        for field in self.ordering:
+            value = getattr(instance, field.lstrip('-'))
+            position.append(
+                value.isoformat() if hasattr(value, 'isoformat')
+                else str(value)
+            )
+        return position
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.position_of(self.page[-1]))
+
+    def get_previous_link(self):
+        return None
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data)
+        ]))
+
+
+class OperationKeysetPagination(KeysetPagination):
+    ordering = ('date', 'id')
+
+
+class BudgetKeysetPagination(KeysetPagination):
+    ordering = ('create_date', 'id')
+
+
+class LatestOperationsPagination(KeysetPagination):
+    page_size_query_param = 'latest'
+    ordering = ('-date', '-id')
+
+
+class SelectablePaginationMixin:
+    pagination_query_param = 'pagination'
+    keyset_pagination_class = None
+
+    @property
+    def paginator(self):
+        if (not hasattr(self, '_paginator')
+                and self.keyset_pagination_class is not None
+                and self.request.query_params.get(
+                    self.pagination_query_param) == 'keyset'):
+            self._paginator = self.keyset_pagination_class()
+        return super().paginator
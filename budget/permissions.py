@@ -1,23 +1,22 @@
-from django.db.models import Q
 from rest_framework import permissions
 
-from .models import SharePermission, BudgetsList
+from .access import get_access
 
 
 class AdmittedOrOwner(permissions.BasePermission):
 
     def has_permission(self, request, view):
-        user = request.user
-        return (BudgetsList.objects.filter(
-            id=view.kwargs['list_id']
-        ).filter(
-            Q(owner=user.id) | Q(shared_permissions__user=user.id)
-        ))
+        access = get_access(request)
+        if not access.can_access_list(view.kwargs['list_id']):
+            return False
+        if 'budget_id' in view.kwargs:
+            access.get_budget(view.kwargs['list_id'], view.kwargs['budget_id'])
+        return True
 
 
 class OnlyOwnerDelete(permissions.BasePermission):
 
-    def has_permission(self, request, view):
+    def has_object_permission(self, request, view, obj):
         if request.method != 'DELETE':
             return True
-        return request.user.id == view.get_object().owner
+        return request.user.id == obj.owner_id
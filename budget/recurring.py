@@ -0,0 +1,87 @@
+from collections import defaultdict
+from datetime import datetime, time
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (BudgetOperation, BudgetsList, BudgetSummary,
+                     RecurringOperation)
+
+
+def occurrence_datetime(day):
+    # Occurrences are dated at the start of their day in the local timezone.
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def due_budget_ids(today, after, count):
+    return list(RecurringOperation.objects.filter(
+        next_date__lte=today, budget_id__gt=after
+    ).values_list('budget_id', flat=True).distinct().order_by(
+        'budget_id'
+    )[:count])
+
+
+def materialize_budgets(budget_ids, today, max_occurrences):
+    operations = []
+    deltas = defaultdict(int)
+    with transaction.atomic():
+        rules = list(RecurringOperation.objects.select_for_update(
+            skip_locked=True
+        ).filter(
+            budget_id__in=budget_ids, next_date__lte=today
+        ).order_by('pk'))
+        for rule in rules:
+            dates, rule.next_date = rule.due_dates(today, max_occurrences)
+            for day in dates:
+                operations.append(BudgetOperation(
+                    budget_id=rule.budget_id,
+                    operation_type=rule.operation_type,
+                    category_id=rule.category_id,
+                    amount=rule.amount,
+                    note=rule.note,
+                    user_id=rule.user_id,
+                    date=occurrence_datetime(day)
+                ))
+                deltas[rule.budget_id] += BudgetOperation.signed_amount(
+                    rule.operation_type, rule.amount
+                )
+
+        # Moving next_date in the same transaction as the inserts keeps
+        # reruns from materializing an occurrence twice. Rules due together
+        # mostly move to the same date, so update them grouped by it.
+        next_dates = defaultdict(list)
+        for rule in rules:
+            next_dates[rule.next_date].append(rule.pk)
+        for next_date, rule_ids in next_dates.items():
+            for start in range(0, len(rule_ids), 500):
+                RecurringOperation.objects.filter(
+                    pk__in=rule_ids[start:start + 500]
+                ).update(next_date=next_date)
+        BudgetOperation.objects.bulk_create_dated(operations)
+        for budget_id, delta in deltas.items():
+            BudgetOperation.apply_balance_delta(budget_id, delta)
+        changes = {}
+        for operation in operations:
+            BudgetSummary.collect(changes, operation.state)
+        BudgetSummary.apply_additions(changes)
+        if deltas:
+            BudgetsList.touch_budgets(*deltas)
+    return len(rules), len(operations)
+
+
+def materialize(today=None, batch_size=500, max_occurrences=366):
+    today = today or timezone.localdate()
+    rules = created = 0
+    after = 0
+    while True:
+        # Batches are whole budgets, so each balance is updated once a run.
+        budget_ids = due_budget_ids(today, after, batch_size)
+        if not budget_ids:
+            break
+        batch_rules, batch_created = materialize_budgets(
+            budget_ids, today, max_occurrences
+        )
+        rules += batch_rules
+        created += batch_created
+        after = budget_ids[-1]
+    return rules, created
@@ -0,0 +1,307 @@
+import re
+from functools import lru_cache
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import BudgetOperation
+
+SQLITE_FTS_TABLE = 'budget_operation_fts'
+POSTGRES_DOCUMENT_COLUMN = 'search_document'
+
+SQLITE_CATEGORY_TITLE = (
+    "coalesce((SELECT title FROM budget_category "
+    "WHERE id = new.category_id), '')"
+)
+
+SQLITE_INSTALL = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE} '
+    f'USING fts5(note, category)',
+
+    f"CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_insert "
+    f"AFTER INSERT ON budget_budgetoperation BEGIN "
+    f"INSERT INTO {SQLITE_FTS_TABLE}(rowid, note, category) "
+    f"VALUES (new.id, coalesce(new.note, ''), {SQLITE_CATEGORY_TITLE}); "
+    f"END",
+
+    f"CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_update "
+    f"AFTER UPDATE OF note, category_id ON budget_budgetoperation BEGIN "
+    f"DELETE FROM {SQLITE_FTS_TABLE} WHERE rowid = old.id; "
+    f"INSERT INTO {SQLITE_FTS_TABLE}(rowid, note, category) "
+    f"VALUES (new.id, coalesce(new.note, ''), {SQLITE_CATEGORY_TITLE}); "
+    f"END",
+
+    f"CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_delete "
+    f"AFTER DELETE ON budget_budgetoperation BEGIN "
+    f"DELETE FROM {SQLITE_FTS_TABLE} WHERE rowid = old.id; "
+    f"END",
+
+    f"CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_category "
+    f"AFTER UPDATE OF title ON budget_category BEGIN "
+    f"UPDATE {SQLITE_FTS_TABLE} SET category = new.title WHERE rowid IN "
+    f"(SELECT id FROM budget_budgetoperation WHERE category_id = new.id); "
+    f"END",
+)
+
+SQLITE_BACKFILL = (
+    f"INSERT INTO {SQLITE_FTS_TABLE}(rowid, note, category) "
+    f"SELECT operation.id, coalesce(operation.note, ''), "
+    f"coalesce(category.title, '') FROM budget_budgetoperation operation "
+    f"LEFT JOIN budget_category category "
+    f"ON category.id = operation.category_id"
+)
+
+SQLITE_UNINSTALL = (
+    f'DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_insert',
+    f'DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_update',
+    f'DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_delete',
+    f'DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_category',
+    f'DROP TABLE IF EXISTS {SQLITE_FTS_TABLE}',
+)
+
+POSTGRES_DOCUMENT = (
+    "to_tsvector('simple', coalesce({note}, '') || ' ' || coalesce("
+    "(SELECT title FROM budget_category WHERE id = {category_id}), ''))"
+)
+
+POSTGRES_INSTALL = (
+    f'ALTER TABLE budget_budgetoperation '
+    f'ADD COLUMN IF NOT EXISTS {POSTGRES_DOCUMENT_COLUMN} tsvector',
+
+    f'CREATE INDEX IF NOT EXISTS budget_operation_search_idx '
+    f'ON budget_budgetoperation USING GIN ({POSTGRES_DOCUMENT_COLUMN})',
+
+    f'CREATE OR REPLACE FUNCTION budget_operation_search_document() '
+    f'RETURNS trigger AS $$ BEGIN '
+    f'NEW.{POSTGRES_DOCUMENT_COLUMN} := '
+    + POSTGRES_DOCUMENT.format(note='NEW.note', category_id='NEW.category_id')
+    + '; RETURN NEW; END $$ LANGUAGE plpgsql',
+
+    'DROP TRIGGER IF EXISTS budget_operation_search_document '
+    'ON budget_budgetoperation',
+
+    'CREATE TRIGGER budget_operation_search_document '
+    'BEFORE INSERT OR UPDATE OF note, category_id '
+    'ON budget_budgetoperation FOR EACH ROW '
+    'EXECUTE PROCEDURE budget_operation_search_document()',
+
+    f'CREATE OR REPLACE FUNCTION budget_category_search_document() '
+    f'RETURNS trigger AS $$ BEGIN '
+    f'UPDATE budget_budgetoperation SET {POSTGRES_DOCUMENT_COLUMN} = '
+    f'{POSTGRES_DOCUMENT.format(note="note", category_id="category_id")} '
+    f'WHERE category_id = NEW.id; '
+    f'RETURN NULL; END $$ LANGUAGE plpgsql',
+
+    'DROP TRIGGER IF EXISTS budget_category_search_document '
+    'ON budget_category',
+
+    'CREATE TRIGGER budget_category_search_document '
+    'AFTER UPDATE OF title ON budget_category FOR EACH ROW '
+    'EXECUTE PROCEDURE budget_category_search_document()',
+)
+
+POSTGRES_BACKFILL = (
+    f'UPDATE budget_budgetoperation SET {POSTGRES_DOCUMENT_COLUMN} = '
+    f'{POSTGRES_DOCUMENT.format(note="note", category_id="category_id")} '
+    f'WHERE {POSTGRES_DOCUMENT_COLUMN} IS NULL'
+)
+
+POSTGRES_UNINSTALL = (
+    'DROP TRIGGER IF EXISTS budget_category_search_document '
+    'ON budget_category',
+    'DROP FUNCTION IF EXISTS budget_category_search_document()',
+    'DROP TRIGGER IF EXISTS budget_operation_search_document '
+    'ON budget_budgetoperation',
+    'DROP FUNCTION IF EXISTS budget_operation_search_document()',
+    f'ALTER TABLE budget_budgetoperation '
+    f'DROP COLUMN IF EXISTS {POSTGRES_DOCUMENT_COLUMN}',
+)
+
+
+def sqlite_has_fts5(db):
+    with db.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return 'ENABLE_FTS5' in {row[0] for row in cursor.fetchall()}
+
+
+def install(db):
+    if db.vendor == 'sqlite' and sqlite_has_fts5(db):
+        statements, backfill = SQLITE_INSTALL, SQLITE_BACKFILL
+        created = SQLITE_FTS_TABLE not in db.introspection.table_names()
+    elif db.vendor == 'postgresql':
+        statements, backfill, created = (
+            POSTGRES_INSTALL, POSTGRES_BACKFILL, True
+        )
+    else:
+        return
+    with db.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+        if created:
+            cursor.execute(backfill)
+    get_search_backend.cache_clear()
+
+
+def restore(db):
+    # Rebuilding budget_budgetoperation during SQLite migrations drops its
+    # triggers, so put them back after every migrate run.
+    if (db.vendor == 'sqlite'
+            and SQLITE_FTS_TABLE in db.introspection.table_names()):
+        install(db)
+
+
+def uninstall(db):
+    statements = {
+        'sqlite': SQLITE_UNINSTALL,
+        'postgresql': POSTGRES_UNINSTALL,
+    }.get(db.vendor, ())
+    with db.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+    get_search_backend.cache_clear()
+
+
+class SubstringSearch:
+    ranked = False
+
+    def __init__(self, query, budget_ids):
+        self.query = query
+        self.budget_ids = budget_ids
+
+    def get_queryset(self):
+        operations = BudgetOperation.objects.filter(
+            budget_id__in=self.budget_ids
+        )
+        for term in self.query.split():
+            operations = operations.filter(
+                Q(note__icontains=term) | Q(category__title__icontains=term)
+            )
+        return operations.order_by('-date', '-id')
+
+    def count(self):
+        return self.get_queryset().count()
+
+    def ids(self, offset, limit):
+        return list(self.get_queryset().values_list(
+            'id', flat=True
+        )[offset:offset + limit])
+
+
+class RawSearch(SubstringSearch):
+    ranked = True
+    count_sql = None
+    ids_sql = None
+
+    def budget_placeholders(self):
+        return ', '.join(['%s'] * len(self.budget_ids))
+
+    def execute(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def count(self):
+        if not self.budget_ids:
+            return 0
+        sql = self.count_sql.format(budgets=self.budget_placeholders())
+        return self.execute(sql, self.params())[0][0]
+
+    def ids(self, offset, limit):
+        if not self.budget_ids:
+            return []
+        sql = self.ids_sql.format(budgets=self.budget_placeholders())
+        rows = self.execute(sql, self.params() + [limit, offset])
+        return [row[0] for row in rows]
+
+
+class SQLiteSearch(RawSearch):
+    count_sql = (
+        f'SELECT count(*) FROM {SQLITE_FTS_TABLE} '
+        f'JOIN budget_budgetoperation operation '
+        f'ON operation.id = {SQLITE_FTS_TABLE}.rowid '
+        f'WHERE {SQLITE_FTS_TABLE} MATCH %s '
+        f'AND operation.budget_id IN ({{budgets}})'
+    )
+    ids_sql = (
+        f'SELECT operation.id FROM {SQLITE_FTS_TABLE} '
+        f'JOIN budget_budgetoperation operation '
+        f'ON operation.id = {SQLITE_FTS_TABLE}.rowid '
+        f'WHERE {SQLITE_FTS_TABLE} MATCH %s '
+        f'AND operation.budget_id IN ({{budgets}}) '
+        f'ORDER BY {SQLITE_FTS_TABLE}.rank, operation.id DESC '
+        f'LIMIT %s OFFSET %s'
+    )
+
+    def params(self):
+        # Quote every word, so user input is never parsed as FTS5 syntax,
+        # and match words by prefix.
+        terms = re.findall(r'\w+', self.query)
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return [match] + list(self.budget_ids)
+
+
+class PostgresSearch(RawSearch):
+    count_sql = (
+        f"SELECT count(*) FROM budget_budgetoperation "
+        f"WHERE {POSTGRES_DOCUMENT_COLUMN} @@ plainto_tsquery('simple', %s) "
+        f"AND budget_id IN ({{budgets}})"
+    )
+    ids_sql = (
+        f"SELECT id FROM budget_budgetoperation "
+        f"WHERE {POSTGRES_DOCUMENT_COLUMN} @@ plainto_tsquery('simple', %s) "
+        f"AND budget_id IN ({{budgets}}) "
+        f"ORDER BY ts_rank({POSTGRES_DOCUMENT_COLUMN}, "
+        f"plainto_tsquery('simple', %s)) DESC, id DESC "
+        f"LIMIT %s OFFSET %s"
+    )
+
+    def params(self):
+        return [self.query] + list(self.budget_ids)
+
+    def ids(self, offset, limit):
+        if not self.budget_ids:
+            return []
+        sql = self.ids_sql.format(budgets=self.budget_placeholders())
+        rows = self.execute(
+            sql, self.params() + [self.query, limit, offset]
+        )
+        return [row[0] for row in rows]
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    if connection.vendor == 'sqlite':
+        if SQLITE_FTS_TABLE in connection.introspection.table_names():
+            return SQLiteSearch
+    elif connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            columns = connection.introspection.get_table_description(
+                cursor, BudgetOperation._meta.db_table
+            )
+        if POSTGRES_DOCUMENT_COLUMN in {column.name for column in columns}:
+            return PostgresSearch
+    return SubstringSearch
+
+
+class SearchResults:
+
+    def __init__(self, query, budget_ids):
+        self.search = get_search_backend()(query, list(budget_ids))
+
+    def count(self):
+        if not hasattr(self, '_count'):
+            self._count = self.search.count()
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        offset = index.start or 0
+        ids = self.search.ids(offset, (index.stop or self.count()) - offset)
+        operations = BudgetOperation.objects.select_related(
+            'category', 'user'
+        ).in_bulk(ids)
+        return [operations[pk] for pk in ids if pk in operations]
@@ -1,9 +1,18 @@
+import re
+from collections import defaultdict
+
 from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.encoding import smart_str
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
-from .models import (Budget, BudgetOperation, BudgetsList, Category,
-                     SharePermission)
+from .columnar import FORMATS, available_formats
+from .history import INTERVALS
+from .models import (Budget, BudgetOperation, BudgetsList, BudgetSummary,
+                     Category, Job, RecurringOperation, SharePermission)
 
 User = get_user_model()
 
@@ -15,8 +24,64 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ('id', 'title')
 
 
+class CategoryTitleField(serializers.SlugRelatedField):
+
+    def to_internal_value(self, data):
+        categories = self.context.get('categories')
+        if categories is None:
+            return super().to_internal_value(data)
+        try:
+            return categories[data]
+        except (KeyError, TypeError):
+            self.fail(
+                'does_not_exist',
+                slug_name=self.slug_field,
+                value=smart_str(data)
+            )
+
+
+class BudgetOperationListSerializer(serializers.ListSerializer):
+    batch_size = 500
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            # Other values are reported by CategoryTitleField.
+            titles = {
+                item['category'] for item in data
+                if isinstance(item, dict)
+                and isinstance(item.get('category'), str)
+            }
+            self.context['categories'] = {
+                category.title: category
+                for category in Category.objects.filter(
+                    title__in=titles
+                ).order_by('-id')
+            }
+        return super().to_internal_value(data)
+
+    def create(self, validated_data):
+        operations = [BudgetOperation(**item) for item in validated_data]
+        deltas = defaultdict(int)
+        for operation in operations:
+            deltas[operation.budget_id] += BudgetOperation.signed_amount(
+                operation.operation_type, operation.amount
+            )
+        with transaction.atomic():
+            BudgetOperation.objects.bulk_create(
+                operations, batch_size=self.batch_size
+            )
+            for budget_id, delta in deltas.items():
+                BudgetOperation.apply_balance_delta(budget_id, delta)
+            changes = {}
+            for operation in operations:
+                BudgetSummary.collect(changes, operation.state)
+            BudgetSummary.apply_changes(changes)
+            BudgetsList.touch_budgets(*deltas)
+        return operations
+
+
 class BudgetOperationSerializer(serializers.ModelSerializer):
-    category = serializers.SlugRelatedField(
+    category = CategoryTitleField(
         slug_field='title',
         queryset=Category.objects.all()
     )
@@ -33,6 +98,51 @@ class BudgetOperationSerializer(serializers.ModelSerializer):
             'user',
             'date'
         )
+        list_serializer_class = BudgetOperationListSerializer
+
+
+class RecurringOperationSerializer(serializers.ModelSerializer):
+    category = CategoryTitleField(
+        slug_field='title',
+        queryset=Category.objects.all()
+    )
+    user = serializers.CharField(source='user.username', read_only=True)
+
+    class Meta:
+        model = RecurringOperation
+        fields = (
+            'id',
+            'operation_type',
+            'category',
+            'amount',
+            'note',
+            'user',
+            'frequency',
+            'interval',
+            'start_date',
+            'end_date',
+            'next_date'
+        )
+
+    def validate(self, attrs):
+        start_date = attrs.get(
+            'start_date', getattr(self.instance, 'start_date', None)
+        )
+        end_date = attrs.get(
+            'end_date', getattr(self.instance, 'end_date', None)
+        )
+        if start_date and end_date and end_date < start_date:
+            raise ValidationError(
+                {'end_date': 'Must not be earlier than start_date.'}
+            )
+        return attrs
+
+
+class SearchResultSerializer(BudgetOperationSerializer):
+    budget = serializers.IntegerField(source='budget_id', read_only=True)
+
+    class Meta(BudgetOperationSerializer.Meta):
+        fields = ('budget',) + BudgetOperationSerializer.Meta.fields
 
 
 class BudgetCreateSerializer(serializers.ModelSerializer):
@@ -69,6 +179,92 @@ class BudgetSerializer(serializers.ModelSerializer):
         )
 
 
+class BudgetSummarySerializer(serializers.ModelSerializer):
+    category = serializers.SlugRelatedField(
+        slug_field='title',
+        read_only=True
+    )
+
+    class Meta:
+        model = BudgetSummary
+        fields = ('month', 'category', 'operation_type', 'total', 'count')
+
+
+class TotalsQuerySerializer(serializers.Serializer):
+    currency = serializers.ChoiceField(
+        choices=Budget.Currency.choises,
+        default=settings.BUDGET_BASE_CURRENCY
+    )
+    date = serializers.DateField(default=timezone.localdate)
+
+
+class HistoryQuerySerializer(serializers.Serializer):
+    interval = serializers.ChoiceField(
+        choices=('auto',) + INTERVALS,
+        default='auto'
+    )
+    date_after = serializers.DateField(required=False)
+    date_before = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if attrs.get('date_after') and attrs.get('date_before') and (
+                attrs['date_after'] > attrs['date_before']):
+            raise ValidationError(
+                {'date_before': 'Must not be earlier than date_after.'}
+            )
+        return attrs
+
+
+class InsightsQuerySerializer(serializers.Serializer):
+    month = serializers.DateField(
+        default=lambda: timezone.localdate().replace(day=1)
+    )
+
+    def validate_month(self, value):
+        return value.replace(day=1)
+
+
+class ExportQuerySerializer(serializers.Serializer):
+    type = serializers.ChoiceField(choices=FORMATS, default='csv')
+
+    def validate_type(self, value):
+        if value not in available_formats():
+            raise ValidationError(f'Exporting {value} requires pyarrow.')
+        return value
+
+
+class JobSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Job
+        fields = (
+            'id',
+            'kind',
+            'status',
+            'budgets_list',
+            'progress',
+            'total',
+            'attempts',
+            'max_attempts',
+            'error',
+            'result',
+            'created',
+            'started',
+            'finished'
+        )
+        read_only_fields = fields
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=200)
+    budget = serializers.IntegerField(required=False)
+
+    def validate_q(self, value):
+        if not re.search(r'\w', value):
+            raise ValidationError('Enter at least one word to search for.')
+        return value
+
+
 class BudgetsListSerializer(serializers.ModelSerializer):
     owner = serializers.CharField(source='owner.username', read_only=True)
     budgets = ShortBudgetSerializer(many=True, read_only=True)
@@ -93,4 +289,9 @@ class ShareSerializer(serializers.ModelSerializer):
             return attrs
         if self.context['request'].user == attrs['user']:
             raise ValidationError('You cannot share access to yourself')
+        if SharePermission.objects.filter(
+            budgets_list_id=self.context['view'].kwargs['list_id'],
+            user=attrs['user']
+        ).exists():
+            raise ValidationError('This list is already shared to the user')
         return attrs
@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .access import invalidate_list_ids
+from .authentication import invalidate_tokens
+from .metrics import install_query_recorder
+from .models import (Budget, BudgetOperation, BudgetsList, Category,
+                     SharePermission)
+
+
+@receiver(post_save, sender=BudgetsList)
+@receiver(post_delete, sender=BudgetsList)
+def invalidate_owner_list_ids(sender, instance, **kwargs):
+    if kwargs.get('created', True):
+        invalidate_list_ids(instance.owner_id)
+
+
+@receiver(pre_save, sender=SharePermission)
+def invalidate_previous_share_user(sender, instance, **kwargs):
+    if instance.pk is None:
+        return
+    previous_user_id = SharePermission.objects.filter(
+        pk=instance.pk
+    ).values_list('user_id', flat=True).first()
+    if previous_user_id not in (None, instance.user_id):
+        invalidate_list_ids(previous_user_id)
+
+
+@receiver(post_save, sender=SharePermission)
+@receiver(post_delete, sender=SharePermission)
+def invalidate_share_user_list_ids(sender, instance, **kwargs):
+    invalidate_list_ids(instance.user_id)
+
+
+@receiver(post_save, sender=Budget)
+@receiver(post_delete, sender=Budget)
+@receiver(post_save, sender=SharePermission)
+@receiver(post_delete, sender=SharePermission)
+def touch_budgets_list(sender, instance, **kwargs):
+    list_id = getattr(instance, 'budget_list_id', None)
+    BudgetsList.touch(list_id or instance.budgets_list_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def touch_category_lists(sender, instance, **kwargs):
+    BudgetsList.touch_categories(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_tokens(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    # Cached tokens carry a copy of the user, so drop them whenever the user
+    # changes, e.g. when it is deactivated.
+    if not created:
+        invalidate_tokens(*Token.objects.filter(
+            user=instance
+        ).values_list('key', flat=True))
+
+
+@receiver(pre_delete, sender=get_user_model())
+def delete_user_operations(sender, instance, **kwargs):
+    # The cascade deletes these rows without touching the balances of budgets
+    # shared by other users, so delete them through the queryset first.
+    BudgetOperation.objects.filter(user=instance).delete()
+
+
+@receiver(connection_created)
+def set_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+@receiver(connection_created)
+def record_queries(sender, connection, **kwargs):
+    install_query_recorder(connection)
@@ -0,0 +1,649 @@
+import csv
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db.models import F, Sum
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from budget.currency import convert
+from budget.jobs import (HANDLERS, Progress, claim, enqueue, job_path,
+                         purge, requeue_stale, run_job)
+from budget.models import (Budget, BudgetOperation, BudgetsList,
+                           BudgetSummary, Category, CurrencyRate, Job,
+                           RecurringOperation)
+
+User = get_user_model()
+
+
+class RebuildBudgetSummariesCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.budgets_list = BudgetsList.objects.create(
+            title='Testing',
+            owner=cls.user,
+        )
+        cls.category = Category.objects.create(title='Test category')
+        cls.budget = Budget.objects.create(
+            title='Main',
+            currency=Budget.Currency.USD,
+            owner=cls.user,
+            budget_list=cls.budgets_list
+        )
+
+    def setUp(self):
+        for amount in ('10.00', '20.00'):
+            BudgetOperation.objects.create(
+                budget=self.budget,
+                operation_type=BudgetOperation.OperationType.EXPENSE,
+                category=self.category,
+                amount=Decimal(amount),
+                user=self.user
+            )
+
+    def test_check_in_sync(self):
+        out = StringIO()
+        call_command('rebuild_budget_summaries', '--check', stdout=out)
+        self.assertIn('in sync', out.getvalue())
+
+    def test_check_reports_drift(self):
+        BudgetSummary.objects.update(total=Decimal('1.00'))
+        with self.assertRaises(CommandError):
+            call_command(
+                'rebuild_budget_summaries', '--check', stdout=StringIO()
+            )
+
+    def test_rebuild(self):
+        BudgetSummary.objects.all().delete()
+        call_command('rebuild_budget_summaries', stdout=StringIO())
+        summary = BudgetSummary.objects.get(budget=self.budget)
+        self.assertEqual(summary.total, Decimal('30.00'))
+        self.assertEqual(summary.count, 2)
+        call_command(
+            'rebuild_budget_summaries', '--check', stdout=StringIO()
+        )
+
+
+class ReconcileBalancesCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.budgets_list = BudgetsList.objects.create(
+            title='Testing',
+            owner=cls.user,
+        )
+        cls.category = Category.objects.create(title='Test category')
+
+    def setUp(self):
+        self.budget = Budget.objects.create(
+            title='Main',
+            currency=Budget.Currency.USD,
+            initial_balance=Decimal('100.00'),
+            owner=self.user,
+            budget_list=self.budgets_list
+        )
+        self.other = Budget.objects.create(
+            title='Other',
+            currency=Budget.Currency.USD,
+            initial_balance=Decimal('5.00'),
+            owner=self.user,
+            budget_list=self.budgets_list
+        )
+        for operation_type, amount in (
+                (BudgetOperation.OperationType.INCOME, '50.00'),
+                (BudgetOperation.OperationType.EXPENSE, '20.00'),
+                (BudgetOperation.OperationType.EXPENSE, '0.10')):
+            BudgetOperation.objects.create(
+                budget=self.budget,
+                operation_type=operation_type,
+                category=self.category,
+                amount=Decimal(amount),
+                user=self.user
+            )
+
+    def test_in_sync(self):
+        out = StringIO()
+        call_command('reconcile_balances', stdout=out)
+        self.assertIn('in sync', out.getvalue())
+
+    def test_reports_drift(self):
+        Budget.objects.filter(pk=self.budget.pk).update(
+            balance=Decimal('149.90')
+        )
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('reconcile_balances', stdout=out)
+        self.assertIn(
+            f'Budget {self.budget.id}: expected 129.90, found 149.90',
+            out.getvalue()
+        )
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.balance, Decimal('149.90'))
+
+    def test_fix(self):
+        Budget.objects.filter(pk=self.budget.pk).update(
+            balance=Decimal('149.90')
+        )
+        Budget.objects.filter(pk=self.other.pk).update(balance=Decimal('0'))
+        version = BudgetsList.objects.get(pk=self.budgets_list.pk).version
+        out = StringIO()
+        # One scan, then per batch: lock, recompute, update, touch lists.
+        with self.assertNumQueries(7):
+            call_command('reconcile_balances', '--fix', stdout=out)
+        self.assertIn('Fixed 2 budget balances', out.getvalue())
+        self.budget.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.budget.balance, Decimal('129.90'))
+        self.assertEqual(self.other.balance, Decimal('5.00'))
+        self.assertGreater(
+            BudgetsList.objects.get(pk=self.budgets_list.pk).version, version
+        )
+        call_command('reconcile_balances', stdout=StringIO())
+
+    def test_only_given_budgets(self):
+        Budget.objects.update(balance=Decimal('1.00'))
+        call_command(
+            'reconcile_balances', '--fix', '--budget', str(self.other.id),
+            stdout=StringIO()
+        )
+        self.other.refresh_from_db()
+        self.budget.refresh_from_db()
+        self.assertEqual(self.other.balance, Decimal('5.00'))
+        self.assertEqual(self.budget.balance, Decimal('1.00'))
+
+    def test_admin_action(self):
+        admin = User.objects.create_superuser(username='Admin')
+        self.client.force_login(admin)
+        Budget.objects.filter(pk=self.budget.pk).update(balance=Decimal('0'))
+        response = self.client.post(
+            reverse('admin:budget_budget_changelist'),
+            {
+                'action': 'reconcile_balances',
+                '_selected_action': [self.budget.id, self.other.id],
+            },
+            follow=True
+        )
+        self.assertContains(response, 'Fixed 1 of 2 budget balances')
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.balance, Decimal('129.90'))
+
+
+class MaterializeRecurringOperationsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.budgets_list = BudgetsList.objects.create(
+            title='Testing',
+            owner=cls.user,
+        )
+        cls.category = Category.objects.create(title='Rent')
+        cls.budgets = [
+            Budget.objects.create(
+                title=title,
+                currency=Budget.Currency.USD,
+                initial_balance=Decimal('1000.00'),
+                owner=cls.user,
+                budget_list=cls.budgets_list
+            )
+            for title in ('Cash', 'Card', 'Savings')
+        ]
+
+    def create_rule(self, budget, operation_type, amount, frequency,
+                    start_date, **kwargs):
+        return RecurringOperation.objects.create(
+            budget=budget,
+            operation_type=operation_type,
+            category=self.category,
+            amount=Decimal(amount),
+            user=self.user,
+            frequency=frequency,
+            start_date=start_date,
+            **kwargs
+        )
+
+    def materialize(self, day, *args):
+        out = StringIO()
+        call_command(
+            'materialize_recurring_operations', '--date', day, *args,
+            stdout=out
+        )
+        return out.getvalue()
+
+    def test_materialize(self):
+        self.create_rule(
+            self.budgets[0], BudgetOperation.OperationType.EXPENSE, '300.00',
+            'monthly', date(2021, 1, 31)
+        )
+        self.create_rule(
+            self.budgets[0], BudgetOperation.OperationType.INCOME, '1500.00',
+            'monthly', date(2021, 1, 25), end_date=date(2021, 2, 25)
+        )
+        self.create_rule(
+            self.budgets[1], BudgetOperation.OperationType.EXPENSE, '5.00',
+            'weekly', date(2021, 3, 1)
+        )
+        self.create_rule(
+            self.budgets[2], BudgetOperation.OperationType.EXPENSE, '9.99',
+            'monthly', date(2022, 1, 1)
+        )
+
+        out = self.materialize('2021-03-31', '--batch-size', '1')
+        self.assertIn('Created 10 operations from 3 recurring', out)
+        rent = BudgetOperation.objects.filter(
+            budget=self.budgets[0], amount=Decimal('300.00')
+        ).order_by('date')
+        self.assertEqual(
+            [operation.date.date() for operation in rent],
+            [date(2021, 1, 31), date(2021, 2, 28), date(2021, 3, 31)]
+        )
+        balances = dict(Budget.objects.values_list('id', 'balance'))
+        self.assertEqual(balances[self.budgets[0].id], Decimal('3100.00'))
+        self.assertEqual(balances[self.budgets[1].id], Decimal('975.00'))
+        self.assertEqual(balances[self.budgets[2].id], Decimal('1000.00'))
+        call_command('reconcile_balances', stdout=StringIO())
+        call_command(
+            'rebuild_budget_summaries', '--check', stdout=StringIO()
+        )
+
+        self.assertIn('Created 0 operations', self.materialize('2021-03-31'))
+        self.assertEqual(BudgetOperation.objects.count(), 10)
+        self.assertIn('Created 1 operations', self.materialize('2021-04-05'))
+
+    def test_catch_up_is_limited_per_run(self):
+        rule = self.create_rule(
+            self.budgets[0], BudgetOperation.OperationType.EXPENSE, '1.00',
+            'daily', date(2021, 1, 1)
+        )
+        self.materialize('2021-01-31', '--max-occurrences', '20')
+        rule.refresh_from_db()
+        self.assertEqual(rule.next_date, date(2021, 1, 21))
+        self.materialize('2021-01-31', '--max-occurrences', '20')
+        self.assertEqual(BudgetOperation.objects.count(), 31)
+        summary = BudgetSummary.objects.get(budget=self.budgets[0])
+        self.assertEqual(summary.count, 31)
+        call_command('reconcile_balances', stdout=StringIO())
+        call_command(
+            'rebuild_budget_summaries', '--check', stdout=StringIO()
+        )
+
+    def test_queries_do_not_grow_with_rules(self):
+        for budget in self.budgets:
+            for amount in range(1, 11):
+                self.create_rule(
+                    budget, BudgetOperation.OperationType.EXPENSE, amount,
+                    'monthly', date(2021, 1, 1)
+                )
+        # Budget ids, then per batch: lock rules, update them (all move to the
+        # same date), insert operations, read their ids and date them with
+        # one update per occurrence date, one balance update per budget,
+        # read and insert summaries and touch the lists; the last query
+        # finds no more budgets.
+        with self.assertNumQueries(18):
+            self.materialize('2021-02-28')
+        self.assertEqual(BudgetOperation.objects.count(), 60)
+        self.assertEqual(
+            BudgetOperation.objects.filter(date__month=2).count(), 30
+        )
+
+    def test_invalid_date(self):
+        with self.assertRaises(CommandError):
+            self.materialize('31.03.2021')
+
+
+class LoadCurrencyRatesCommandTest(TestCase):
+
+    def write_rates(self, content):
+        rates_file = tempfile.NamedTemporaryFile(
+            'w', suffix='.csv', delete=False
+        )
+        with rates_file:
+            rates_file.write(content)
+        self.addCleanup(os.remove, rates_file.name)
+        return rates_file.name
+
+    def test_load_rates(self):
+        path = self.write_rates(
+            'date,currency,rate\n'
+            '2021-01-01,Euro,1.2\n'
+            '2021-01-02,Euro,1.25\n'
+        )
+        call_command('load_currency_rates', path, stdout=StringIO())
+        self.assertEqual(CurrencyRate.objects.count(), 2)
+        self.assertEqual(
+            convert(Decimal('10.00'), 'Euro', 'USD', date(2021, 1, 5)),
+            Decimal('12.50')
+        )
+
+        path = self.write_rates('date,currency,rate\n2021-01-02,Euro,2\n')
+        call_command('load_currency_rates', path, stdout=StringIO())
+        self.assertEqual(CurrencyRate.objects.count(), 2)
+        self.assertEqual(
+            convert(Decimal('10.00'), 'Euro', 'USD', date(2021, 1, 5)),
+            Decimal('20.00')
+        )
+
+    def test_invalid_rates(self):
+        path = self.write_rates('date,currency,rate\n2021-01-01,BTC,1\n')
+        with self.assertRaises(CommandError):
+            call_command('load_currency_rates', path, stdout=StringIO())
+        self.assertFalse(CurrencyRate.objects.exists())
+
+
+class GenerateBudgetDataCommandTest(TestCase):
+
+    def generate(self, **options):
+        defaults = {
+            'users': 4,
+            'lists_per_user': 2,
+            'shares_per_list': 2,
+            'budgets_per_list': 2,
+            'operations': 1200,
+            'days': 90,
+        }
+        call_command(
+            'generate_budget_data',
+            stdout=StringIO(),
+            **{**defaults, **options}
+        )
+
+    def test_generate(self):
+        self.generate()
+        self.assertEqual(User.objects.count(), 4)
+        self.assertEqual(BudgetsList.objects.count(), 8)
+        self.assertEqual(Budget.objects.count(), 16)
+        self.assertEqual(BudgetOperation.objects.count(), 1200)
+        self.assertFalse(BudgetsList.objects.filter(
+            shared_permissions__user=F('owner')
+        ).exists())
+        self.assertEqual(
+            BudgetsList.objects.filter(shared_permissions__isnull=False)
+            .values('id').distinct().count(),
+            8
+        )
+        self.assertGreater(
+            BudgetOperation.objects.dates('date', 'month').count(), 1
+        )
+
+        for budget in Budget.objects.all():
+            operations = budget.budget_operations.values(
+                'operation_type'
+            ).annotate(total=Sum('amount'))
+            balance = budget.initial_balance
+            for row in operations:
+                balance += BudgetOperation.signed_amount(
+                    row['operation_type'], row['total']
+                )
+            self.assertEqual(
+                budget.balance, balance.quantize(Decimal('0.01'))
+            )
+        call_command(
+            'rebuild_budget_summaries', check=True, stdout=StringIO()
+        )
+
+    def test_existing_users(self):
+        self.generate(operations=10)
+        with self.assertRaises(CommandError):
+            self.generate(operations=10)
+        self.generate(operations=10, prefix='other')
+        self.assertEqual(User.objects.count(), 8)
+
+
+class RunJobsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.budgets_list = BudgetsList.objects.create(
+            title='Testing',
+            owner=cls.user,
+        )
+        cls.category = Category.objects.create(title='Food')
+        cls.budget = Budget.objects.create(
+            title='Main',
+            currency=Budget.Currency.USD,
+            initial_balance=Decimal('100.00'),
+            owner=cls.user,
+            budget_list=cls.budgets_list
+        )
+
+    def setUp(self):
+        files_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, files_dir)
+        settings = self.settings(
+            BUDGET_JOB_FILES_DIR=files_dir, BUDGET_JOB_RETRY_DELAY=30
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def run_jobs(self):
+        output = StringIO()
+        call_command('run_jobs', processes=0, once=True, stdout=output)
+        return output.getvalue()
+
+    def enqueue(self, kind, upload=None, **payload):
+        return enqueue(
+            kind, self.user, self.budgets_list.id, upload=upload, **payload
+        )
+
+    def enqueue_import(self, content):
+        return self.enqueue(
+            Job.Kind.IMPORT_OPERATIONS,
+            upload=SimpleUploadedFile('operations.csv', content.encode()),
+            budget=self.budget.id
+        )
+
+    def test_export(self):
+        for number in range(3):
+            BudgetOperation.objects.create(
+                budget=self.budget,
+                operation_type=BudgetOperation.OperationType.EXPENSE,
+                category=self.category,
+                amount=Decimal('1.00'),
+                note=f'Operation {number}',
+                user=self.user
+            )
+        job = self.enqueue(Job.Kind.EXPORT, type='csv')
+        self.assertIn('Ran 1 jobs', self.run_jobs())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.SUCCEEDED)
+        self.assertEqual((job.progress, job.total, job.attempts), (3, 3, 1))
+        self.assertEqual(job.result, {
+            'file': f'job-{job.id}-list-{self.budgets_list.id}-operations.csv',
+            'type': 'csv',
+            'rows': 3,
+        })
+        with open(job_path(job.result['file'])) as exported:
+            self.assertEqual(
+                [row['note'] for row in csv.DictReader(exported)],
+                ['Operation 0', 'Operation 1', 'Operation 2']
+            )
+
+    def test_invalid_import_saves_nothing(self):
+        job = self.enqueue_import(
+            'operation_type,category,amount,note\n'
+            'Expense,Food,10.00,Lunch\n'
+            'Income,Food,25.00,\n'
+            'Expense,,5.00,No category\n'
+        )
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.QUEUED)
+        self.assertFalse(BudgetOperation.objects.exists())
+
+        self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.error, 'Row 3: category: This field is required.')
+        self.assertFalse(BudgetOperation.objects.exists())
+
+    @mock.patch('budget.jobs.IMPORT_CHUNK_SIZE', 2)
+    def test_import_resumes_after_imported_rows(self):
+        job = self.enqueue_import(
+            'operation_type,category,amount\n'
+            'Expense,Food,10.00\n'
+            'Expense,Food,20.00\n'
+            'Income,Food,40.00\n'
+        )
+        # As if an earlier attempt stopped after importing the first chunk.
+        Job.objects.filter(pk=job.pk).update(progress=2, attempts=1)
+        self.run_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.SUCCEEDED)
+        self.assertEqual((job.progress, job.total, job.attempts), (3, 3, 2))
+        self.assertEqual(job.result, {'created': 3, 'balance': '140.00'})
+        self.assertEqual(
+            list(BudgetOperation.objects.values_list('amount', flat=True)),
+            [Decimal('40.00')]
+        )
+        self.assertEqual(
+            BudgetSummary.objects.get(budget=self.budget).total,
+            Decimal('40.00')
+        )
+
+    def test_retries_with_backoff(self):
+        job = self.enqueue(Job.Kind.REBUILD_BUDGET, budget=self.budget.id)
+        failing = mock.Mock(side_effect=OSError('disk full'))
+        with mock.patch.dict(HANDLERS, {Job.Kind.REBUILD_BUDGET: failing}):
+            self.run_jobs()
+            job.refresh_from_db()
+            self.assertEqual(job.status, Job.Status.QUEUED)
+            self.assertEqual(job.error, 'OSError: disk full')
+            self.assertEqual(job.attempts, 1)
+            self.assertGreater(
+                job.run_after, timezone.now() + timedelta(seconds=25)
+            )
+
+            # Not due yet.
+            self.assertIn('Ran 0 jobs', self.run_jobs())
+            for _ in range(2):
+                Job.objects.filter(pk=job.pk).update(
+                    run_after=timezone.now()
+                )
+                self.run_jobs()
+            job.refresh_from_db()
+            self.assertEqual(failing.call_count, 3)
+            self.assertEqual(job.status, Job.Status.FAILED)
+            self.assertEqual(job.attempts, 3)
+            self.assertIsNotNone(job.finished)
+
+    def test_stale_job_is_retried(self):
+        job = self.enqueue(Job.Kind.REBUILD_BUDGET, budget=self.budget.id)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.Status.RUNNING,
+            attempts=1,
+            worker='gone:1',
+            heartbeat=timezone.now() - timedelta(hours=1)
+        )
+        requeue_stale(300)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.QUEUED)
+        self.assertEqual(job.error, 'The worker running the job stopped.')
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.SUCCEEDED)
+        self.assertEqual(job.attempts, 2)
+
+    def lose_claim(self, job):
+        Job.objects.filter(pk=job.pk).update(
+            heartbeat=timezone.now() - timedelta(hours=1)
+        )
+        requeue_stale(300)
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        self.assertEqual(claim('other:1', 1), [job.pk])
+
+    def run_losing_claim(self, last_step):
+        job = self.enqueue(Job.Kind.REBUILD_BUDGET, budget=self.budget.id)
+
+        def losing(job, progress):
+            progress.update(1, 2)
+            self.lose_claim(job)
+            return last_step(progress)
+
+        claim('first:1', 1)
+        with mock.patch.dict(HANDLERS, {Job.Kind.REBUILD_BUDGET: losing}):
+            run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(
+            (job.status, job.worker, job.attempts),
+            (Job.Status.RUNNING, 'other:1', 2)
+        )
+        self.assertIsNone(job.result)
+        return job
+
+    def test_progress_is_a_heartbeat(self):
+        job = self.enqueue(Job.Kind.REBUILD_BUDGET, budget=self.budget.id)
+        claim('first:1', 1)
+        Job.objects.filter(pk=job.pk).update(
+            heartbeat=timezone.now() - timedelta(hours=1)
+        )
+        job.refresh_from_db()
+        Progress(job).update(1, 2)
+        requeue_stale(300)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.RUNNING)
+
+    def test_requeued_run_does_not_finish_the_job(self):
+        self.run_losing_claim(lambda progress: {'done': True})
+
+    def test_requeued_run_stops_at_next_progress(self):
+        with self.assertLogs('budget.jobs', 'WARNING'):
+            job = self.run_losing_claim(lambda progress: progress.update(2))
+        self.assertEqual(job.progress, 1)
+
+    def test_rebuild_budget(self):
+        BudgetOperation.objects.create(
+            budget=self.budget,
+            operation_type=BudgetOperation.OperationType.EXPENSE,
+            category=self.category,
+            amount=Decimal('30.00'),
+            user=self.user
+        )
+        Budget.objects.filter(pk=self.budget.pk).update(balance=0)
+        BudgetSummary.objects.all().delete()
+        job = self.enqueue(Job.Kind.REBUILD_BUDGET, budget=self.budget.id)
+        self.run_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.SUCCEEDED)
+        self.assertEqual(job.result, {
+            'balance': '70.00', 'balance_fixed': True
+        })
+        self.assertEqual(
+            BudgetSummary.objects.get(budget=self.budget).total,
+            Decimal('30.00')
+        )
+
+    def test_purge(self):
+        job = self.enqueue_import('operation_type,category,amount\n')
+        kept = self.enqueue(Job.Kind.EXPORT)
+        self.run_jobs()
+        Job.objects.filter(pk=job.pk).update(
+            finished=timezone.now() - timedelta(days=8)
+        )
+        upload = job_path(job.payload['file'])
+        self.assertTrue(os.path.exists(upload))
+
+        self.assertEqual(purge(7), 1)
+        self.assertFalse(os.path.exists(upload))
+        self.assertEqual(list(Job.objects.all()), [kept])
+
+    def test_invalid_options(self):
+        with self.assertRaises(CommandError):
+            call_command('run_jobs', processes=-1, stdout=StringIO())
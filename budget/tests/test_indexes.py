@@ -0,0 +1,126 @@
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from budget.filters import OperationFilter
+from budget.models import (Budget, BudgetOperation, BudgetsList,
+                           Category, SharePermission)
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor in ('sqlite', 'postgresql'),
+            'Query plans are only checked on SQLite and PostgreSQL')
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.second_user = User.objects.create_user(username='TestUser2')
+        cls.budgets_list = BudgetsList.objects.create(
+            title='Testing',
+            owner=cls.user,
+        )
+        cls.category = Category.objects.create(title='Test category')
+        cls.budget = Budget.objects.create(
+            title='Main',
+            currency=Budget.Currency.USD,
+            owner=cls.user,
+            budget_list=cls.budgets_list
+        )
+        BudgetOperation.objects.create(
+            budget=cls.budget,
+            operation_type=BudgetOperation.OperationType.INCOME,
+            category=cls.category,
+            amount=Decimal('10.00'),
+            user=cls.user
+        )
+        SharePermission.objects.create(
+            budgets_list=cls.budgets_list,
+            owner=cls.user,
+            user=cls.second_user
+        )
+
+    def explain(self, queryset):
+        if connection.vendor == 'postgresql':
+            # The test tables are tiny, so make the planner prove that an
+            # index is usable instead of picking a sequential scan.
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def assertUsesIndex(self, queryset, index_name=None):
+        plan = self.explain(queryset)
+        table = queryset.model._meta.db_table
+        if connection.vendor == 'sqlite':
+            self.assertNotIn(f'SCAN {table}\n', plan + '\n')
+            self.assertNotIn(f'SCAN TABLE {table}\n', plan + '\n')
+            self.assertIn('INDEX', plan)
+            self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+        else:
+            self.assertNotIn(f'Seq Scan on {table}', plan)
+            self.assertNotIn('Sort', plan)
+        if index_name is not None:
+            self.assertIn(index_name, plan)
+
+    def test_operations_by_budget_ordered_by_date(self):
+        self.assertUsesIndex(
+            BudgetOperation.objects.filter(budget=self.budget).order_by(
+                'date', 'id'
+            ),
+            'operation_budget_date_idx'
+        )
+
+    def test_operation_filters_use_budget_date_index(self):
+        filterset = OperationFilter(
+            {
+                'date_after': '2021-01-01',
+                'date_before': '2021-12-31',
+                'amount_min': '10',
+                'category_prefix': 'Test',
+            },
+            queryset=BudgetOperation.objects.filter(budget=self.budget)
+        )
+        self.assertTrue(filterset.is_valid())
+        self.assertUsesIndex(
+            filterset.qs.order_by('date', 'id'), 'operation_budget_date_idx'
+        )
+
+    def test_category_by_title(self):
+        self.assertUsesIndex(
+            Category.objects.filter(title=self.category.title).order_by(),
+            'category_title_idx'
+        )
+
+    def test_budgets_of_list_ordered_by_create_date(self):
+        self.assertUsesIndex(
+            Budget.objects.filter(budget_list=self.budgets_list).order_by(
+                'create_date', 'id'
+            ),
+            'budget_list_created_idx'
+        )
+
+    def test_share_permission_by_list_and_user(self):
+        self.assertUsesIndex(
+            SharePermission.objects.filter(
+                budgets_list=self.budgets_list,
+                user=self.second_user
+            ).order_by()
+        )
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+class SQLitePragmaTests(TestCase):
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connection_pragmas(self):
+        # 1 is NORMAL; the in-memory test database cannot use WAL.
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertIn(self.pragma('journal_mode'), ('wal', 'memory'))
@@ -0,0 +1,127 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from budget.metrics import (Registry, instrument_serializers,
+                            uninstrument_serializers)
+from budget.models import Budget, BudgetsList
+
+User = get_user_model()
+
+
+@override_settings(BUDGET_METRICS_ENABLED=True, BUDGET_QUERY_BUDGET=20)
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.budgets_list = BudgetsList.objects.create(
+            title='Testing',
+            owner=cls.user,
+        )
+        Budget.objects.create(
+            title='Main',
+            owner=cls.user,
+            budget_list=cls.budgets_list
+        )
+        cls.admin = User.objects.create_user(username='Admin', is_staff=True)
+        # Serializers are only timed when metrics are on at startup.
+        instrument_serializers()
+
+    @classmethod
+    def tearDownClass(cls):
+        uninstrument_serializers()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        self.token = f'Token {Token.objects.create(user=self.user).key}'
+        self.admin_token = (
+            f'Token {Token.objects.create(user=self.admin).key}'
+        )
+        patcher = mock.patch('budget.metrics.registry', Registry())
+        self.registry = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, url):
+        return self.client.get(url, HTTP_AUTHORIZATION=self.token)
+
+    def samples(self):
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION=self.admin_token
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        return dict(
+            line.rsplit(' ', 1)
+            for line in response.content.decode().splitlines()
+            if not line.startswith('#')
+        )
+
+    def test_views_are_measured(self):
+        self.get(reverse(
+            'budget:budgets-list', kwargs={'list_id': self.budgets_list.id}
+        ))
+        self.get(reverse('user-me'))
+        samples = self.samples()
+
+        labels = '{view="budget:budgets-list",method="GET"}'
+        self.assertEqual(
+            samples['budget_requests_total{view="budget:budgets-list",'
+                    'method="GET",status="200"}'],
+            '1'
+        )
+        self.assertEqual(
+            samples['budget_request_duration_seconds_count' + labels], '1'
+        )
+        self.assertGreater(
+            float(samples['budget_request_db_queries_sum' + labels]), 0
+        )
+        self.assertGreater(float(
+            samples['budget_request_serializer_duration_seconds_sum' + labels]
+        ), 0)
+        self.assertGreater(
+            float(samples['budget_response_size_bytes_sum' + labels]), 0
+        )
+        self.assertEqual(
+            samples['budget_request_duration_seconds_bucket'
+                    '{view="budget:budgets-list",method="GET",le="+Inf"}'],
+            '1'
+        )
+        self.assertEqual(
+            samples['budget_requests_total{view="user-me",'
+                    'method="GET",status="200"}'],
+            '1'
+        )
+        self.assertIn('budget_access_cache_hits_total', samples)
+        self.assertIn('budget_token_cache_misses_total', samples)
+
+    @override_settings(BUDGET_QUERY_BUDGET=1)
+    def test_query_budget_warning(self):
+        url = reverse(
+            'budget:budgets-list', kwargs={'list_id': self.budgets_list.id}
+        )
+        with self.assertLogs('budget.metrics', 'WARNING') as logs:
+            self.get(url)
+        self.assertIn(url, logs.output[0])
+        self.assertIn(
+            'budget_requests_over_query_budget_total'
+            '{view="budget:budgets-list",method="GET"}',
+            self.samples()
+        )
+
+    def test_metrics_are_for_staff_only(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        self.assertEqual(self.get(reverse('metrics')).status_code, 403)
+
+    @override_settings(BUDGET_METRICS_ENABLED=False)
+    def test_disabled(self):
+        self.get(reverse('user-me'))
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION=self.admin_token
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.registry.requests.series, {})
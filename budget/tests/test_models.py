@@ -1,10 +1,19 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
 from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
 
-from budget.models import (Budget, BudgetOperation, BudgetsList,
-                           Category, SharePermission)
+from budget.models import (Budget, BudgetOperation, BudgetOperationQuerySet,
+                           BudgetsList, BudgetSummary, Category,
+                           RecurringOperation, SharePermission)
 
 User = get_user_model()
 
@@ -36,6 +45,59 @@ class CategoryModelTest(TestCase):
         category = self.category
         self.assertEqual(category.title, str(category))
 
+    def test_renaming_and_deleting_touch_lists_using_it(self):
+        user = User.objects.create_user(username='TestUser')
+        category = Category.objects.create(title='Used')
+        lists = [
+            BudgetsList.objects.create(title=title, owner=user)
+            for title in ('Operations', 'Recurring', 'Unrelated')
+        ]
+        budgets = [
+            Budget.objects.create(
+                title=budgets_list.title,
+                currency=Budget.Currency.USD,
+                owner=user,
+                budget_list=budgets_list
+            )
+            for budgets_list in lists
+        ]
+        BudgetOperation.objects.create(
+            budget=budgets[0],
+            operation_type=BudgetOperation.OperationType.EXPENSE,
+            category=category,
+            amount=Decimal('1.00'),
+            user=user
+        )
+        RecurringOperation.objects.create(
+            budget=budgets[1],
+            operation_type=BudgetOperation.OperationType.EXPENSE,
+            category=category,
+            amount=Decimal('1.00'),
+            frequency=RecurringOperation.Frequency.MONTHLY,
+            start_date=date(2021, 1, 1),
+            user=user
+        )
+
+        def versions():
+            return [
+                BudgetsList.objects.get(pk=budgets_list.pk).version
+                for budgets_list in lists
+            ]
+
+        initial = versions()
+        category.title = 'Renamed'
+        category.save()
+        renamed = versions()
+        self.assertGreater(renamed[0], initial[0])
+        self.assertGreater(renamed[1], initial[1])
+        self.assertEqual(renamed[2], initial[2])
+
+        category.delete()
+        deleted = versions()
+        self.assertGreater(deleted[0], renamed[0])
+        self.assertGreater(deleted[1], renamed[1])
+        self.assertEqual(deleted[2], renamed[2])
+
 
 class BudgetModelTest(TestCase):
     @classmethod
@@ -99,6 +161,32 @@ class BudgetOperationModelTest(TestCase):
                      f'- {operation.amount} {operation.budget.currency}')
         self.assertEqual(model_str, str(operation))
 
+    def test_bulk_create_dated_keeps_dates(self):
+        date_field = BudgetOperation._meta.get_field('date')
+        start = datetime(2021, 1, 1, tzinfo=timezone.utc)
+        for days in ([0, 0, 31, 31], [0, 1, 2, 3]):
+            dates = [start + timedelta(days=day) for day in days]
+            operations = BudgetOperation.objects.bulk_create_dated(
+                BudgetOperation(
+                    budget=self.budget,
+                    operation_type=BudgetOperation.OperationType.EXPENSE,
+                    category=self.category,
+                    amount=Decimal('1.00'),
+                    user=self.user,
+                    date=day
+                )
+                for day in dates
+            )
+            self.assertTrue(date_field.auto_now)
+            self.assertEqual([operation.date for operation in operations],
+                             dates)
+            self.assertEqual(
+                list(BudgetOperation.objects.filter(
+                    pk__in=[operation.pk for operation in operations]
+                ).order_by('pk').values_list('date', flat=True)),
+                dates
+            )
+
     def test_income_operation(self):
         balance_before = self.budget.balance
         income_operation = self.create_operation(
@@ -151,6 +239,339 @@ class BudgetOperationModelTest(TestCase):
         balance_after = balance_before - expense_operation.amount
         self.assertEqual(balance_after, self.budget.balance)
 
+    def test_move_operation_to_another_budget(self):
+        second_budget = Budget.objects.create(
+            title='Second',
+            currency=Budget.Currency.USD,
+            initial_balance=Decimal('100.00'),
+            owner=self.user,
+            budget_list=self.budgets_list
+        )
+        operation = self.create_operation(
+            operation_type='expense', amount='50.00'
+        )
+        operation.budget = second_budget
+        operation.save()
+        self.budget.refresh_from_db()
+        second_budget.refresh_from_db()
+        self.assertEqual(self.budget.balance, Decimal('5000.00'))
+        self.assertEqual(second_budget.balance, Decimal('50.00'))
+
+    def test_balance_update_does_not_overwrite_stale_budget(self):
+        stale_budget = Budget.objects.get(pk=self.budget.pk)
+        self.create_operation(operation_type='income', amount='10.00')
+        BudgetOperation.objects.create(
+            budget=stale_budget,
+            operation_type=BudgetOperation.OperationType.INCOME,
+            category=self.category,
+            amount=Decimal('20.00'),
+            user=self.user
+        )
+        stale_budget.refresh_from_db()
+        self.assertEqual(stale_budget.balance, Decimal('5030.00'))
+
+    def test_saving_stale_budget_keeps_balance(self):
+        stale_budget = Budget.objects.get(pk=self.budget.pk)
+        self.create_operation(operation_type='expense', amount='30.00')
+        stale_budget.title = 'Renamed'
+        stale_budget.save()
+        self.assertEqual(stale_budget.balance, Decimal('4970.00'))
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.title, 'Renamed')
+        self.assertEqual(self.budget.balance, Decimal('4970.00'))
+
+    def test_saving_budget_keeps_zero_balance(self):
+        self.create_operation(operation_type='expense', amount='5000.00')
+        budget = Budget.objects.get(pk=self.budget.pk)
+        self.assertEqual(budget.balance, Decimal('0.00'))
+        budget.save()
+        budget.refresh_from_db()
+        self.assertEqual(budget.balance, Decimal('0.00'))
+
+    def test_summary_follows_operations(self):
+        income = self.create_operation(
+            operation_type='income', amount='100.00'
+        )
+        self.create_operation(operation_type='income', amount='50.00')
+        expense = self.create_operation(
+            operation_type='expense', amount='30.00'
+        )
+        summary = BudgetSummary.objects.get(
+            budget=self.budget,
+            category=self.category,
+            operation_type=BudgetOperation.OperationType.INCOME
+        )
+        self.assertEqual(summary.month, income.date.date().replace(day=1))
+        self.assertEqual(summary.total, Decimal('150.00'))
+        self.assertEqual(summary.count, 2)
+
+        income.amount = Decimal('200.00')
+        income.save()
+        summary.refresh_from_db()
+        self.assertEqual(summary.total, Decimal('250.00'))
+        self.assertEqual(summary.count, 2)
+
+        expense.delete()
+        self.assertFalse(BudgetSummary.objects.filter(
+            operation_type=BudgetOperation.OperationType.EXPENSE
+        ).exists())
+
+
+class BudgetOperationBulkDeleteTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.owner = User.objects.create_user(username='Owner')
+        cls.budgets_list = BudgetsList.objects.create(
+            title='Testing',
+            owner=cls.owner,
+        )
+        cls.category = Category.objects.create(title='Test category')
+
+    def setUp(self):
+        self.budgets = [
+            Budget.objects.create(
+                title=title,
+                currency=Budget.Currency.USD,
+                initial_balance=Decimal('1000.00'),
+                owner=self.owner,
+                budget_list=self.budgets_list
+            )
+            for title in ('Cash', 'Card')
+        ]
+
+    def create_operations(self, budget, user, count, amount='1.50'):
+        BudgetOperation.objects.bulk_create(
+            BudgetOperation(
+                budget=budget,
+                operation_type=(BudgetOperation.OperationType.INCOME
+                                if number % 3 == 0 else
+                                BudgetOperation.OperationType.EXPENSE),
+                category=self.category,
+                amount=Decimal(amount),
+                user=user
+            )
+            for number in range(count)
+        )
+        # bulk_create skips save(), so bring the balances and summaries in
+        # line with the new rows before deleting them.
+        call_command('reconcile_balances', '--fix', stdout=StringIO())
+        call_command('rebuild_budget_summaries', stdout=StringIO())
+
+    def assert_consistent(self):
+        call_command('reconcile_balances', stdout=StringIO())
+        call_command(
+            'rebuild_budget_summaries', '--check', stdout=StringIO()
+        )
+
+    def test_queryset_delete_adjusts_balances(self):
+        for budget in self.budgets:
+            self.create_operations(budget, self.owner, 30)
+        version = BudgetsList.objects.get(pk=self.budgets_list.pk).version
+        # Lock, deltas, summaries and one DELETE, then one update per budget,
+        # three queries per summary row and one touch of the lists.
+        with self.assertNumQueries(15):
+            BudgetOperation.objects.filter(
+                operation_type=BudgetOperation.OperationType.EXPENSE
+            ).delete()
+        for budget in self.budgets:
+            budget.refresh_from_db()
+            self.assertEqual(budget.balance, Decimal('1015.00'))
+        self.assertGreater(
+            BudgetsList.objects.get(pk=self.budgets_list.pk).version, version
+        )
+        self.assert_consistent()
+
+    def test_admin_bulk_delete(self):
+        self.create_operations(self.budgets[0], self.owner, 3000)
+        self.create_operations(self.budgets[1], self.owner, 10)
+        admin = User.objects.create_superuser(username='Admin')
+        self.client.force_login(admin)
+        # "Select all" in the changelist deletes the whole queryset.
+        response = self.client.post(
+            reverse('admin:budget_budgetoperation_changelist'),
+            {
+                'action': 'delete_selected',
+                'select_across': '1',
+                '_selected_action': [BudgetOperation.objects.first().id],
+                'post': 'yes',
+            }
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(BudgetOperation.objects.exists())
+        for budget in self.budgets:
+            budget.refresh_from_db()
+            self.assertEqual(budget.balance, Decimal('1000.00'))
+        self.assert_consistent()
+
+    def test_deleting_user_adjusts_shared_budgets(self):
+        member = User.objects.create_user(username='Member')
+        SharePermission.objects.create(
+            budgets_list=self.budgets_list, owner=self.owner, user=member
+        )
+        self.create_operations(self.budgets[0], member, 9, amount='10.00')
+        self.create_operations(self.budgets[0], self.owner, 3)
+        with mock.patch.object(
+                BudgetOperationQuerySet, 'delete', autospec=True,
+                side_effect=BudgetOperationQuerySet.delete) as delete:
+            member.delete()
+        # Once for the pre_delete signal; the cascade finds nothing left.
+        self.assertEqual(delete.call_count, 1)
+        self.budgets[0].refresh_from_db()
+        self.assertEqual(self.budgets[0].balance, Decimal('998.50'))
+        self.assert_consistent()
+
+
+class BudgetOperationConcurrencyTest(TransactionTestCase):
+    workers = 8
+    operations_per_worker = 10
+    retries = 500
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='TestUser')
+        budgets_list = BudgetsList.objects.create(
+            title='Testing',
+            owner=self.user,
+        )
+        self.budget = Budget.objects.create(
+            title='Main',
+            currency=Budget.Currency.USD,
+            initial_balance=Decimal('1000.00'),
+            owner=self.user,
+            budget_list=budgets_list
+        )
+
+    def create_with_retry(self, **kwargs):
+        # Shared-cache in-memory SQLite reports contention as "table is
+        # locked" instead of waiting, so the writer tries again a while.
+        for attempt in range(self.retries):
+            try:
+                budget = Budget.objects.get(pk=self.budget.pk)
+                return BudgetOperation.objects.create(budget=budget, **kwargs)
+            except OperationalError:
+                if (connection.vendor != 'sqlite'
+                        or attempt == self.retries - 1):
+                    raise
+                time.sleep(0.01)
+
+    def operation(self, worker, number):
+        # Amounts differ per worker and operation and mostly go out, so a
+        # lost or doubled update always shows in the balance.
+        operation_type = (
+            BudgetOperation.OperationType.INCOME if number % 3 == 0
+            else BudgetOperation.OperationType.EXPENSE
+        )
+        return operation_type, Decimal(f'{worker + 1}.{number:02d}')
+
+    def post_operations(self, worker):
+        try:
+            for number in range(self.operations_per_worker):
+                operation_type, amount = self.operation(worker, number)
+                self.create_with_retry(
+                    operation_type=operation_type,
+                    amount=amount,
+                    user=self.user
+                )
+        finally:
+            connection.close()
+
+    def test_concurrent_operations_keep_balance(self):
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            list(executor.map(self.post_operations, range(self.workers)))
+
+        total = sum(
+            BudgetOperation.signed_amount(*self.operation(worker, number))
+            for worker in range(self.workers)
+            for number in range(self.operations_per_worker)
+        )
+        self.assertEqual(total, Decimal('-72.72'))
+        self.assertEqual(
+            BudgetOperation.objects.count(),
+            self.workers * self.operations_per_worker
+        )
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.balance, Decimal('927.28'))
+
+
+class RecurringOperationModelTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.budgets_list = BudgetsList.objects.create(
+            title='Testing',
+            owner=cls.user,
+        )
+        cls.budget = Budget.objects.create(
+            title='Main',
+            currency=Budget.Currency.USD,
+            owner=cls.user,
+            budget_list=cls.budgets_list
+        )
+
+    def create_rule(self, frequency, start_date, interval=1):
+        return RecurringOperation.objects.create(
+            budget=self.budget,
+            operation_type=BudgetOperation.OperationType.EXPENSE,
+            amount=Decimal('10.00'),
+            user=self.user,
+            frequency=frequency,
+            interval=interval,
+            start_date=start_date
+        )
+
+    def occurrences(self, rule, count):
+        day, days = rule.next_date, []
+        for _ in range(count):
+            days.append(day)
+            day = rule.occurrence_after(day)
+        return days
+
+    def test_next_date_starts_at_start_date(self):
+        rule = self.create_rule('daily', date(2021, 1, 1))
+        self.assertEqual(rule.next_date, date(2021, 1, 1))
+
+    def test_daily_and_weekly(self):
+        self.assertEqual(
+            self.occurrences(self.create_rule('daily', date(2021, 2, 27)), 3),
+            [date(2021, 2, 27), date(2021, 2, 28), date(2021, 3, 1)]
+        )
+        self.assertEqual(
+            self.occurrences(
+                self.create_rule('weekly', date(2021, 1, 1), interval=2), 3
+            ),
+            [date(2021, 1, 1), date(2021, 1, 15), date(2021, 1, 29)]
+        )
+
+    def test_monthly_keeps_day_of_month(self):
+        self.assertEqual(
+            self.occurrences(self.create_rule('monthly', date(2021, 1, 31)), 4),
+            [date(2021, 1, 31), date(2021, 2, 28), date(2021, 3, 31),
+             date(2021, 4, 30)]
+        )
+        self.assertEqual(
+            self.occurrences(
+                self.create_rule('monthly', date(2021, 11, 15), interval=3), 3
+            ),
+            [date(2021, 11, 15), date(2022, 2, 15), date(2022, 5, 15)]
+        )
+
+    def test_yearly_on_leap_day(self):
+        self.assertEqual(
+            self.occurrences(self.create_rule('yearly', date(2020, 2, 29)), 5),
+            [date(2020, 2, 29), date(2021, 2, 28), date(2022, 2, 28),
+             date(2023, 2, 28), date(2024, 2, 29)]
+        )
+
+    def test_due_dates_stop_at_end_date(self):
+        rule = self.create_rule('monthly', date(2021, 1, 10))
+        rule.end_date = date(2021, 3, 10)
+        dates, next_date = rule.due_dates(date(2021, 12, 31), limit=100)
+        self.assertEqual(
+            dates, [date(2021, 1, 10), date(2021, 2, 10), date(2021, 3, 10)]
+        )
+        self.assertEqual(next_date, date(2021, 4, 10))
+
 
 class SharePermissionModelTest(TestCase):
     @classmethod
@@ -0,0 +1,218 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from budget.access import list_ids_cache_key
+from budget.models import (Budget, BudgetOperation, BudgetsList,
+                           Category, SharePermission)
+
+User = get_user_model()
+
+
+@override_settings(BUDGET_ACCESS_CACHE_TIMEOUT=300,
+                   BUDGET_TOKEN_CACHE_TIMEOUT=60)
+class QueryCountTests(TestCase):
+    query_counts = {
+        'budget:budgets_lists-list': 4,
+        'budget:budgets_lists-detail': 3,
+        'budget:budgets-list': 3,
+        'budget:budgets-detail': 3,
+        'budget:budgets-summary': 2,
+        'budget:budgets-history': 4,
+        'budget:categories-list': 2,
+        'budget:budget_operation-list': 4,
+        'budget:budget_operation-detail': 3,
+        'budget:share_list-list': 3,
+    }
+    not_modified_query_count = 1
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.budgets_list = BudgetsList.objects.create(
+            title='Testing',
+            owner=cls.user,
+        )
+        cls.category = Category.objects.create(title='Test category')
+        cls.budget = Budget.objects.create(
+            title='Main',
+            currency=Budget.Currency.USD,
+            owner=cls.user,
+            budget_list=cls.budgets_list
+        )
+        cls.budget_operation = cls.create_operation(cls.budget)
+        SharePermission.objects.create(
+            budgets_list=cls.budgets_list,
+            owner=cls.user,
+            user=User.objects.create_user(username='TestUser2')
+        )
+
+    @classmethod
+    def create_operation(cls, budget, category=None, user=None):
+        return BudgetOperation.objects.create(
+            budget=budget,
+            operation_type=BudgetOperation.OperationType.INCOME,
+            category=category or cls.category,
+            amount=Decimal('10.00'),
+            user=user or cls.user
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.user_token = Token.objects.create(user=self.user)
+        self.token = f'Token {self.user_token.key}'
+
+    def grow(self):
+        for number in range(5):
+            user = User.objects.create_user(username=f'Member{number}')
+            category = Category.objects.create(title=f'Category {number}')
+            budgets_list = BudgetsList.objects.create(
+                title=f'List {number}',
+                owner=self.user
+            )
+            SharePermission.objects.create(
+                budgets_list=self.budgets_list,
+                owner=self.user,
+                user=user
+            )
+            for budget_list in (self.budgets_list, budgets_list):
+                budget = Budget.objects.create(
+                    title=f'Budget {number}',
+                    currency=Budget.Currency.EURO,
+                    owner=self.user,
+                    budget_list=budget_list
+                )
+                self.create_operation(budget, category, user)
+            self.create_operation(self.budget, category, user)
+
+    def get_url(self, name):
+        kwargs = {
+            'list_id': self.budgets_list.id,
+            'budget_id': self.budget.id,
+            'pk': self.budget.id,
+        }
+        if name.startswith('budget:budgets_lists'):
+            kwargs = {'pk': self.budgets_list.id}
+        elif name.startswith('budget:categories'):
+            kwargs = {}
+        elif name == 'budget:budget_operation-detail':
+            kwargs['pk'] = self.budget_operation.id
+        if name.endswith('-list'):
+            kwargs.pop('pk', None)
+        if not name.startswith('budget:budget_operation'):
+            kwargs.pop('budget_id', None)
+        return reverse(name, kwargs=kwargs)
+
+    def assert_query_counts(self):
+        for name, count in self.query_counts.items():
+            with self.subTest(url=name):
+                url = self.get_url(name)
+                # Warm the per-user caches so the counts reflect the steady
+                # state of a polling client.
+                self.authorized_client.get(url, HTTP_AUTHORIZATION=self.token)
+                with self.assertNumQueries(count):
+                    response = self.authorized_client.get(
+                        url, HTTP_AUTHORIZATION=self.token
+                    )
+                self.assertEqual(response.status_code, 200)
+
+    def test_not_modified_responses(self):
+        self.grow()
+        for name in self.query_counts:
+            if name in ('budget:categories-list', 'budget:budgets-summary'):
+                continue
+            with self.subTest(url=name):
+                url = self.get_url(name)
+                response = self.authorized_client.get(
+                    url, HTTP_AUTHORIZATION=self.token
+                )
+                etag = response['ETag']
+                count = self.not_modified_query_count
+                if name.startswith('budget:budget_operation'):
+                    # The budget is checked to belong to the list.
+                    count += 1
+                with self.assertNumQueries(count):
+                    response = self.authorized_client.get(
+                        url,
+                        HTTP_AUTHORIZATION=self.token,
+                        HTTP_IF_NONE_MATCH=etag
+                    )
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+
+    def test_etag_changes_with_data(self):
+        url = self.get_url('budget:budgets-detail')
+        etag = self.authorized_client.get(
+            url, HTTP_AUTHORIZATION=self.token
+        )['ETag']
+        self.create_operation(self.budget)
+        response = self.authorized_client.get(
+            url, HTTP_AUTHORIZATION=self.token, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        self.category.title = 'Renamed category'
+        self.category.save()
+        response = self.authorized_client.get(
+            url, HTTP_AUTHORIZATION=self.token, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(BUDGET_RESPONSE_CACHE_TIMEOUT=60,
+                       ALLOWED_HOSTS=['testserver', 'example.com'])
+    def test_etag_depends_on_host(self):
+        url = self.get_url('budget:budget_operation-list')
+        response = self.authorized_client.get(
+            url, HTTP_AUTHORIZATION=self.token
+        )
+        other_host = self.authorized_client.get(
+            url, HTTP_AUTHORIZATION=self.token, HTTP_HOST='example.com',
+            HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(other_host.status_code, 200)
+        self.assertNotEqual(other_host['ETag'], response['ETag'])
+
+    @override_settings(BUDGET_RESPONSE_CACHE_TIMEOUT=60)
+    def test_cached_rendered_body(self):
+        url = self.get_url('budget:budgets-detail')
+        response = self.authorized_client.get(
+            url, HTTP_AUTHORIZATION=self.token
+        )
+        with self.assertNumQueries(self.not_modified_query_count):
+            cached = self.authorized_client.get(
+                url, HTTP_AUTHORIZATION=self.token
+            )
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached['ETag'], response['ETag'])
+
+    def test_access_cache_miss_costs_one_query(self):
+        url = self.get_url('budget:budgets-list')
+        self.authorized_client.get(url, HTTP_AUTHORIZATION=self.token)
+        cache.delete(list_ids_cache_key(self.user.id))
+        with self.assertNumQueries(self.query_counts['budget:budgets-list']
+                                   + 1):
+            self.authorized_client.get(url, HTTP_AUTHORIZATION=self.token)
+
+    @override_settings(BUDGET_ACCESS_CACHE_TIMEOUT=0)
+    def test_access_cache_disabled(self):
+        url = self.get_url('budget:budgets-list')
+        self.authorized_client.get(url, HTTP_AUTHORIZATION=self.token)
+        self.assertIsNone(cache.get(list_ids_cache_key(self.user.id)))
+        with self.assertNumQueries(self.query_counts['budget:budgets-list']
+                                   + 1):
+            self.authorized_client.get(url, HTTP_AUTHORIZATION=self.token)
+
+    def test_query_counts(self):
+        self.assert_query_counts()
+
+    def test_query_counts_do_not_grow_with_data(self):
+        self.grow()
+        self.assert_query_counts()
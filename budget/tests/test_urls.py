@@ -65,6 +65,13 @@ class AllURLTests(TestCase):
                     'pk': self.budget.pk
                 }
             ),
+            'budgets-summary': reverse(
+                'budget:budgets-summary',
+                kwargs={
+                    'list_id': self.budgets_list.id,
+                    'pk': self.budget.pk
+                }
+            ),
             'categories-list': reverse('budget:categories-list'),
             'categories-detail': reverse(
                 'budget:categories-detail',
@@ -98,6 +105,20 @@ class AllURLTests(TestCase):
                     'pk': self.budget_operation.pk
                 }
             ),
+            'budgets-history': reverse(
+                'budget:budgets-history',
+                kwargs={
+                    'list_id': self.budgets_list.id,
+                    'pk': self.budget.pk
+                }
+            ),
+            'recurring_operation-list': reverse(
+                'budget:recurring_operation-list',
+                kwargs={
+                    'list_id': self.budgets_list.id,
+                    'budget_id': self.budget.id
+                }
+            ),
             'share_list-list': reverse(
                 'budget:share_list-list',
                 kwargs={'list_id': self.budgets_list.id}
@@ -1,12 +1,34 @@
+import asyncio
+import csv
+import io
+import json
+import shutil
+import tempfile
+from base64 import b64encode
+from datetime import date, datetime
 from decimal import Decimal
+from unittest import mock, skipUnless
 
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
-from django.urls import reverse
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import (AsyncRequestFactory, Client, TestCase,
+                         TransactionTestCase, override_settings)
+from django.urls import resolve, reverse
+from django.utils import timezone
 from rest_framework.authtoken.models import Token
 
+from budget import columnar
+from budget.async_views import ASGIHandler
+from budget.authentication import CachedTokenAuthentication
+from budget.jobs import claim, run_job
 from budget.models import (Budget, BudgetOperation, BudgetsList,
-                           Category, SharePermission)
+                           BudgetsListInsights, Category, CurrencyRate, Job,
+                           RecurringOperation, SharePermission)
+from budget.search import SubstringSearch, get_search_backend
+from budget.views import (BudgetOperationViewSet, BudgetsListViewSet,
+                          BudgetViewSet)
 
 User = get_user_model()
 
@@ -37,6 +59,484 @@ class BudgetsListViewTests(TestCase):
         self.assertEqual(last_object.title, data['title'])
 
 
+@override_settings(BUDGET_ACCESS_CACHE_TIMEOUT=300,
+                   BUDGET_TOKEN_CACHE_TIMEOUT=60)
+class BudgetsListTotalsViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.budgets_list = BudgetsList.objects.create(
+            title='Testing',
+            owner=cls.user,
+        )
+        for currency, balance in ((Budget.Currency.USD, '100.00'),
+                                  (Budget.Currency.USD, '50.00'),
+                                  (Budget.Currency.EURO, '100.00'),
+                                  (Budget.Currency.PLN, '400.00')):
+            Budget.objects.create(
+                title=f'{currency} budget',
+                currency=currency,
+                initial_balance=Decimal(balance),
+                owner=cls.user,
+                budget_list=cls.budgets_list
+            )
+        CurrencyRate.objects.create(
+            currency=Budget.Currency.EURO,
+            date=date(2021, 1, 1),
+            rate=Decimal('1.200000')
+        )
+        CurrencyRate.objects.create(
+            currency=Budget.Currency.PLN,
+            date=date(2021, 1, 1),
+            rate=Decimal('0.250000')
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.user_token = Token.objects.create(user=self.user)
+        self.token = f'Token {self.user_token.key}'
+        self.url = reverse(
+            'budget:budgets_lists-totals',
+            kwargs={'pk': self.budgets_list.id}
+        )
+
+    def test_totals_in_base_currency(self):
+        response = self.client.get(
+            self.url, {'date': '2021-06-01'}, HTTP_AUTHORIZATION=self.token
+        )
+        data = response.json()
+        self.assertEqual(data['currency'], 'USD')
+        self.assertEqual(data['total'], '370.00')
+        self.assertEqual(
+            {row['currency']: row['budgets'] for row in data['balances']},
+            {'USD': 2, 'Euro': 1, 'zl': 1}
+        )
+
+    def test_totals_in_other_currency(self):
+        response = self.client.get(
+            self.url,
+            {'currency': 'zl', 'date': '2021-06-01'},
+            HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.json()['total'], '1480.00')
+
+    def test_totals_without_rate(self):
+        response = self.client.get(
+            self.url, {'date': '2020-06-01'}, HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_totals_use_one_query_per_currency(self):
+        self.client.get(
+            self.url, {'date': '2021-06-01'}, HTTP_AUTHORIZATION=self.token
+        )
+        # The list, the aggregate and one rate lookup per currency other
+        # than USD.
+        with self.assertNumQueries(4):
+            self.client.get(
+                self.url, {'date': '2021-06-01'},
+                HTTP_AUTHORIZATION=self.token
+            )
+
+    def test_totals_see_rates_changed_without_signals(self):
+        self.client.get(
+            self.url, {'date': '2021-06-01'}, HTTP_AUTHORIZATION=self.token
+        )
+        CurrencyRate.objects.filter(currency=Budget.Currency.EURO).update(
+            rate=Decimal('1.100000')
+        )
+        response = self.client.get(
+            self.url, {'date': '2021-06-01'}, HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.json()['total'], '360.00')
+
+    def test_totals_are_rounded_to_cents(self):
+        budget = Budget.objects.create(
+            title='Fractions',
+            currency=Budget.Currency.USD,
+            initial_balance=Decimal('0.10'),
+            owner=self.user,
+            budget_list=self.budgets_list
+        )
+        Budget.objects.filter(pk=budget.pk).update(balance=Decimal('0.20'))
+        response = self.client.get(
+            self.url,
+            {'currency': 'USD', 'date': '2021-06-01'},
+            HTTP_AUTHORIZATION=self.token
+        )
+        data = response.json()
+        self.assertEqual(data['total'], '370.20')
+        self.assertEqual(
+            {row['currency']: row['balance'] for row in data['balances']},
+            {'USD': '150.20', 'Euro': '100.00', 'zl': '400.00'}
+        )
+
+
+@override_settings(BUDGET_ACCESS_CACHE_TIMEOUT=300,
+                   BUDGET_TOKEN_CACHE_TIMEOUT=60)
+class BudgetsListInsightsViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.budgets_list = BudgetsList.objects.create(
+            title='Testing',
+            owner=cls.user,
+        )
+        cls.budget = Budget.objects.create(
+            title='Main',
+            currency=Budget.Currency.USD,
+            owner=cls.user,
+            budget_list=cls.budgets_list
+        )
+        categories = {
+            title: Category.objects.create(title=title)
+            for title in ('Groceries', 'Rent', 'Travel', 'Salary')
+        }
+        operations = [
+            (month, 'Expense', 'Groceries', '100.00') for month in range(1, 7)
+        ] + [
+            (month, 'Expense', 'Rent', '500.00') for month in range(1, 8)
+        ] + [
+            (7, 'Expense', 'Groceries', '130.00'),
+            (3, 'Expense', 'Travel', '60.00'),
+            (7, 'Expense', 'Travel', '300.00'),
+            (6, 'Income', 'Salary', '2000.00'),
+            (7, 'Income', 'Salary', '2000.00'),
+        ]
+        for month, operation_type, title, amount in operations:
+            operation = BudgetOperation.objects.create(
+                budget=cls.budget,
+                operation_type=operation_type,
+                category=categories[title],
+                amount=Decimal(amount),
+                user=cls.user
+            )
+            BudgetOperation.objects.filter(pk=operation.pk).update(
+                date=timezone.make_aware(datetime(2021, month, 15, 12))
+            )
+        # Moving the dates bypassed the monthly summaries.
+        call_command('rebuild_budget_summaries', stdout=io.StringIO())
+
+    def setUp(self):
+        cache.clear()
+        self.user_token = Token.objects.create(user=self.user)
+        self.token = f'Token {self.user_token.key}'
+        self.url = reverse(
+            'budget:budgets_lists-insights',
+            kwargs={'pk': self.budgets_list.id}
+        )
+
+    def insights(self, month='2021-07-01'):
+        response = self.client.get(
+            self.url, {'month': month}, HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_insights(self):
+        data = self.insights('2021-07-20')
+        self.assertEqual(data['month'], '2021-07-01')
+        usd, = data['currencies']
+        self.assertEqual(usd['expense'], '930.00')
+        self.assertEqual(usd['previous_expense'], '600.00')
+        self.assertEqual(usd['expense_change'], 55)
+        self.assertEqual(usd['income_change'], 0)
+        self.assertEqual(
+            [(row['category'], row['change']) for row in usd['categories']],
+            [('Rent', 0), ('Travel', None), ('Groceries', 30)]
+        )
+        self.assertEqual(
+            [(row['category'], row['share'])
+             for row in usd['top_categories']],
+            [('Rent', 54), ('Travel', 32), ('Groceries', 14)]
+        )
+        self.assertEqual(usd['anomalies'], [{
+            'category': 'Travel',
+            'total': '300.00',
+            'average': '10.00',
+            'ratio': '30.0',
+        }])
+        self.assertEqual(sorted(data['messages']), [
+            'Spending on Travel is 30.0 times your 6-month average',
+            'You spent 30% more on Groceries than last month',
+        ])
+
+    def test_insights_are_stored_until_the_list_changes(self):
+        self.insights()
+        self.assertEqual(BudgetsListInsights.objects.count(), 1)
+        # The list and the stored insights; nothing is aggregated.
+        with self.assertNumQueries(2):
+            self.insights()
+
+        BudgetOperation.objects.get(
+            category__title='Travel', amount=Decimal('300.00')
+        ).delete()
+        usd, = self.insights()['currencies']
+        self.assertEqual(usd['expense'], '630.00')
+        self.assertEqual(usd['anomalies'], [])
+        self.assertEqual(BudgetsListInsights.objects.count(), 1)
+
+    def test_renamed_category(self):
+        self.insights()
+        category = Category.objects.get(title='Groceries')
+        category.title = 'Food'
+        category.save()
+        self.assertIn(
+            'You spent 30% more on Food than last month',
+            self.insights()['messages']
+        )
+
+    def test_month_without_operations(self):
+        data = self.insights('2020-01-01')
+        self.assertEqual(data['currencies'], [])
+        self.assertEqual(data['messages'], [])
+
+
+class BudgetsListExportViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.budgets_list = BudgetsList.objects.create(
+            title='Testing',
+            owner=cls.user,
+        )
+        cls.other_list = BudgetsList.objects.create(
+            title='Other',
+            owner=cls.user,
+        )
+        cls.category = Category.objects.create(title='Food')
+        cls.budgets = [
+            Budget.objects.create(
+                title=title,
+                currency=currency,
+                owner=cls.user,
+                budget_list=budgets_list
+            )
+            for title, currency, budgets_list in (
+                ('Main', Budget.Currency.USD, cls.budgets_list),
+                ('Savings', Budget.Currency.EURO, cls.budgets_list),
+                ('Other', Budget.Currency.USD, cls.other_list),
+            )
+        ]
+        for budget in cls.budgets:
+            for number in range(3):
+                BudgetOperation.objects.create(
+                    budget=budget,
+                    operation_type=BudgetOperation.OperationType.EXPENSE,
+                    category=cls.category if number else None,
+                    amount=Decimal(f'{number + 1}.50'),
+                    note=f'{budget.title}, "operation" {number}',
+                    user=cls.user
+                )
+
+    def setUp(self):
+        self.user_token = Token.objects.create(user=self.user)
+        self.token = f'Token {self.user_token.key}'
+        self.url = reverse(
+            'budget:budgets_lists-export',
+            kwargs={'pk': self.budgets_list.id}
+        )
+
+    def export(self, file_format):
+        response = self.client.get(
+            self.url, {'type': file_format}, HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    @mock.patch.object(BudgetsListViewSet, 'export_chunk_size', 2)
+    def test_export_csv(self):
+        response, content = self.export('csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(
+            response['Content-Disposition'],
+            f'attachment; filename="list-{self.budgets_list.id}'
+            f'-operations.csv"'
+        )
+        rows = list(csv.DictReader(io.StringIO(content.decode())))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(
+            [(row['budget_title'], row['note']) for row in rows],
+            [(budget.title, f'{budget.title}, "operation" {number}')
+             for budget in self.budgets[:2] for number in range(3)]
+        )
+        first = BudgetOperation.objects.filter(
+            budget=self.budgets[0]
+        ).order_by('id').first()
+        self.assertEqual(rows[0], {
+            'id': str(first.id),
+            'budget': str(self.budgets[0].id),
+            'budget_title': 'Main',
+            'currency': 'USD',
+            'date': first.date.isoformat(),
+            'operation_type': 'Expense',
+            'category': '',
+            'amount': '1.50',
+            'note': 'Main, "operation" 0',
+            'user': 'TestUser',
+        })
+
+    @skipUnless(columnar.pyarrow, 'pyarrow is not installed')
+    def test_export_arrow(self):
+        response, content = self.export('arrow')
+        self.assertEqual(
+            response['Content-Type'], 'application/vnd.apache.arrow.stream'
+        )
+        table = columnar.pyarrow.ipc.open_stream(content).read_all()
+        self.assertEqual(table.num_rows, 6)
+        self.assertEqual(
+            table.column('amount').to_pylist(),
+            [Decimal('1.50'), Decimal('2.50'), Decimal('3.50')] * 2
+        )
+        self.assertEqual(
+            table.column('category').to_pylist(),
+            [None, 'Food', 'Food'] * 2
+        )
+
+    @skipUnless(columnar.pyarrow, 'pyarrow is not installed')
+    @mock.patch.object(BudgetsListViewSet, 'export_chunk_size', 4)
+    def test_export_parquet(self):
+        response, content = self.export('parquet')
+        parquet_file = columnar.pyarrow.parquet.ParquetFile(
+            columnar.pyarrow.BufferReader(content)
+        )
+        self.assertEqual(parquet_file.metadata.num_row_groups, 2)
+        table = parquet_file.read()
+        self.assertEqual(
+            table.column('currency').to_pylist(), ['USD'] * 3 + ['Euro'] * 3
+        )
+
+    def test_export_without_pyarrow(self):
+        with mock.patch.object(columnar, 'pyarrow', None):
+            response = self.client.get(
+                self.url, {'type': 'parquet'}, HTTP_AUTHORIZATION=self.token
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(), {'type': ['Exporting parquet requires pyarrow.']}
+        )
+
+    def test_export_of_foreign_list(self):
+        stranger = User.objects.create_user(username='Stranger')
+        token = Token.objects.create(user=stranger)
+        response = self.client.get(
+            self.url, HTTP_AUTHORIZATION=f'Token {token.key}'
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class BudgetsListSearchViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.budgets_list = BudgetsList.objects.create(
+            title='Testing',
+            owner=cls.user,
+        )
+        cls.budgets = [
+            Budget.objects.create(
+                title=title,
+                owner=cls.user,
+                budget_list=cls.budgets_list
+            )
+            for title in ('Cash', 'Card')
+        ]
+        cls.food = Category.objects.create(title='Food')
+        cls.rent = Category.objects.create(title='Rent')
+        other_list = BudgetsList.objects.create(title='Other', owner=cls.user)
+        other_budget = Budget.objects.create(
+            title='Other', owner=cls.user, budget_list=other_list
+        )
+        for budget, category, note in (
+                (cls.budgets[0], cls.food, 'pizza with friends'),
+                (cls.budgets[0], cls.food, 'pizza pizza pizza'),
+                (cls.budgets[1], cls.rent, 'flat in march'),
+                (cls.budgets[1], cls.food, 'groceries'),
+                (other_budget, cls.food, 'pizza elsewhere')):
+            BudgetOperation.objects.create(
+                budget=budget,
+                operation_type=BudgetOperation.OperationType.EXPENSE,
+                category=category,
+                amount=Decimal('10.00'),
+                note=note,
+                user=cls.user
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.user_token = Token.objects.create(user=self.user)
+        self.token = f'Token {self.user_token.key}'
+        self.url = reverse(
+            'budget:budgets_lists-search',
+            kwargs={'pk': self.budgets_list.id}
+        )
+
+    def search(self, **params):
+        response = self.client.get(
+            self.url, params, HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def notes(self, data):
+        return [operation['note'] for operation in data['results']]
+
+    def test_search_notes(self):
+        data = self.search(q='pizza')
+        self.assertEqual(data['count'], 2)
+        self.assertIsNone(data['next'])
+        self.assertEqual(
+            {operation['budget'] for operation in data['results']},
+            {self.budgets[0].id}
+        )
+        if get_search_backend().ranked:
+            self.assertEqual(self.notes(data)[0], 'pizza pizza pizza')
+
+    def test_search_categories_and_prefixes(self):
+        self.assertEqual(self.search(q='foo')['count'], 3)
+        self.assertEqual(self.notes(self.search(q='rent march')),
+                         ['flat in march'])
+
+    def test_search_in_one_budget(self):
+        data = self.search(q='food', budget=self.budgets[1].id)
+        self.assertEqual(self.notes(data), ['groceries'])
+
+    def test_search_follows_changes(self):
+        operation = BudgetOperation.objects.get(note='groceries')
+        operation.note = 'weekly shopping'
+        operation.save()
+        self.assertEqual(self.search(q='groceries')['count'], 0)
+        self.assertEqual(self.notes(self.search(q='shopping')),
+                         ['weekly shopping'])
+
+        self.rent.title = 'Housing'
+        self.rent.save()
+        self.assertEqual(self.notes(self.search(q='housing')),
+                         ['flat in march'])
+
+        BudgetOperation.objects.get(note='flat in march').delete()
+        self.assertEqual(self.search(q='housing')['count'], 0)
+
+    def test_search_requires_words(self):
+        response = self.client.get(
+            self.url, {'q': '"*'}, HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_search_fallback(self):
+        with mock.patch('budget.search.get_search_backend',
+                        return_value=SubstringSearch):
+            data = self.search(q='pizza')
+        self.assertEqual(
+            self.notes(data), ['pizza pizza pizza', 'pizza with friends']
+        )
+
+
 class CategoryViewTests(TestCase):
 
     def setUp(self):
@@ -101,6 +601,120 @@ class BudgetViewTests(TestCase):
         self.assertEqual(last_object.currency, data['currency'])
 
 
+@override_settings(BUDGET_ACCESS_CACHE_TIMEOUT=300,
+                   BUDGET_TOKEN_CACHE_TIMEOUT=60)
+class BudgetHistoryViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.budgets_list = BudgetsList.objects.create(
+            title='Testing',
+            owner=cls.user,
+        )
+        cls.category = Category.objects.create(title='Food')
+        cls.budget = Budget.objects.create(
+            title='Main',
+            currency=Budget.Currency.USD,
+            initial_balance=Decimal('1000.00'),
+            owner=cls.user,
+            budget_list=cls.budgets_list
+        )
+        for day, operation_type, amount in (
+                (date(2021, 1, 5), 'Income', '500.00'),
+                (date(2021, 1, 20), 'Expense', '100.25'),
+                (date(2021, 3, 1), 'Expense', '50.00'),
+                (date(2021, 3, 31), 'Expense', '0.75'),
+                (date(2022, 6, 15), 'Income', '10.00')):
+            operation = BudgetOperation.objects.create(
+                budget=cls.budget,
+                operation_type=operation_type,
+                category=cls.category,
+                amount=Decimal(amount),
+                user=cls.user
+            )
+            # date has auto_now, so move the operation back in time directly.
+            BudgetOperation.objects.filter(pk=operation.pk).update(
+                date=timezone.make_aware(datetime(
+                    day.year, day.month, day.day, 12
+                ))
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.user_token = Token.objects.create(user=self.user)
+        self.token = f'Token {self.user_token.key}'
+        self.url = reverse('budget:budgets-history', kwargs={
+            'list_id': self.budgets_list.id,
+            'pk': self.budget.id
+        })
+
+    def history(self, **params):
+        response = self.client.get(
+            self.url, params, HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def points(self, data):
+        return [(point['date'], point['balance']) for point in data['points']]
+
+    def test_monthly_history(self):
+        data = self.history(interval='month')
+        self.assertEqual(data['interval'], 'month')
+        self.assertEqual(data['opening_balance'], '1000.00')
+        self.assertEqual(self.points(data), [
+            ('2021-01-01', '1399.75'),
+            ('2021-03-01', '1349.00'),
+            ('2022-06-01', '1359.00'),
+        ])
+        self.assertEqual(data['points'][1]['change'], '-50.75')
+
+    def test_period_starts_from_opening_balance(self):
+        data = self.history(
+            interval='day', date_after='2021-02-01', date_before='2021-12-31'
+        )
+        self.assertEqual(data['opening_balance'], '1399.75')
+        self.assertEqual(self.points(data), [
+            ('2021-03-01', '1349.75'),
+            ('2021-03-31', '1349.00'),
+        ])
+
+    def test_automatic_interval(self):
+        self.assertEqual(self.history()['interval'], 'week')
+        data = self.history(date_after='2021-01-01', date_before='2021-03-31')
+        self.assertEqual(data['interval'], 'day')
+
+    def test_too_many_points(self):
+        response = self.client.get(
+            self.url, {'interval': 'day'}, HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('interval', response.json())
+
+    def test_invalid_period(self):
+        response = self.client.get(
+            self.url,
+            {'date_after': '2021-03-01', 'date_before': '2021-01-01'},
+            HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_query_count_does_not_grow_with_operations(self):
+        self.history(interval='month')
+        for _ in range(20):
+            BudgetOperation.objects.create(
+                budget=self.budget,
+                operation_type=BudgetOperation.OperationType.EXPENSE,
+                category=self.category,
+                amount=Decimal('1.00'),
+                user=self.user
+            )
+        with self.assertNumQueries(4):
+            data = self.history(interval='month')
+        self.assertEqual(data['points'][-1]['balance'], '1339.00')
+
+
 class BudgetOperationViewTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -149,6 +763,502 @@ class BudgetOperationViewTests(TestCase):
         self.assertEqual(last_object.category.title, data['category'])
         self.assertEqual(last_object.amount, Decimal(data['amount']))
 
+    def bulk_url(self):
+        return reverse(
+            'budget:budget_operation-bulk',
+            kwargs={
+                'list_id': self.budgets_list.id,
+                'budget_id': self.budget.id
+            }
+        )
+
+    def test_budget_operation_bulk_create(self):
+        objects_count = BudgetOperation.objects.count()
+        balance_before = Budget.objects.get(pk=self.budget.pk).balance
+        data = [
+            {
+                'operation_type': 'Income',
+                'category': self.category.title,
+                'amount': '1000.00'
+            },
+            {
+                'operation_type': 'Expense',
+                'category': self.category.title,
+                'amount': '250.00',
+                'note': 'Groceries'
+            },
+        ]
+        response = self.authorized_client.post(
+            self.bulk_url(),
+            data=data,
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 2)
+        self.assertEqual(BudgetOperation.objects.count(), objects_count + 2)
+        self.assertEqual(
+            Budget.objects.get(pk=self.budget.pk).balance,
+            balance_before + Decimal('750.00')
+        )
+
+    def test_budget_operation_bulk_create_from_csv(self):
+        objects_count = BudgetOperation.objects.count()
+        upload = SimpleUploadedFile(
+            'operations.csv',
+            (f'operation_type,category,amount,note\n'
+             f'Expense,{self.category.title},10.50,\n'
+             f'Income,{self.category.title},20.00,Salary\n').encode(),
+            content_type='text/csv'
+        )
+        response = self.authorized_client.post(
+            self.bulk_url(),
+            data={'file': upload},
+            HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(BudgetOperation.objects.count(), objects_count + 2)
+
+    def test_budget_operation_bulk_create_is_all_or_nothing(self):
+        objects_count = BudgetOperation.objects.count()
+        data = [
+            {
+                'operation_type': 'Income',
+                'category': self.category.title,
+                'amount': '1000.00'
+            },
+            {
+                'operation_type': 'Income',
+                'category': 'Unknown category',
+                'amount': '1000.00'
+            },
+        ]
+        response = self.authorized_client.post(
+            self.bulk_url(),
+            data=data,
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(BudgetOperation.objects.count(), objects_count)
+
+    def test_budget_operation_bulk_create_with_invalid_category(self):
+        response = self.authorized_client.post(
+            self.bulk_url(),
+            data=[
+                {
+                    'operation_type': 'Expense',
+                    'category': [self.category.title],
+                    'amount': '1.00'
+                },
+                {
+                    'operation_type': 'Expense',
+                    'category': {'title': self.category.title},
+                    'amount': '1.00'
+                },
+            ],
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [list(error) for error in response.json()],
+            [['category'], ['category']]
+        )
+
+    def test_budget_summary(self):
+        for operation_type, amount in (('Income', '100.00'),
+                                       ('Income', '50.00'),
+                                       ('Expense', '30.00')):
+            BudgetOperation.objects.create(
+                budget=self.budget,
+                operation_type=operation_type,
+                category=self.category,
+                amount=Decimal(amount),
+                user=self.user
+            )
+        response = self.authorized_client.get(
+            reverse(
+                'budget:budgets-summary',
+                kwargs={
+                    'list_id': self.budgets_list.id,
+                    'pk': self.budget.id
+                }
+            ),
+            HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['totals'], {
+            'Income': '150.00',
+            'Expense': '30.00'
+        })
+        self.assertEqual(data['categories'][0], {
+            'category': self.category.title,
+            'operation_type': 'Income',
+            'total': '150.00',
+            'count': 2
+        })
+        self.assertEqual(len(data['months']), 2)
+
+    def create_operations(self, count):
+        for number in range(count):
+            BudgetOperation.objects.create(
+                budget=self.budget,
+                operation_type='Income',
+                category=self.category,
+                amount=Decimal(number + 1),
+                note=f'Operation {number}',
+                user=self.user
+            )
+
+    def budget_url(self, name='budgets-detail'):
+        return reverse(
+            f'budget:{name}',
+            kwargs={'list_id': self.budgets_list.id, 'pk': self.budget.id}
+        )
+
+    def test_budget_detail_latest_operations(self):
+        self.create_operations(5)
+        response = self.authorized_client.get(
+            self.budget_url(),
+            {'latest': 2},
+            HTTP_AUTHORIZATION=self.token
+        )
+        data = response.json()
+        self.assertEqual(data['title'], self.budget.title)
+        self.assertEqual(
+            [operation['note'] for operation in data['budget_operations']],
+            ['Operation 4', 'Operation 3']
+        )
+
+        response = self.authorized_client.get(
+            data['next'], HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(
+            [operation['note']
+             for operation in response.json()['budget_operations']],
+            ['Operation 2', 'Operation 1']
+        )
+
+    def test_budget_operation_filters(self):
+        second_user = User.objects.create_user(username='TestUser2')
+        food = Category.objects.create(title='Food')
+        fuel = Category.objects.create(title='Fuel station')
+        cases = (
+            (food, '10.00', self.user, datetime(2021, 3, 1)),
+            (food, '20.00', second_user, datetime(2021, 3, 15)),
+            (fuel, '30.00', self.user, datetime(2021, 4, 1, 15)),
+            (self.category, '40.00', self.user, datetime(2021, 5, 1)),
+        )
+        for category, amount, user, day in cases:
+            operation = BudgetOperation.objects.create(
+                budget=self.budget,
+                operation_type='Expense',
+                category=category,
+                amount=Decimal(amount),
+                user=user
+            )
+            BudgetOperation.objects.filter(pk=operation.pk).update(
+                date=timezone.make_aware(day)
+            )
+        url = reverse(
+            'budget:budget_operation-list',
+            kwargs={
+                'list_id': self.budgets_list.id,
+                'budget_id': self.budget.id
+            }
+        )
+        queries = (
+            ({'category': 'Food'}, ['10.00', '20.00']),
+            ({'category': 'Fu'}, []),
+            ({'category_prefix': 'F'}, ['10.00', '20.00', '30.00']),
+            ({'category_contains': 'station'}, ['30.00']),
+            ({'category_id': fuel.id}, ['30.00']),
+            ({'date_after': '2021-03-10', 'date_before': '2021-04-01'},
+             ['20.00', '30.00']),
+            ({'date_after': '2021-03-15T00:00:00'}, ['20.00', '30.00',
+                                                     '40.00']),
+            ({'date_after': '2021-04-01', 'date_before': '2021-04-01'},
+             ['30.00']),
+            ({'date_before': '01/04/2021'}, ['10.00', '20.00', '30.00']),
+            ({'date_before': '2021-04-01T12:00:00'}, ['10.00', '20.00']),
+            ({'amount_min': '15', 'amount_max': '30'}, ['20.00', '30.00']),
+            ({'user': second_user.username}, ['20.00']),
+        )
+        for params, amounts in queries:
+            with self.subTest(params=params):
+                response = self.authorized_client.get(
+                    url, params, HTTP_AUTHORIZATION=self.token
+                )
+                self.assertEqual(
+                    [row['amount'] for row in response.json()['results']],
+                    amounts
+                )
+
+    def test_budget_operation_keyset_pagination(self):
+        self.create_operations(25)
+        url = reverse(
+            'budget:budget_operation-list',
+            kwargs={
+                'list_id': self.budgets_list.id,
+                'budget_id': self.budget.id
+            }
+        )
+        notes = []
+        response = self.authorized_client.get(
+            url,
+            {'pagination': 'keyset'},
+            HTTP_AUTHORIZATION=self.token
+        )
+        while True:
+            data = response.json()
+            self.assertNotIn('count', data)
+            notes += [operation['note'] for operation in data['results']]
+            if data['next'] is None:
+                break
+            response = self.authorized_client.get(
+                data['next'], HTTP_AUTHORIZATION=self.token
+            )
+        self.assertEqual(notes, [f'Operation {number}' for number in range(25)])
+
+        response = self.authorized_client.get(
+            url,
+            {'pagination': 'keyset', 'cursor': 'invalid'},
+            HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, 404)
+        for position in ([{}, 1], [1, {}], ['2020-01-01', [1]],
+                         [True, False], ['2020-01-01', 'one']):
+            cursor = b64encode(json.dumps(position).encode()).decode()
+            response = self.authorized_client.get(
+                url,
+                {'pagination': 'keyset', 'cursor': cursor},
+                HTTP_AUTHORIZATION=self.token
+            )
+            self.assertEqual(response.status_code, 404, position)
+
+    def test_budget_export_streams_ndjson(self):
+        self.create_operations(3)
+        response = self.authorized_client.get(
+            self.budget_url('budgets-export'),
+            HTTP_AUTHORIZATION=self.token
+        )
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)['note'] for line in lines],
+            ['Operation 0', 'Operation 1', 'Operation 2']
+        )
+
+
+class JobViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.stranger = User.objects.create_user(username='Stranger')
+        cls.budgets_list = BudgetsList.objects.create(
+            title='Testing',
+            owner=cls.user,
+        )
+        cls.category = Category.objects.create(title='Food')
+        cls.budget = Budget.objects.create(
+            title='Main',
+            currency=Budget.Currency.USD,
+            owner=cls.user,
+            budget_list=cls.budgets_list
+        )
+        BudgetOperation.objects.create(
+            budget=cls.budget,
+            operation_type=BudgetOperation.OperationType.INCOME,
+            category=cls.category,
+            amount=Decimal('10.00'),
+            user=cls.user
+        )
+
+    def setUp(self):
+        files_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, files_dir)
+        settings = self.settings(BUDGET_JOB_FILES_DIR=files_dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.token = f'Token {Token.objects.create(user=self.user).key}'
+        self.list_kwargs = {'pk': self.budgets_list.id}
+        self.budget_kwargs = {
+            'list_id': self.budgets_list.id,
+            'budget_id': self.budget.id
+        }
+
+    def post(self, url, data=None, token=None):
+        return self.client.post(
+            url, data or {}, HTTP_AUTHORIZATION=token or self.token
+        )
+
+    def get(self, url, token=None):
+        return self.client.get(url, HTTP_AUTHORIZATION=token or self.token)
+
+    def run_job(self, job_id):
+        self.assertEqual(claim('TestWorker', 1), [job_id])
+        run_job(job_id)
+
+    def test_export_job(self):
+        response = self.post(
+            reverse('budget:budgets_lists-export', kwargs=self.list_kwargs),
+            {'type': 'csv'}
+        )
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertEqual(
+            (job['kind'], job['status'], job['progress']),
+            ('export', 'queued', 0)
+        )
+        detail_url = reverse('budget:jobs-detail', kwargs={'pk': job['id']})
+        self.assertEqual(response['Location'], detail_url)
+        download_url = reverse(
+            'budget:jobs-download', kwargs={'pk': job['id']}
+        )
+        self.assertEqual(self.get(download_url).status_code, 404)
+
+        self.run_job(job['id'])
+        job = self.get(detail_url).json()
+        self.assertEqual(
+            (job['status'], job['progress'], job['total']),
+            ('succeeded', 1, 1)
+        )
+        response = self.get(download_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(
+            io.StringIO(b''.join(response.streaming_content).decode())
+        ))
+        self.assertEqual([row['amount'] for row in rows], ['10.00'])
+
+    def test_import_job(self):
+        url = reverse('budget:budget_operation-import',
+                      kwargs=self.budget_kwargs)
+        response = self.post(url)
+        self.assertEqual(response.status_code, 400)
+
+        response = self.post(url, {'file': SimpleUploadedFile(
+            'operations.csv',
+            b'operation_type,category,amount\nExpense,Food,4.00\n'
+        )})
+        self.assertEqual(response.status_code, 202)
+        self.run_job(response.json()['id'])
+        job = self.get(response['Location']).json()
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(job['result'], {'created': 1, 'balance': '6.00'})
+
+    def test_rebuild_job(self):
+        response = self.post(reverse('budget:budgets-rebuild', kwargs={
+            'list_id': self.budgets_list.id,
+            'pk': self.budget.id
+        }))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['kind'], 'rebuild_budget')
+
+    def test_jobs_of_other_users(self):
+        response = self.post(
+            reverse('budget:budgets_lists-export', kwargs=self.list_kwargs)
+        )
+        job_url = response['Location']
+        token = f'Token {Token.objects.create(user=self.stranger).key}'
+        self.assertEqual(self.get(job_url, token).status_code, 404)
+        self.assertEqual(
+            self.get(reverse('budget:jobs-list'), token).json()['count'], 0
+        )
+        response = self.post(
+            reverse('budget:budgets_lists-export', kwargs=self.list_kwargs),
+            token=token
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_retry(self):
+        job = Job.objects.create(
+            kind=Job.Kind.EXPORT,
+            owner=self.user,
+            budgets_list=self.budgets_list,
+            status=Job.Status.FAILED,
+            attempts=3,
+            error='OSError: disk full'
+        )
+        url = reverse('budget:jobs-retry', kwargs={'pk': job.id})
+        response = self.post(url)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(
+            (response.json()['status'], response.json()['attempts']),
+            ('queued', 0)
+        )
+        self.assertEqual(self.post(url).status_code, 400)
+
+
+class RecurringOperationViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.budgets_list = BudgetsList.objects.create(
+            title='Testing',
+            owner=cls.user,
+        )
+        cls.category = Category.objects.create(title='Rent')
+        cls.budget = Budget.objects.create(
+            title='Main',
+            currency=Budget.Currency.USD,
+            owner=cls.user,
+            budget_list=cls.budgets_list
+        )
+
+    def setUp(self):
+        self.user_token = Token.objects.create(user=self.user)
+        self.token = f'Token {self.user_token.key}'
+        self.url = reverse('budget:recurring_operation-list', kwargs={
+            'list_id': self.budgets_list.id,
+            'budget_id': self.budget.id
+        })
+        self.data = {
+            'operation_type': BudgetOperation.OperationType.EXPENSE,
+            'category': self.category.title,
+            'amount': '750.00',
+            'frequency': 'monthly',
+            'start_date': '2021-01-31',
+        }
+
+    def test_create_recurring_operation(self):
+        response = self.client.post(
+            self.url, self.data, HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data['next_date'], '2021-01-31')
+        self.assertEqual(data['user'], self.user.username)
+        rule = RecurringOperation.objects.get()
+        self.assertEqual(rule.budget, self.budget)
+        self.assertEqual(rule.interval, 1)
+
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.json()['results'][0]['id'], rule.id)
+
+    def test_end_date_before_start_date(self):
+        response = self.client.post(
+            self.url,
+            dict(self.data, end_date='2020-12-31'),
+            HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('end_date', response.json())
+
+    def test_other_users_cannot_see_rules(self):
+        other = User.objects.create_user(username='Other')
+        token = Token.objects.create(user=other)
+        response = self.client.get(
+            self.url, HTTP_AUTHORIZATION=f'Token {token.key}'
+        )
+        self.assertEqual(response.status_code, 403)
+
 
 class SharePermissionViewTest(TestCase):
     @classmethod
@@ -162,6 +1272,7 @@ class SharePermissionViewTest(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.owner)
         self.user_token = Token.objects.create(user=self.owner)
@@ -216,3 +1327,299 @@ class SharePermissionViewTest(TestCase):
         self.assertEqual(
             self.budgets_list.id, budgets_lists_after['results'][0]['id']
         )
+
+
+@override_settings(BUDGET_TOKEN_CACHE_TIMEOUT=60)
+class TokenAuthenticationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='TestUser')
+        self.user_token = Token.objects.create(user=self.user)
+        self.token = f'Token {self.user_token.key}'
+        self.url = reverse('budget:budgets_lists-list')
+
+    def get(self):
+        return self.client.get(self.url, HTTP_AUTHORIZATION=self.token)
+
+    def test_token_lookup_is_cached(self):
+        authentication = CachedTokenAuthentication()
+        user, token = authentication.authenticate_credentials(
+            self.user_token.key
+        )
+        self.assertEqual((user, token), (self.user, self.user_token))
+        with self.assertNumQueries(0):
+            user, _ = authentication.authenticate_credentials(
+                self.user_token.key
+            )
+        self.assertEqual(user, self.user)
+
+    @override_settings(BUDGET_TOKEN_CACHE_TIMEOUT=0)
+    def test_token_lookup_without_cache(self):
+        authentication = CachedTokenAuthentication()
+        authentication.authenticate_credentials(self.user_token.key)
+        with self.assertNumQueries(1):
+            user, _ = authentication.authenticate_credentials(
+                self.user_token.key
+            )
+        self.assertEqual(user, self.user)
+
+    def test_logout_revokes_token_immediately(self):
+        self.assertEqual(self.get().status_code, 200)
+        response = self.client.post(
+            reverse('logout'), HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get().status_code, 401)
+
+    def test_deleted_token_stops_working(self):
+        self.assertEqual(self.get().status_code, 200)
+        self.user_token.delete()
+        self.assertEqual(self.get().status_code, 401)
+
+    def test_deactivated_user_stops_working(self):
+        self.assertEqual(self.get().status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get().status_code, 401)
+
+
+class AccessViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.owner = User.objects.create_user(username='TestOwner')
+        cls.member = User.objects.create_user(username='TestMember')
+        cls.stranger = User.objects.create_user(username='TestStranger')
+        cls.budgets_list = BudgetsList.objects.create(
+            title='Testing',
+            owner=cls.owner,
+        )
+        cls.other_list = BudgetsList.objects.create(
+            title='Other',
+            owner=cls.owner,
+        )
+        cls.budget = Budget.objects.create(
+            title='Main',
+            currency=Budget.Currency.USD,
+            owner=cls.owner,
+            budget_list=cls.budgets_list
+        )
+        SharePermission.objects.create(
+            budgets_list=cls.budgets_list,
+            owner=cls.owner,
+            user=cls.member
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def get_token(self, user):
+        token, _ = Token.objects.get_or_create(user=user)
+        return f'Token {token.key}'
+
+    def budget_url(self, list_id=None):
+        return reverse(
+            'budget:budgets-detail',
+            kwargs={
+                'list_id': list_id or self.budgets_list.id,
+                'pk': self.budget.id
+            }
+        )
+
+    def test_stranger_cannot_read_list(self):
+        response = self.client.get(
+            self.budget_url(),
+            HTTP_AUTHORIZATION=self.get_token(self.stranger)
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_budget_must_belong_to_list(self):
+        response = self.client.get(
+            reverse(
+                'budget:budget_operation-list',
+                kwargs={
+                    'list_id': self.other_list.id,
+                    'budget_id': self.budget.id
+                }
+            ),
+            HTTP_AUTHORIZATION=self.get_token(self.owner)
+        )
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(
+            self.budget_url(self.other_list.id),
+            HTTP_AUTHORIZATION=self.get_token(self.owner)
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_only_owner_deletes(self):
+        response = self.client.delete(
+            self.budget_url(),
+            HTTP_AUTHORIZATION=self.get_token(self.member)
+        )
+        self.assertEqual(response.status_code, 403)
+        response = self.client.delete(
+            self.budget_url(),
+            HTTP_AUTHORIZATION=self.get_token(self.owner)
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Budget.objects.filter(pk=self.budget.pk).exists())
+
+    def test_access_cache_stats_for_admins_only(self):
+        url = reverse('budget:access_cache_stats')
+        response = self.client.get(
+            url, HTTP_AUTHORIZATION=self.get_token(self.owner)
+        )
+        self.assertEqual(response.status_code, 403)
+        admin = User.objects.create_user(username='TestAdmin', is_staff=True)
+        response = self.client.get(
+            url, HTTP_AUTHORIZATION=self.get_token(admin)
+        )
+        self.assertEqual(
+            set(response.json()), {'hits', 'misses', 'hit_ratio'}
+        )
+
+    def test_revoked_share_is_not_served_from_cache(self):
+        url = reverse('budget:budgets_lists-list')
+        token = self.get_token(self.member)
+        response = self.client.get(url, HTTP_AUTHORIZATION=token)
+        self.assertEqual(response.json()['count'], 1)
+        SharePermission.objects.filter(user=self.member).delete()
+        response = self.client.get(url, HTTP_AUTHORIZATION=token)
+        self.assertEqual(response.json()['count'], 0)
+        response = self.client.get(
+            self.budget_url(), HTTP_AUTHORIZATION=token
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class AsyncReadViewTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='TestUser')
+        self.budgets_list = BudgetsList.objects.create(
+            title='Testing',
+            owner=self.user,
+        )
+        self.budget = Budget.objects.create(
+            title='Main',
+            owner=self.user,
+            budget_list=self.budgets_list
+        )
+        self.category = Category.objects.create(title='Food')
+        for number in range(3):
+            BudgetOperation.objects.create(
+                budget=self.budget,
+                operation_type=BudgetOperation.OperationType.EXPENSE,
+                category=self.category,
+                amount=Decimal('10.00'),
+                note=f'Operation {number}',
+                user=self.user
+            )
+        self.token = f'Token {Token.objects.create(user=self.user).key}'
+        self.factory = AsyncRequestFactory()
+        self.kwargs = {
+            'list_id': self.budgets_list.id,
+            'budget_id': self.budget.id
+        }
+
+    def async_view(self, viewset, actions):
+        # The URLconf is built without BUDGET_ASYNC_READS, as under WSGI.
+        with self.settings(BUDGET_ASYNC_READS=True):
+            return viewset.as_view(actions)
+
+    def test_read_endpoints_are_async_with_async_reads(self):
+        url = reverse('budget:budget_operation-list', kwargs=self.kwargs)
+        self.assertFalse(asyncio.iscoroutinefunction(resolve(url).func))
+        for viewset in (BudgetsListViewSet, BudgetViewSet,
+                        BudgetOperationViewSet):
+            self.assertTrue(asyncio.iscoroutinefunction(
+                self.async_view(viewset, {'get': 'list'})
+            ))
+
+    async def test_asgi_reads(self):
+        view = self.async_view(BudgetOperationViewSet, {'get': 'list'})
+        url = reverse('budget:budget_operation-list', kwargs=self.kwargs)
+        response = await view(
+            self.factory.get(url, authorization=self.token), **self.kwargs
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['count'], 3)
+
+        response = await view(
+            self.factory.get(
+                url,
+                authorization=self.token,
+                if_none_match=response['ETag']
+            ),
+            **self.kwargs
+        )
+        self.assertEqual(response.status_code, 304)
+
+        view = self.async_view(BudgetViewSet, {'get': 'retrieve'})
+        response = await view(
+            self.factory.get('/', authorization=self.token),
+            list_id=self.budgets_list.id,
+            pk=self.budget.id
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            len(json.loads(response.content)['budget_operations']), 3
+        )
+
+    async def test_asgi_writes(self):
+        view = self.async_view(BudgetOperationViewSet, {'post': 'create'})
+        response = await view(
+            self.factory.post(
+                reverse('budget:budget_operation-list', kwargs=self.kwargs),
+                json.dumps({
+                    'operation_type': BudgetOperation.OperationType.INCOME,
+                    'category': self.category.title,
+                    'amount': '5.00',
+                }),
+                content_type='application/json',
+                authorization=self.token
+            ),
+            **self.kwargs
+        )
+        self.assertEqual(response.status_code, 201)
+
+    @mock.patch.object(BudgetViewSet, 'export_chunk_size', 1)
+    async def test_asgi_streams_exports(self):
+        url = reverse('budget:budgets-export', kwargs={
+            'list_id': self.budgets_list.id,
+            'pk': self.budget.id
+        })
+        scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': url,
+            'query_string': b'',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', self.token.encode()),
+            ],
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        await ASGIHandler()(scope, receive, send)
+        start, *body = messages
+        self.assertEqual(start['status'], 200)
+        self.assertIn(
+            (b'Content-Type', b'application/x-ndjson'), start['headers']
+        )
+        # One message per chunk of operations, then the closing one.
+        self.assertEqual(len(body), 4)
+        self.assertEqual(
+            len(b''.join(
+                message.get('body', b'') for message in body
+            ).splitlines()),
+            3
+        )
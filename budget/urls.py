@@ -1,8 +1,9 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (BudgetOperationViewSet, BudgetViewSet, BudgetsListViewSet,
-                    CategoryViewSet, ShareViewSet)
+from .views import (AccessCacheStatsView, BudgetOperationViewSet,
+                    BudgetViewSet, BudgetsListViewSet, CategoryViewSet,
+                    JobViewSet, RecurringOperationViewSet, ShareViewSet)
 
 app_name = 'budget'
 
@@ -14,12 +15,19 @@ router_v1.register(
     basename='budgets'
 )
 router_v1.register('categories', CategoryViewSet, basename='categories')
+router_v1.register('jobs', JobViewSet, basename='jobs')
 router_v1.register(
     ('lists/(?P<list_id>[0-9]+)/budgets/(?P<budget_id>[0-9]+)/'
      'operation'),
     BudgetOperationViewSet,
     basename='budget_operation'
 )
+router_v1.register(
+    ('lists/(?P<list_id>[0-9]+)/budgets/(?P<budget_id>[0-9]+)/'
+     'recurring'),
+    RecurringOperationViewSet,
+    basename='recurring_operation'
+)
 router_v1.register(
     'lists/(?P<list_id>[0-9]+)/share',
     ShareViewSet,
@@ -27,5 +35,10 @@ router_v1.register(
 )
 
 urlpatterns = [
+    path(
+        'stats/access-cache/',
+        AccessCacheStatsView.as_view(),
+        name='access_cache_stats'
+    ),
     path('', include(router_v1.urls)),
 ]
\ No newline at end of file
@@ -1,61 +1,344 @@
-from django.db.models import Q
-from django.shortcuts import get_object_or_404
+import csv
+import io
+import json
+from decimal import Decimal
+from itertools import islice
+
+from django.db.models import Count, Prefetch, Sum
+from django.http import FileResponse, StreamingHttpResponse
+from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import viewsets
-from rest_framework.permissions import IsAuthenticated
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from .filters import OperationFilter
-from .models import (Budget, BudgetOperation, BudgetsList, Category,
-                     SharePermission)
+from .access import access_cache_stats, get_access
+from .async_views import AsyncReadMixin
+from .columnar import CONTENT_TYPES, EXTENSIONS, stream_operations
+from .conditional import ConditionalGetMixin, list_versions
+from .currency import CENT, RateNotFound, convert
+from .filters import OperationFilter, SummaryFilter
+from .history import TooManyPoints, balance_history
+from .insights import get_insights
+from .jobs import csv_rows, enqueue, job_path, retry_job
+from .models import (Budget, BudgetOperation, BudgetsList, Category, Job,
+                     RecurringOperation, SharePermission)
+from .pagination import (BudgetKeysetPagination, LatestOperationsPagination,
+                         OperationKeysetPagination, SelectablePaginationMixin)
 from .permissions import AdmittedOrOwner, OnlyOwnerDelete
+from .search import SearchResults
 from .serializers import (BudgetCreateSerializer, BudgetOperationSerializer,
                           BudgetSerializer, BudgetsListSerializer,
-                          CategorySerializer, ShareSerializer,
-                          ShortBudgetSerializer)
+                          BudgetSummarySerializer, CategorySerializer,
+                          ExportQuerySerializer, HistoryQuerySerializer,
+                          InsightsQuerySerializer, JobSerializer,
+                          RecurringOperationSerializer, SearchQuerySerializer,
+                          SearchResultSerializer, ShareSerializer,
+                          ShortBudgetSerializer, TotalsQuerySerializer)
+
+
+def job_accepted(job):
+    response = Response(
+        JobSerializer(job).data, status=status.HTTP_202_ACCEPTED
+    )
+    response['Location'] = reverse('budget:jobs-detail', kwargs={'pk': job.id})
+    return response
 
 
-class BudgetsListViewSet(viewsets.ModelViewSet):
+class BudgetsListViewSet(AsyncReadMixin, ConditionalGetMixin,
+                         viewsets.ModelViewSet):
     serializer_class = BudgetsListSerializer
     permission_classes = (IsAuthenticated, OnlyOwnerDelete)
+    report_actions = ('totals', 'search', 'insights', 'export')
+    export_chunk_size = 10000
+
+    def get_etag_versions(self):
+        access = get_access(self.request)
+        if self.action == 'list':
+            return list_versions(*access.list_ids)
+        if access.can_access_list(self.kwargs['pk']):
+            return list_versions(self.kwargs['pk'])
+        return None
 
     def get_queryset(self):
-        user = self.request.user
         all_lists = BudgetsList.objects.filter(
-            Q(owner=user.id) | Q(shared_permissions__user=user.id)
-        ).distinct()
-        return all_lists
+            id__in=get_access(self.request).list_ids
+        )
+        if self.action in self.report_actions:
+            return all_lists
+        return all_lists.select_related('owner').prefetch_related('budgets')
 
     def perform_create(self, serializer):
         user = self.request.user
         serializer.save(owner=user)
 
+    def get_serializer_class(self):
+        if self.action == 'totals':
+            return TotalsQuerySerializer
+        elif self.action == 'search':
+            return SearchQuerySerializer
+        elif self.action == 'insights':
+            return InsightsQuerySerializer
+        elif self.action == 'export':
+            return ExportQuerySerializer
+        return BudgetsListSerializer
+
+    @action(detail=True, methods=['get'])
+    def totals(self, request, *args, **kwargs):
+        budgets_list = self.get_object()
+        query = self.get_serializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        target = query.validated_data['currency']
+        date = query.validated_data['date']
+
+        balances = Budget.objects.filter(
+            budget_list=budgets_list
+        ).values('currency').annotate(
+            balance=Sum('balance'),
+            budgets=Count('id')
+        ).order_by('currency')
+        rates = {}
+        rows = []
+        total = Decimal('0.00')
+        for row in balances:
+            balance = Decimal(row['balance']).quantize(CENT)
+            try:
+                converted = convert(balance, row['currency'], target, date,
+                                    rates)
+            except RateNotFound as error:
+                raise ValidationError({'currency': str(error)})
+            total += converted
+            rows.append({
+                'currency': row['currency'],
+                'balance': str(balance),
+                'budgets': row['budgets'],
+                'converted': str(converted),
+            })
+        return Response({
+            'currency': target,
+            'date': date,
+            'total': str(total),
+            'balances': rows,
+        })
 
-class BudgetViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'])
+    def insights(self, request, *args, **kwargs):
+        budgets_list = self.get_object()
+        query = self.get_serializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        return Response(
+            get_insights(budgets_list, query.validated_data['month'])
+        )
+
+    @action(detail=True, methods=['get', 'post'])
+    def export(self, request, *args, **kwargs):
+        budgets_list = self.get_object()
+        query = self.get_serializer(
+            data=request.data if request.method == 'POST'
+            else request.query_params
+        )
+        query.is_valid(raise_exception=True)
+        file_format = query.validated_data['type']
+        if request.method == 'POST':
+            return job_accepted(enqueue(
+                Job.Kind.EXPORT, request.user, budgets_list.id,
+                type=file_format
+            ))
+        response = StreamingHttpResponse(
+            stream_operations(
+                budgets_list.id, file_format, self.export_chunk_size
+            ),
+            content_type=CONTENT_TYPES[file_format]
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="list-{budgets_list.id}-operations.'
+            f'{EXTENSIONS[file_format]}"'
+        )
+        return response
+
+    @action(detail=True, methods=['get'])
+    def search(self, request, *args, **kwargs):
+        budgets_list = self.get_object()
+        query = self.get_serializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+
+        budgets = Budget.objects.filter(budget_list=budgets_list)
+        if 'budget' in query.validated_data:
+            budgets = budgets.filter(id=query.validated_data['budget'])
+        results = SearchResults(
+            query.validated_data['q'],
+            budgets.values_list('id', flat=True)
+        )
+        page = self.paginate_queryset(results)
+        return self.get_paginated_response(
+            SearchResultSerializer(page, many=True).data
+        )
+
+
+class BudgetViewSet(AsyncReadMixin, ConditionalGetMixin,
+                    SelectablePaginationMixin, viewsets.ModelViewSet):
     permission_classes = (IsAuthenticated, OnlyOwnerDelete, AdmittedOrOwner)
+    keyset_pagination_class = BudgetKeysetPagination
+    etag_actions = ('list', 'retrieve', 'history')
+    export_chunk_size = 1000
+
+    @property
+    def latest_mode(self):
+        return (self.action == 'retrieve'
+                and LatestOperationsPagination.page_size_query_param
+                in self.request.query_params)
 
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
-            return BudgetsList.objects.none()
+            return Budget.objects.none()
 
-        budgets_list = get_object_or_404(
-            BudgetsList, id=self.kwargs['list_id']
-        )
-        return budgets_list.budgets.all()
+        budgets = Budget.objects.filter(budget_list_id=self.kwargs['list_id'])
+        if self.action == 'retrieve' and not self.latest_mode:
+            budgets = budgets.prefetch_related(Prefetch(
+                'budget_operations',
+                queryset=BudgetOperation.objects.select_related(
+                    'category', 'user'
+                )
+            ))
+        return budgets
 
     def perform_create(self, serializer):
         user = self.request.user
-        budget_list = get_object_or_404(
-            BudgetsList, id=self.kwargs['list_id']
-        )
-        serializer.save(owner=user, budget_list=budget_list)
+        serializer.save(owner=user, budget_list_id=self.kwargs['list_id'])
 
     def get_serializer_class(self):
         if self.action == 'create':
             return BudgetCreateSerializer
-        elif self.action == 'list':
+        elif self.action == 'list' or self.latest_mode:
             return ShortBudgetSerializer
+        elif self.action == 'summary':
+            return BudgetSummarySerializer
+        elif self.action == 'history':
+            return HistoryQuerySerializer
         return BudgetSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        if not self.latest_mode:
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(
+            self.retrieve_latest, request, *args, **kwargs
+        )
+
+    def retrieve_latest(self, request, *args, **kwargs):
+        budget = self.get_object()
+        paginator = LatestOperationsPagination()
+        operations = paginator.paginate_queryset(
+            budget.budget_operations.select_related('category', 'user'),
+            request,
+            view=self
+        )
+        data = self.get_serializer(budget).data
+        data['budget_operations'] = BudgetOperationSerializer(
+            operations, many=True
+        ).data
+        data['next'] = paginator.get_next_link()
+        return Response(data)
+
+    def stream_operations(self, budget):
+        operations = budget.budget_operations.select_related(
+            'category', 'user'
+        ).iterator(chunk_size=self.export_chunk_size)
+        while True:
+            chunk = list(islice(operations, self.export_chunk_size))
+            if not chunk:
+                break
+            yield ''.join(
+                json.dumps(operation) + '\n'
+                for operation in BudgetOperationSerializer(
+                    chunk, many=True
+                ).data
+            )
+
+    @action(detail=True, methods=['get'])
+    def export(self, request, *args, **kwargs):
+        budget = self.get_object()
+        response = StreamingHttpResponse(
+            self.stream_operations(budget),
+            content_type='application/x-ndjson'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="budget-{budget.id}-operations.ndjson"'
+        )
+        return response
+
+    @action(detail=True, methods=['post'])
+    def rebuild(self, request, *args, **kwargs):
+        budget = self.get_object()
+        return job_accepted(enqueue(
+            Job.Kind.REBUILD_BUDGET, request.user, budget.budget_list_id,
+            budget=budget.id
+        ))
+
+    @action(detail=True, methods=['get'])
+    def history(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.build_history, request, *args, **kwargs
+        )
+
+    def build_history(self, request, *args, **kwargs):
+        budget = self.get_object()
+        query = self.get_serializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        try:
+            history = balance_history(budget, **query.validated_data)
+        except TooManyPoints as error:
+            raise ValidationError({'interval': str(error)})
+        return Response({
+            'budget': budget.id,
+            'currency': budget.currency,
+            **history,
+        })
+
+    @action(detail=True, methods=['get'])
+    def summary(self, request, *args, **kwargs):
+        budget = self.get_object()
+        filterset = SummaryFilter(
+            request.query_params,
+            queryset=budget.summaries.select_related('category'),
+            request=request
+        )
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        rows = list(filterset.qs)
+
+        totals = {
+            operation_type: Decimal('0.00')
+            for operation_type, _ in BudgetOperation.OperationType.choises
+        }
+        categories = {}
+        for row in rows:
+            totals[row.operation_type] += row.total
+            key = (row.category.title if row.category else None,
+                   row.operation_type)
+            total, count = categories.get(key, (Decimal('0.00'), 0))
+            categories[key] = (total + row.total, count + row.count)
+
+        return Response({
+            'totals': {
+                operation_type: str(total)
+                for operation_type, total in totals.items()
+            },
+            'categories': [
+                {
+                    'category': category,
+                    'operation_type': operation_type,
+                    'total': str(total),
+                    'count': count,
+                }
+                for (category, operation_type), (total, count)
+                in sorted(categories.items(), key=lambda item: -item[1][0])
+            ],
+            'months': self.get_serializer(rows, many=True).data,
+        })
+
 
 class CategoryViewSet(viewsets.ModelViewSet):
     queryset = Category.objects.all()
@@ -63,9 +346,12 @@ class CategoryViewSet(viewsets.ModelViewSet):
     permission_classes = (IsAuthenticated,)
 
 
-class BudgetOperationViewSet(viewsets.ModelViewSet):
+class BudgetOperationViewSet(AsyncReadMixin, ConditionalGetMixin,
+                             SelectablePaginationMixin,
+                             viewsets.ModelViewSet):
     serializer_class = BudgetOperationSerializer
     permission_classes = (IsAuthenticated, AdmittedOrOwner)
+    keyset_pagination_class = OperationKeysetPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = OperationFilter
 
@@ -73,15 +359,79 @@ class BudgetOperationViewSet(viewsets.ModelViewSet):
         if getattr(self, 'swagger_fake_view', False):
             return BudgetOperation.objects.none()
 
-        budget = get_object_or_404(Budget, id=self.kwargs['budget_id'])
-        return budget.budget_operations.all()
+        return BudgetOperation.objects.filter(
+            budget_id=self.kwargs['budget_id']
+        ).select_related('category', 'user')
+
+    def get_budget(self):
+        return get_access(self.request).get_budget(
+            self.kwargs['list_id'], self.kwargs['budget_id']
+        )
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user, budget=self.get_budget())
+
+    def get_bulk_data(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return request.data
+        try:
+            return list(csv_rows(io.TextIOWrapper(upload, encoding='utf-8')))
+        except (UnicodeDecodeError, csv.Error):
+            raise ValidationError({'file': 'Upload a valid UTF-8 CSV file.'})
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request, *args, **kwargs):
+        data = self.get_bulk_data(request)
+        if not isinstance(data, list):
+            raise ValidationError(
+                'Expected a list of operations or a CSV file upload.'
+            )
+        serializer = self.get_serializer(data=data, many=True)
+        serializer.is_valid(raise_exception=True)
+        budget = self.get_budget()
+        operations = serializer.save(user=request.user, budget=budget)
+        budget.refresh_from_db(fields=['balance'])
+        return Response(
+            {'created': len(operations), 'balance': str(budget.balance)},
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=['post'], url_path='import',
+            url_name='import')
+    def import_operations(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': 'Upload a CSV file of operations.'})
+        budget = self.get_budget()
+        return job_accepted(enqueue(
+            Job.Kind.IMPORT_OPERATIONS, request.user, budget.budget_list_id,
+            upload=upload, budget=budget.id
+        ))
+
+
+class RecurringOperationViewSet(viewsets.ModelViewSet):
+    serializer_class = RecurringOperationSerializer
+    permission_classes = (IsAuthenticated, AdmittedOrOwner)
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return RecurringOperation.objects.none()
+
+        return RecurringOperation.objects.filter(
+            budget_id=self.kwargs['budget_id']
+        ).select_related('category', 'user')
 
     def perform_create(self, serializer):
-        budget = get_object_or_404(Budget, id=self.kwargs['budget_id'])
-        serializer.save(user=self.request.user, budget=budget)
+        serializer.save(
+            user=self.request.user,
+            budget=get_access(self.request).get_budget(
+                self.kwargs['list_id'], self.kwargs['budget_id']
+            )
+        )
 
 
-class ShareViewSet(viewsets.ModelViewSet):
+class ShareViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     permission_classes = (IsAuthenticated, AdmittedOrOwner)
     serializer_class = ShareSerializer
 
@@ -89,13 +439,55 @@ class ShareViewSet(viewsets.ModelViewSet):
         if getattr(self, 'swagger_fake_view', False):
             return SharePermission.objects.none()
 
-        budgets_list = get_object_or_404(
-            BudgetsList, id=self.kwargs['list_id']
-        )
-        return budgets_list.shared_permissions.all()
+        return SharePermission.objects.filter(
+            budgets_list_id=self.kwargs['list_id']
+        ).select_related('user')
 
     def perform_create(self, serializer):
-        budgets_list = get_object_or_404(
-            BudgetsList, id=self.kwargs['list_id']
+        serializer.save(
+            owner=self.request.user, budgets_list_id=self.kwargs['list_id']
         )
-        serializer.save(owner=self.request.user, budgets_list=budgets_list)
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    serializer_class = JobSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return Job.objects.none()
+
+        return Job.objects.filter(owner=self.request.user)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, *args, **kwargs):
+        job = self.get_object()
+        name = (job.result or {}).get('file')
+        if (job.kind != Job.Kind.EXPORT or job.status != Job.Status.SUCCEEDED
+                or name is None):
+            raise NotFound('The job has no file to download.')
+        try:
+            file = open(job_path(name), 'rb')
+        except FileNotFoundError:
+            raise NotFound('The exported file was removed.')
+        return FileResponse(
+            file,
+            as_attachment=True,
+            filename=name,
+            content_type=CONTENT_TYPES[job.result['type']]
+        )
+
+    @action(detail=True, methods=['post'])
+    def retry(self, request, *args, **kwargs):
+        job = self.get_object()
+        if not retry_job(job):
+            raise ValidationError('Only failed jobs can be retried.')
+        job.refresh_from_db()
+        return job_accepted(job)
+
+
+class AccessCacheStatsView(APIView):
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(access_cache_stats.as_dict())
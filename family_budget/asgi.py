@@ -0,0 +1,21 @@
+"""
+ASGI config for family_budget project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'family_budget.settings')
+os.environ.setdefault('BUDGET_ASYNC_READS', 'true')
+
+django.setup(set_prefix=False)
+
+from budget.async_views import ASGIHandler  # noqa: E402
+
+application = ASGIHandler()
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from budget.metrics import MetricsView
+
 from .yasg import urlpatterns as doc_urls
 
 urlpatterns = [
@@ -8,5 +10,6 @@ urlpatterns = [
     path('api/', include(doc_urls)),
     path('api/', include('djoser.urls')),
     path('api/auth/', include('djoser.urls.authtoken')),
-    path('admin/', admin.site.urls)
+    path('admin/', admin.site.urls),
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]
@@ -0,0 +1,21 @@
+import multiprocessing
+import os
+
+# Serve the WSGI app with the default sync workers, or set
+# GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker and point gunicorn at
+# family_budget.asgi:application to run the ASGI app.
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get(
+    'WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1
+))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = 5
+
+# Recycle workers now and then, so slow leaks cannot build up.
+max_requests = 1000
+max_requests_jitter = 100
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None